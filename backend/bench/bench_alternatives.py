@@ -0,0 +1,77 @@
+# /api/alternatives query latency over a synthetic catalog of --products
+# products (real KB ingredients + a Zipf tail of unknown ones, random fits).
+#   cd backend && python -m bench.bench_alternatives [--products 1000000] [--queries 200] [--db catalog.db]
+# --db keeps the generated catalog (and reuses it when it already exists).
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from services.intent import INTENTS
+from services.knowledge import KnowledgeBase
+from services.products import ProductStore
+from services.rules import current_rules
+
+def _catalog(kb: KnowledgeBase, n: int, rng: random.Random):
+    known = sorted(kb.items)
+    tail = [f"ingredient {i}" for i in range(5000)]
+    weights = [1.0 / (i + 1) for i in range(len(tail))]
+    # a few thousand base recipes, each sold as many slightly different SKUs
+    bases = [rng.sample(known, rng.randint(3, 8)) + rng.choices(tail, weights, k=rng.randint(2, 8)) for _ in range(20000)]
+    for i in range(n):
+        names = set(rng.choice(bases))
+        if rng.random() < 0.5:
+            names.discard(rng.choice(sorted(names)))
+        if rng.random() < 0.5:
+            names.add(rng.choice(known) if rng.random() < 0.5 else rng.choices(tail, weights)[0])
+        normalized = [
+            {"canonical": c, "flags": tuple((kb.items.get(c) or {}).get("flags") or ())} for c in sorted(names)
+        ]
+        fits = {intent: {"fit_score": rng.randint(0, 100)} for intent in INTENTS}
+        yield f"sku-{i}", f"Product {i}", {"normalized_ingredients": normalized, "fit_by_intent": fits}
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=1000000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--db", default=None, help="catalog file to keep/reuse (default: a temp file)")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    kb = KnowledgeBase.load_default()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.db) if args.db else Path(tmp) / "products.db"
+        fresh = not path.exists()
+        store = ProductStore(path)
+        version = (kb.version, current_rules().version)
+        t0 = time.perf_counter()
+        batch = []
+        for product in (_catalog(kb, args.products, rng) if fresh else ()):
+            batch.append(product)
+            if len(batch) >= 10000:
+                store.add_many(batch, *version)
+                batch = []
+        if batch:
+            store.add_many(batch, *version)
+        t1 = time.perf_counter()
+        store.alternatives(["sugar"], "sugar", 0)  # builds the in-memory index
+        t2 = time.perf_counter()
+        print(f"products={args.products} write={t1 - t0:.1f}s index={t2 - t1:.1f}s")
+
+        queries = [p for _, p in zip(range(args.queries), _catalog(kb, args.queries, random.Random(args.seed + 1)))]
+        lat, hits = [], 0
+        for _, _, result in queries:
+            ingredients = [r["canonical"] for r in result["normalized_ingredients"]]
+            intent = rng.choice(INTENTS)
+            s = time.perf_counter()
+            found = store.alternatives(ingredients, intent, rng.randint(30, 80), k=5, min_overlap=0.5)
+            lat.append(time.perf_counter() - s)
+            hits += bool(found)
+        lat.sort()
+        pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+        print(f"queries={len(lat)} with_results={hits} p50={pct(0.5):.2f}ms p95={pct(0.95):.2f}ms p99={pct(0.99):.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Follow-up routing cost with --routes registered patterns: the compiled
+# router vs. the if/elif cascade of re.search calls it replaced.
+#   cd backend && python -m bench.bench_chat [--routes 120] [--messages 5000]
+import argparse
+import random
+import re
+import time
+
+from services.chat_logic import ROUTER
+from services.chat_router import FollowupRouter
+from services.knowledge import KnowledgeBase
+
+_TEMPLATES = [
+    r"\bis {x} (?:safe|ok|okay|bad)\b",
+    r"\bhow much {x}\b",
+    r"\b(?:what|which) {x}\b",
+    r"\b{x} (?:free|substitute|alternative)s?\b",
+]
+_FILLER = ["can", "you", "tell", "me", "about", "this", "product", "please", "the", "label", "for", "my", "kid"]
+
+def _router(n: int, rng: random.Random):
+    # the built-in routes, then synthetic ones until there are n
+    router: FollowupRouter = FollowupRouter()
+    cascade = []
+    for route in ROUTER.routes():
+        triggers = sorted(route.triggers) if route.triggers is not None else None
+        router.register(route.name, patterns=[route.source], triggers=triggers, priority=len(cascade))(route.handler)
+        cascade.append((re.compile(route.source), route.handler))
+    names = sorted(KnowledgeBase.load_default().items)
+    while len(router) < n:
+        name = rng.choice(names)
+        source = rng.choice(_TEMPLATES).format(x=re.escape(name))
+        handler = (lambda i: lambda ctx: i)(len(router))
+        router.register(f"r{len(router)}", patterns=[source], triggers=[name], priority=len(cascade))(handler)
+        cascade.append((re.compile(source), handler))
+    return router, cascade, names
+
+def _messages(names, n: int, rng: random.Random):
+    out = []
+    for _ in range(n):
+        words = [rng.choice(_FILLER) for _ in range(rng.randint(3, 10))]
+        if rng.random() < 0.7:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(["is", "how much", "which", ""]))
+            words.insert(rng.randrange(len(words) + 1), rng.choice(names))
+            words.insert(rng.randrange(len(words) + 1), rng.choice(["safe", "free", "daily", "why", ""]))
+        out.append(" ".join(w for w in words if w))
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--routes", type=int, default=120)
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    router, cascade, names = _router(args.routes, rng)
+    messages = _messages(names, args.messages, rng)
+
+    def linear(msg):
+        for regex, handler in cascade:
+            if regex.search(msg):
+                return handler
+        return None
+
+    t0 = time.perf_counter()
+    routed = [router.route(m) for m in messages]
+    t_router = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    expected = [linear(m) for m in messages]
+    t_linear = time.perf_counter() - t0
+
+    mismatches = sum(1 for a, b in zip(routed, expected) if a is not b and not (a is None and b is None))
+    matched = sum(1 for h in expected if h is not None)
+    print(f"routes={len(router)} messages={len(messages)} matched={matched} mismatches={mismatches}")
+    print(f"router : {t_router / len(messages) * 1e6:8.2f} us/message")
+    print(f"cascade: {t_linear / len(messages) * 1e6:8.2f} us/message  ({t_linear / t_router:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Fuzzy (OCR-tolerant) lookup latency against a knowledge base padded out to
+# --terms entries with synthetic names built from the real vocabulary.
+#   cd backend && python -m bench.bench_fuzzy [--terms 100000] [--queries 2000]
+import argparse
+import random
+import string
+import time
+
+from services.fuzzy import FuzzyIndex
+from services.knowledge import KnowledgeBase
+
+_SYLLABLES = ["ka", "lo", "mi", "tre", "zan", "pol", "ur", "ix", "ven", "do", "sar", "qui"]
+_SUFFIXES = ["", " extract", " powder", " oil", " concentrate", " syrup"]
+
+def _terms(kb: KnowledgeBase, n: int, rng: random.Random):
+    terms = {name: name for name in kb.items}
+    terms.update(kb.synonyms)
+    words = sorted({w for t in terms for w in t.split()})
+    while len(terms) < n:
+        parts = [
+            rng.choice(words) if rng.random() < 0.5 else "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(rng.randint(1, 2))
+        ]
+        name = " ".join(parts) + rng.choice(_SUFFIXES)
+        terms[name] = name
+    return terms
+
+def _typo(term: str, rng: random.Random) -> str:
+    i = rng.randrange(len(term))
+    c = rng.choice(string.ascii_lowercase)
+    op = rng.random()
+    if op < 0.4:
+        return term[:i] + c + term[i + 1:]
+    if op < 0.7:
+        return term[:i] + term[i + 1:]
+    return term[:i] + c + term[i:]
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--terms", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    terms = _terms(KnowledgeBase.load_default(), args.terms, rng)
+    t0 = time.perf_counter()
+    index = FuzzyIndex(terms)
+    build = time.perf_counter() - t0
+
+    keys = list(terms)
+    queries = [_typo(rng.choice(keys), rng) for _ in range(args.queries)]
+    lat = []
+    hits = 0
+    for q in queries:
+        t0 = time.perf_counter()
+        hits += index.lookup(q) is not None
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+
+    def pct(p: float) -> float:
+        return lat[min(len(lat) - 1, int(len(lat) * p))] * 1e6
+
+    print(f"terms={len(index)} build={build:.2f}s queries={len(queries)} matched={hits}")
+    print(f"lookup us: p50 {pct(0.5):.0f}  p90 {pct(0.9):.0f}  p99 {pct(0.99):.0f}  max {lat[-1] * 1e6:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Per-token cost of normalize_ingredients with and without the token memo.
+#   cd backend && python -m bench.bench_normalize [--labels 2000] [--repeat 5]
+import argparse
+import random
+import time
+
+from services.knowledge import KnowledgeBase
+from services.normalize import clear_token_memo, iter_tokens, normalize_ingredients, token_memo_stats
+
+def _labels(kb: KnowledgeBase, n: int, seed: int = 7):
+    rng = random.Random(seed)
+    vocab = sorted(kb.items) + sorted(kb.synonyms)
+    labels = []
+    for _ in range(n):
+        toks = rng.sample(vocab, k=min(len(vocab), rng.randint(5, 15)))
+        if rng.random() < 0.3:
+            toks.append(f"{rng.choice(vocab)} ({rng.choice(vocab)})")
+        labels.append("Ingredients: " + ", ".join(toks))
+    return labels
+
+def _run(labels, kb, use_memo: bool, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for text in labels:
+            normalize_ingredients(text, kb, use_memo=use_memo)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    kb = KnowledgeBase.load_default()
+    labels = _labels(kb, args.labels)
+    tokens = sum(1 for t in labels for _ in iter_tokens(t))
+
+    clear_token_memo()
+    cold = _run(labels, kb, use_memo=False, repeat=args.repeat)
+    _run(labels, kb, use_memo=True, repeat=1)  # warm the memo
+    warm = _run(labels, kb, use_memo=True, repeat=args.repeat)
+
+    print(f"labels={len(labels)} tokens={tokens}")
+    print(f"no memo : {cold / tokens * 1e6:8.3f} us/token")
+    print(f"memo    : {warm / tokens * 1e6:8.3f} us/token  ({cold / warm:.1f}x)")
+    print(f"memo stats: {token_memo_stats()}")
+
+if __name__ == "__main__":
+    main()
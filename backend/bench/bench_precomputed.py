@@ -0,0 +1,55 @@
+# Catalog-hit cost: answering from the precomputed artifact (lookup + bytes
+# join) vs. running the pipeline and encoding the response; plus the build
+# and an incremental rebuild of the artifact over --labels synthetic labels.
+#   cd backend && python -m bench.bench_precomputed [--labels 5000] [--queries 2000]
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bench.labelgen import LabelConfig, LabelGenerator
+from routers.analyze import AnalyzeResponse
+from services.intent import INTENTS
+from services.knowledge import KnowledgeBase
+from services.pipeline import run_pipeline
+from services.precomputed import Artifact, build_artifact, label_key, label_text
+from services.workers import BATCH_WORKERS, start_pool
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    kb = KnowledgeBase.load_default()
+    if BATCH_WORKERS > 1:
+        start_pool(kb)  # as cli.py precompute does
+    labels = LabelGenerator(LabelConfig(seed=args.seed)).labels(args.labels)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "precomputed.kv"
+        stats = build_artifact(({"ingredients_text": t} for t in labels), path, kb)
+        print(f"build: {stats}")
+        stats = build_artifact(({"ingredients_text": t} for t in labels), path, kb)
+        print(f"rebuild (unchanged catalog): {stats}")
+
+        artifact = Artifact(path)
+        queries = [(rng.choice(labels), rng.choice((None, *INTENTS))) for _ in range(args.queries)]
+        variants = {v: i for i, v in enumerate((None, *INTENTS))}
+
+        t0 = time.perf_counter()
+        for text, intent in queries:
+            artifact.hit(label_key(label_text(text)), variants[intent]).body("0" * 24)
+        hit = (time.perf_counter() - t0) / len(queries)
+
+        t0 = time.perf_counter()
+        for text, intent in queries:
+            AnalyzeResponse(**run_pipeline(text, kb, intent)).model_dump_json()
+        live = (time.perf_counter() - t0) / len(queries)
+        artifact.close()
+    print(f"artifact hit {hit * 1e6:.1f}us  live pipeline+encode {live * 1e6:.1f}us  ({live / hit:.0f}x)")
+
+if __name__ == "__main__":
+    main()
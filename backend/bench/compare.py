@@ -0,0 +1,29 @@
+# Diff two bench.run reports: python -m bench.compare base.json head.json
+import json
+import sys
+
+def _rows(report):
+    for name, r in report.get("micro", {}).items():
+        yield f"micro/{name}", "us_per_op", r["us_per_op"], False
+    for name, r in report.get("e2e", {}).items():
+        yield f"e2e/{name}", "req/s", r["requests_per_sec"], True
+        yield f"e2e/{name}", "p95 ms", r["latency_ms"]["p95"], False
+
+def main() -> None:
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m bench.compare BASE.json HEAD.json")
+    base, head = (json.load(open(p)) for p in sys.argv[1:])
+    old = {(n, m): v for n, m, v, _ in _rows(base)}
+    print(f"{base['meta']['git']} -> {head['meta']['git']}")
+    for name, metric, new, higher_better in _rows(head):
+        prev = old.get((name, metric))
+        if not prev or new is None:
+            print(f"{name:32} {metric:10} {new!s:>12}   (new)")
+            continue
+        change = (new - prev) / prev * 100
+        better = change > 0 if higher_better else change < 0
+        verdict = "~" if abs(change) < 2 else ("better" if better else "worse")
+        print(f"{name:32} {metric:10} {prev:>12} -> {new:>12} {change:+7.1f}% {verdict}")
+
+if __name__ == "__main__":
+    main()
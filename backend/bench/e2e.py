@@ -0,0 +1,94 @@
+# End-to-end load test against the FastAPI app, driven in-process over ASGI
+# (no sockets, no extra client dependency).
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+async def asgi_request(app, method: str, path: str, payload: Any = None,
+                       headers: Dict[str, str] = None) -> Tuple[int, bytes]:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    hdrs = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    hdrs += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": hdrs,
+        "client": ("bench", 0), "server": ("bench", 80),
+    }
+    done = asyncio.Event()
+    sent = False
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+def _pct(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+async def _load(app, path: str, payloads: List[Any], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    it = iter(payloads)
+
+    async def worker():
+        nonlocal errors
+        for p in it:
+            t0 = time.perf_counter()
+            status, _ = await asgi_request(app, "POST", path, p)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    lat = sorted(latencies)
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "requests_per_sec": round(len(lat) / wall, 1) if wall else None,
+        "latency_ms": {q: round(_pct(lat, v) * 1000, 3) for q, v in (("p50", .5), ("p95", .95), ("p99", .99))},
+    }
+
+def run_e2e(labels: List[str], concurrency: int = 8, repeat_pool: int = 50) -> Dict[str, Dict[str, Any]]:
+    from main import app
+    from services.analysis import RESULT_CACHE
+
+    unique = [{"ingredients_text": t, "optimize_for": None} for t in labels]
+    # repetitive traffic: the same few labels over and over (exercises the result cache)
+    repeated = [unique[i % min(repeat_pool, len(unique))] for i in range(len(unique))]
+    batch = [{"items": unique[i:i + 50]} for i in range(0, len(unique), 50)]
+
+    async def go():
+        RESULT_CACHE.clear()
+        out = {"analyze.unique": await _load(app, "/api/analyze", unique, concurrency)}
+        RESULT_CACHE.clear()
+        out["analyze.repeated"] = await _load(app, "/api/analyze", repeated, concurrency)
+        RESULT_CACHE.clear()
+        out["analyze_batch.50"] = await _load(app, "/api/analyze/batch", batch, max(1, concurrency // 4))
+        return out
+
+    return asyncio.run(go())
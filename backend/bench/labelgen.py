@@ -0,0 +1,92 @@
+# Synthetic ingredient labels driven by data/ingredients_knowledge.json.
+import json
+import random
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from services.knowledge import DEFAULT_SOURCE
+
+_ENUM_RE = re.compile(r"^e\d{3,4}[a-z]?$")
+_SYLLABLES = ["ka", "lo", "mi", "tre", "zan", "pol", "ur", "ix", "ven", "do", "sar", "qui"]
+
+@dataclass
+class LabelConfig:
+    min_tokens: int = 6
+    max_tokens: int = 18
+    nesting: int = 1             # max depth of "x (a, b (c))" groups; 0 = flat
+    nest_ratio: float = 0.15     # chance a token becomes a parenthesized group
+    unknown_ratio: float = 0.15  # made-up ingredient names
+    synonym_ratio: float = 0.2   # synonyms instead of canonical names
+    enumber_ratio: float = 0.1   # E-numbers (known ones from synonyms, else random)
+    percent_ratio: float = 0.05  # "sugar 12%" style quantities
+    prefix_ratio: float = 0.7    # leading "Ingredients:"
+    seed: int = 7
+
+class LabelGenerator:
+    def __init__(self, cfg: Optional[LabelConfig] = None, source: Path = DEFAULT_SOURCE):
+        data = json.loads(Path(source).read_text(encoding="utf-8"))
+        self.cfg = cfg = cfg or LabelConfig()
+        self.rng = random.Random(cfg.seed)
+        self.canonical = sorted(it["name"] for it in data["ingredients"])
+        syns = sorted(data.get("synonyms", {}))
+        self.enumbers = [s for s in syns if _ENUM_RE.match(s.lower())] or ["e330"]
+        self.synonyms = [s for s in syns if s not in self.enumbers] or self.canonical
+
+    def _unknown(self) -> str:
+        r = self.rng
+        return "".join(r.choice(_SYLLABLES) for _ in range(r.randint(2, 4))) + r.choice(["", " extract", " powder", " oil"])
+
+    def _term(self) -> str:
+        r, c = self.rng, self.cfg
+        x = r.random()
+        if x < c.unknown_ratio:
+            term = self._unknown()
+        elif x < c.unknown_ratio + c.enumber_ratio:
+            term = r.choice(self.enumbers) if r.random() < 0.7 else f"e{r.randint(100, 1599)}"
+            term = term.upper()
+        elif x < c.unknown_ratio + c.enumber_ratio + c.synonym_ratio:
+            term = r.choice(self.synonyms)
+        else:
+            term = r.choice(self.canonical)
+        if r.random() < 0.2:
+            term = term.capitalize()
+        if r.random() < c.percent_ratio:
+            term = f"{term} {r.randint(1, 60)}%"
+        return term
+
+    def _tokens(self, n: int, depth: int) -> List[str]:
+        r, c = self.rng, self.cfg
+        out = []
+        for _ in range(n):
+            if depth < c.nesting and r.random() < c.nest_ratio:
+                inner = ", ".join(self._tokens(r.randint(1, 4), depth + 1))
+                out.append(f"{self._term()} ({inner})")
+            else:
+                out.append(self._term())
+        return out
+
+    def label(self) -> str:
+        r, c = self.rng, self.cfg
+        body = ", ".join(self._tokens(r.randint(c.min_tokens, c.max_tokens), 0))
+        return ("Ingredients: " + body) if r.random() < c.prefix_ratio else body
+
+    def labels(self, n: int) -> List[str]:
+        return [self.label() for _ in range(n)]
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            yield self.label()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="print synthetic labels as NDJSON rows")
+    ap.add_argument("-n", type=int, default=10)
+    ap.add_argument("--nesting", type=int, default=1)
+    ap.add_argument("--unknown-ratio", type=float, default=0.15)
+    ap.add_argument("--seed", type=int, default=7)
+    a = ap.parse_args()
+    gen = LabelGenerator(LabelConfig(nesting=a.nesting, unknown_ratio=a.unknown_ratio, seed=a.seed))
+    for i, text in enumerate(gen.labels(a.n)):
+        print(json.dumps({"id": i, "ingredients_text": text}))
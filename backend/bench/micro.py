@@ -0,0 +1,52 @@
+# Micro-benchmarks: one entry per service function, timed over the same labels.
+import time
+from typing import Any, Callable, Dict, List
+
+from services.compose import compose_decision_card
+from services.intent import infer_intent
+from services.knowledge import KnowledgeBase
+from services.normalize import clear_token_memo, normalize_ingredients
+from services.scoring import score_all_intents, score_fit
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _entry(seconds: float, ops: int, **extra) -> Dict[str, Any]:
+    return {
+        "ops": ops,
+        "us_per_op": round(seconds / ops * 1e6, 3),
+        "ops_per_sec": round(ops / seconds, 1) if seconds else None,
+        **extra,
+    }
+
+def run_micro(labels: List[str], kb: KnowledgeBase, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    n = len(labels)
+    normalized = [normalize_ingredients(t, kb) for t in labels]
+    intents = [infer_intent(x, None, {}) for x in normalized]
+    fits = [score_fit(x, i) for x, i in zip(normalized, intents)]
+    ingredients = sum(len(x) for x in normalized)
+    terms = [ing["raw"] for x in normalized for ing in x]
+
+    out: Dict[str, Dict[str, Any]] = {}
+
+    clear_token_memo()
+    t = _best(lambda: [normalize_ingredients(x, kb, use_memo=False) for x in labels], repeat)
+    out["normalize.cold"] = _entry(t, n, us_per_ingredient=round(t / ingredients * 1e6, 3))
+    [normalize_ingredients(x, kb) for x in labels]  # warm the memo
+    t = _best(lambda: [normalize_ingredients(x, kb) for x in labels], repeat)
+    out["normalize.memo"] = _entry(t, n, us_per_ingredient=round(t / ingredients * 1e6, 3))
+
+    out["kb.resolve"] = _entry(_best(lambda: [kb.resolve(x) for x in terms], repeat), len(terms))
+    out["kb.scan"] = _entry(_best(lambda: [kb.scan(x) for x in terms], repeat), len(terms))
+    out["infer_intent"] = _entry(_best(lambda: [infer_intent(x, None, {}) for x in normalized], repeat), n)
+    out["score_fit"] = _entry(
+        _best(lambda: [score_fit(x, i) for x, i in zip(normalized, intents)], repeat), n)
+    out["score_all_intents"] = _entry(_best(lambda: [score_all_intents(x) for x in normalized], repeat), n)
+    out["compose_decision_card"] = _entry(
+        _best(lambda: [compose_decision_card(x, i, f) for x, i, f in zip(normalized, intents, fits)], repeat), n)
+    return out
@@ -0,0 +1,71 @@
+# Benchmark suite: micro-benchmarks per service function plus an in-process
+# end-to-end load test, written as JSON so runs can be diffed across commits.
+#   cd backend && python -m bench.run --out bench_results.json
+#   python -m bench.compare old.json new.json
+import argparse
+import json
+import platform
+import subprocess
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from bench.e2e import run_e2e
+from bench.labelgen import LabelConfig, LabelGenerator
+from bench.micro import run_micro
+from services.knowledge import KnowledgeBase
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--nesting", type=int, default=1)
+    ap.add_argument("--unknown-ratio", type=float, default=0.15)
+    ap.add_argument("--synonym-ratio", type=float, default=0.2)
+    ap.add_argument("--enumber-ratio", type=float, default=0.1)
+    ap.add_argument("--min-tokens", type=int, default=6)
+    ap.add_argument("--max-tokens", type=int, default=18)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--skip-e2e", action="store_true")
+    ap.add_argument("--out", default="-", help="JSON output path (default: stdout)")
+    a = ap.parse_args()
+
+    cfg = LabelConfig(
+        min_tokens=a.min_tokens, max_tokens=a.max_tokens, nesting=a.nesting,
+        unknown_ratio=a.unknown_ratio, synonym_ratio=a.synonym_ratio,
+        enumber_ratio=a.enumber_ratio, seed=a.seed,
+    )
+    labels = LabelGenerator(cfg).labels(a.labels)
+    kb = KnowledgeBase.load_default()
+
+    report = {
+        "meta": {
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": int(time.time()),
+            "labels": len(labels),
+            "label_config": asdict(cfg),
+            "kb_version": kb.version,
+        },
+        "micro": run_micro(labels, kb, repeat=a.repeat),
+    }
+    if not a.skip_e2e:
+        report["e2e"] = run_e2e(labels, concurrency=a.concurrency)
+
+    text = json.dumps(report, indent=2)
+    if a.out == "-":
+        print(text)
+    else:
+        Path(a.out).write_text(text + "\n", encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+from services.knowledge import DEFAULT_SNAPSHOT, DEFAULT_SOURCE, KnowledgeBase
+from services.precomputed import DEFAULT_PATH as DEFAULT_PRECOMPUTED, build_artifact
+from services.products import DEFAULT_DB as DEFAULT_PRODUCTS_DB, ProductStore
+from services.rules import current_rules
+from services.snapshot import build_snapshot
+from services.stream import CHUNK_ROWS, FORMATS, WINDOW, analyze_stream
+from services.workers import BATCH_WORKERS, analyze_many, start_pool, stop_pool
+
+READ_BYTES = 1 << 16
+
+def _load_kb() -> KnowledgeBase:
+    # bulk commands fan out over the process pool, forked here up front
+    kb = KnowledgeBase.load_default()
+    if BATCH_WORKERS > 1:
+        start_pool(kb)
+    return kb
+
+async def _read_chunks(fh):
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, fh.read, READ_BYTES)
+        if not chunk:
+            break
+        yield chunk
+
+async def _score(args) -> None:
+    kb = _load_kb()
+    src = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+    dst = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    try:
+        async for line in analyze_stream(_read_chunks(src), args.format, kb, args.chunk_rows, args.window):
+            dst.write(line)
+        dst.flush()
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout.buffer:
+            dst.close()
+
+def _catalog_rows(fh, fmt: str):
+    text = io.TextIOWrapper(fh, encoding="utf-8", errors="replace")
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if line.strip():
+            yield json.loads(line)
+
+def _index_products(args) -> None:
+    # analyze every catalog row (one analysis per distinct recipe) into the product store
+    kb = _load_kb()
+    store = ProductStore(Path(args.db))
+    src = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+    t0 = time.perf_counter()
+    indexed = failed = 0
+    batch = []
+
+    def flush():
+        nonlocal indexed, failed
+        rules_version = current_rules().version  # read first: a reload mid-batch only means a re-score at load
+        outcomes = analyze_many([(r["ingredients_text"], None, None) for r in batch], kb)
+        ok = [(r["id"], r.get("name"), out["result"]) for r, out in zip(batch, outcomes) if out["ok"]]
+        indexed += store.add_many(ok, kb.version, rules_version)
+        failed += len(batch) - len(ok)
+        batch.clear()
+
+    try:
+        for row in _catalog_rows(src, args.format):
+            if not row.get("id") or not isinstance(row.get("ingredients_text"), str):
+                failed += 1
+                continue
+            batch.append(row)
+            if len(batch) >= args.batch:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    print(json.dumps({"indexed": indexed, "failed": failed, "seconds": round(time.perf_counter() - t0, 2)}))
+
+def _precompute(args) -> None:
+    # catalog labels x every intent -> the artifact the API answers catalog hits from
+    kb = _load_kb()
+    src = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+    try:
+        stats = build_artifact(_catalog_rows(src, args.format), Path(args.output), kb, args.chunk_rows)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    print(json.dumps(stats))
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="cli.py", description="Ingredient Copilot command line tools")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    score = sub.add_parser("score", help="stream-score NDJSON/CSV rows of {id, ingredients_text, optimize_for}")
+    score.add_argument("--input", "-i", default="-", help="input file (default: stdin)")
+    score.add_argument("--output", "-o", default="-", help="NDJSON output file (default: stdout)")
+    score.add_argument("--format", "-f", choices=FORMATS, default="ndjson")
+    score.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    score.add_argument("--window", type=int, default=WINDOW, help="max chunks in flight")
+
+    snap = sub.add_parser("build-snapshot", help="compile the knowledge-base JSON into a memory-mappable snapshot")
+    snap.add_argument("--source", default=str(DEFAULT_SOURCE))
+    snap.add_argument("--output", default=str(DEFAULT_SNAPSHOT))
+
+    products = sub.add_parser("index-products", help="analyze NDJSON/CSV rows of {id, name, ingredients_text} into the product store")
+    products.add_argument("--input", "-i", default="-", help="input file (default: stdin)")
+    products.add_argument("--format", "-f", choices=FORMATS, default="ndjson")
+    products.add_argument("--db", default=str(DEFAULT_PRODUCTS_DB), help="product store (SQLite)")
+    products.add_argument("--batch", type=int, default=1000, help="rows per write")
+
+    pre = sub.add_parser("precompute", help="precompute analyses of NDJSON/CSV rows of {ingredients_text} for every intent")
+    pre.add_argument("--input", "-i", default="-", help="input file (default: stdin)")
+    pre.add_argument("--format", "-f", choices=FORMATS, default="ndjson")
+    pre.add_argument("--output", "-o", default=str(DEFAULT_PRECOMPUTED), help="artifact; rebuilt incrementally if it exists")
+    pre.add_argument("--chunk-rows", type=int, default=256, help="labels per worker task")
+
+    args = ap.parse_args()
+    try:
+        if args.command == "score":
+            asyncio.run(_score(args))
+        elif args.command == "index-products":
+            _index_products(args)
+        elif args.command == "precompute":
+            _precompute(args)
+        elif args.command == "build-snapshot":
+            print(json.dumps(build_snapshot(Path(args.source), Path(args.output))))
+    finally:
+        stop_pool()
+
+if __name__ == "__main__":
+    main()
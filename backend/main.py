@@ -1,10 +1,45 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from routers.analyze import router as analyze_router
+from routers.alternatives import router as alternatives_router
+from routers.analyze import compact_cache, kb, router as analyze_router
 from routers.chat import router as chat_router
+from routers.compare import router as compare_router
+from routers.knowledge import router as knowledge_router
+from routers.ocr import router as ocr_router
+from routers.recipes import router as recipes_router
+from services.analysis import RESULT_CACHE
+from services.analysis_store import ANALYSES
+from services.metrics import METRICS
+from services.locales import LOCALES
+from services.normalize import token_memo_stats
+from services.ocr import OCR_JOBS
+from services.precomputed import PRECOMPUTED
+from services.products import PRODUCTS
+from services.recipes import RECIPES
+from services.workers import BATCH_WORKERS, EXECUTION_MODE, Overloaded, pool_stats, start_pool, stop_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # fork the analysis workers once the KB is loaded, so they share it instead
+    # of each loading their own. Batches and streams use them in either
+    # execution mode (one request can use every core); single analyses only
+    # with INGREDIENT_EXECUTION=process
+    if EXECUTION_MODE == "process" or BATCH_WORKERS > 1:
+        start_pool(kb)
+    try:
+        yield
+    finally:
+        OCR_JOBS.stop()
+        stop_pool()
+
+app = FastAPI(title="Ingredient Copilot API", version="1.0.0", lifespan=lifespan)
 
-app = FastAPI(title="Ingredient Copilot API", version="1.0.0")
+# catalog rows scored against another knowledge base are left out of /api/alternatives
+PRODUCTS.kb_version = kb.version
 
 # CORS for local dev (Next.js -> FastAPI)
 app.add_middleware(
@@ -17,7 +52,40 @@ app.add_middleware(
 
 app.include_router(analyze_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
+app.include_router(compare_router, prefix="/api")
+app.include_router(knowledge_router, prefix="/api")
+app.include_router(recipes_router, prefix="/api")
+app.include_router(alternatives_router, prefix="/api")
+app.include_router(ocr_router, prefix="/api")
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # shed load early rather than queueing; clients retry shortly
+    return JSONResponse(status_code=503, content={"detail": f"Server busy: {exc}"}, headers={"Retry-After": "1"})
 
 @app.get("/health")
 def health():
     return {"ok": True}
+
+@app.get("/metrics")
+def metrics():
+    # per-process: with several uvicorn workers, each reports its own numbers.
+    # Counters and timings include the work of INGREDIENT_EXECUTION=process
+    # pool workers (merged back per task); the cache sections describe this
+    # process's caches only.
+    return {
+        **METRICS.snapshot(),
+        "caches": {
+            "analyze_results": RESULT_CACHE.stats(),
+            "compact_bodies": compact_cache.stats(),
+            "token_memo": token_memo_stats(),
+            "analyses": ANALYSES.stats(),
+            "recipes": RECIPES.stats(),
+            "products": PRODUCTS.stats(),
+            "locale_shards": LOCALES.stats(),
+            "precomputed": PRECOMPUTED.stats(),
+        },
+        "pool": pool_stats(),
+        "ocr": OCR_JOBS.stats(),
+    }
+
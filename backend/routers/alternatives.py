@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+
+from services.analysis_store import ANALYSES
+from services.intent import INTENTS
+from services.products import PRODUCTS
+from services.recipes import canonical_set
+
+router = APIRouter(tags=["alternatives"])
+
+class AlternativesRequest(BaseModel):
+    analysis_id: str = Field(..., description="analysis_id returned by /api/analyze")
+    intent: Optional[str] = Field(default=None, description="Goal to improve on (default: the analysis's top intent)")
+    k: int = Field(default=5, ge=1, le=50)
+    min_overlap: float = Field(default=0.5, gt=0.0, le=1.0, description="Minimum ingredient overlap (Jaccard)")
+    avoid_flags: List[str] = Field(default_factory=list, description="Skip products carrying any of these flags")
+
+class AlternativesResponse(BaseModel):
+    intent: str
+    fit_score: int
+    alternatives: List[Dict[str, Any]]
+
+@router.post("/alternatives", response_model=AlternativesResponse)
+def alternatives(req: AlternativesRequest):
+    # catalog products (cli.py index-products) that fit the goal better and share most ingredients
+    analysis = ANALYSES.get(req.analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis_id; re-run /api/analyze")
+    state = analysis.state
+    intent = req.intent or state.get("inferred_intent", {}).get("top_intent", "general")
+    if intent not in INTENTS:
+        raise HTTPException(status_code=400, detail=f"Unknown intent: {intent}")
+    fit_score = int(state.get("fit_by_intent", {}).get(intent, {}).get("fit_score", 0))
+    found = PRODUCTS.alternatives(
+        canonical_set(state.get("normalized_ingredients") or []),
+        intent, fit_score, k=req.k, min_overlap=req.min_overlap, avoid_flags=req.avoid_flags,
+    )
+    return AlternativesResponse(intent=intent, fit_score=fit_score, alternatives=found)
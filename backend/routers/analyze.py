@@ -1,17 +1,37 @@
-from fastapi import APIRouter
+import os
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, Dict, Any, List
 
+from services.analysis import RESULT_CACHE, CacheKey, analysis_id, cache_key, cached_analysis, remember
+from services.analysis_store import ANALYSES
+from services.cache import LRUCache
+from services.compact import encode_compact
 from services.knowledge import KnowledgeBase
-from services.normalize import normalize_ingredients
-from services.intent import infer_intent
-from services.scoring import score_fit
-from services.compose import compose_decision_card
+from services.locales import LOCALES, UnknownLocale
+from services.incremental import get_session, new_session
+from services.metrics import METRICS
+from services.pipeline import analysis_version, analyze_normalized, run_pipeline
+from services.precomputed import PRECOMPUTED, Hit, artifact_version
+from services.profiler import SamplingProfiler
+from services.rules import current_rules
+from services.stream import FORMATS, WINDOW, analyze_stream
+from services.workers import GATE, analyze_many, batch_weight
 
 router = APIRouter(tags=["analyze"])
 
 kb = KnowledgeBase.load_default()
 
+MAX_BATCH_ITEMS = 1000
+# X-Debug-Profile is honoured only when enabled (it bypasses the cache and samples stacks)
+DEBUG_PROFILE = os.environ.get("INGREDIENT_DEBUG_PROFILE", "").lower() in ("1", "true", "yes", "on")
+
+# encoded compact bodies for the analyze cache's keys: a repeat is a dict lookup, no encoding
+compact_cache = LRUCache(max_entries=RESULT_CACHE.max_entries, ttl_seconds=RESULT_CACHE.ttl_seconds)
+
 class AnalyzeRequest(BaseModel):
     ingredients_text: str = Field(..., description="Raw ingredients text (comma-separated is fine)")
     optimize_for: Optional[str] = Field(
@@ -22,34 +42,234 @@ class AnalyzeRequest(BaseModel):
         default=None,
         description="Optional preference ledger (e.g., {'avoid': ['lactose'], 'limit': ['added_sugar']})"
     )
+    locale: Optional[str] = Field(
+        default=None,
+        description="Optional label locale (e.g., de, fr-FR, hi, en-US); detected from the text when omitted"
+    )
 
 class AnalyzeResponse(BaseModel):
     normalized_ingredients: List[Dict[str, Any]]
     inferred_intent: Dict[str, Any]
     decision_card: Dict[str, Any]
+    fit_by_intent: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="Fit (score, color, flags) under each supported intent"
+    )
+    fingerprint: Optional[str] = Field(
+        default=None,
+        description="Recipe fingerprint: the same for labels that resolve to the same set of ingredients"
+    )
     debug: Dict[str, Any]
+    analysis_id: Optional[str] = Field(
+        default=None,
+        description="Server-side handle for this analysis; pass it to /api/chat instead of the state"
+    )
+
+class AnalyzeBatchRequest(BaseModel):
+    items: List[AnalyzeRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_ITEMS,
+        description="Labels to analyze; results are returned in the same order"
+    )
+
+class AnalyzeBatchItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[AnalyzeResponse] = None
+    error: Optional[str] = None
+
+class AnalyzeBatchResponse(BaseModel):
+    results: List[AnalyzeBatchItem]
+
+class TextEdit(BaseModel):
+    start: int = Field(..., ge=0, description="Start offset in the current text")
+    end: int = Field(..., ge=0, description="End offset (exclusive) in the current text")
+    text: str = Field(default="", description="Replacement text")
+
+class IncrementalAnalyzeRequest(BaseModel):
+    session_id: Optional[str] = Field(default=None, description="Session from a previous incremental call")
+    ingredients_text: Optional[str] = Field(
+        default=None,
+        description="Full current text. Starts a session, or is diffed against the session's text"
+    )
+    edits: List[TextEdit] = Field(default_factory=list, description="Edits applied in order to the session's text")
+    optimize_for: Optional[str] = None
+    user_prefs: Optional[Dict[str, Any]] = None
+    locale: Optional[str] = Field(default=None, description="Label locale (e.g. de, fr-FR); detected when omitted")
+
+class IncrementalAnalyzeResponse(AnalyzeResponse):
+    session_id: str
+    incremental: Dict[str, Any]
+
+def _cache_key(req: AnalyzeRequest) -> CacheKey:
+    return cache_key(req.ingredients_text, req.optimize_for, req.user_prefs, req.locale)
+
+def check_locale(locale: Optional[str]) -> None:
+    if locale:
+        try:
+            LOCALES.locale_for(locale)
+        except UnknownLocale as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def _respond(result: Dict[str, Any]) -> Response:
+    # validate + encode once here (timed) instead of letting FastAPI redo it
+    with METRICS.timer("serialize"):
+        body = AnalyzeResponse(**result).model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+def _profiled(req: AnalyzeRequest, compact: bool = False) -> Response:
+    # opt-in per request: bypass the cache and report where the time went
+    stages: Dict[str, float] = {}
+    with SamplingProfiler() as prof:
+        result = run_pipeline(req.ingredients_text, kb, req.optimize_for, req.user_prefs, stages=stages, locale=req.locale)
+        with METRICS.timer("serialize", stages):
+            AnalyzeResponse(**result).model_dump_json()
+    debug = {**result["debug"], "profile": {"stages_ms": stages, "sampler": prof.report()}}
+    result = remember(_cache_key(req), {**result, "debug": debug}, kb)
+    if compact:
+        return Response(content=encode_compact(result, kb.version, debug=True), media_type="application/json")
+    return _respond(result)
+
+def _precomputed(key: CacheKey, hit: Hit, compact: bool, debug: bool) -> Response:
+    # catalog label answered from the precomputed artifact: no pipeline, no encoding
+    aid = analysis_id(key, kb)
+    ANALYSES.put_lazy(aid, hit.result)
+    body = hit.compact_body(kb.version, aid, debug) if compact else hit.body(aid)
+    return Response(content=body, media_type="application/json")
+
+def _store_and_respond(
+    key: CacheKey,
+    result: Dict[str, Any],
+    compact: bool = False,
+    debug: bool = False,
+) -> Response:
+    result = remember(key, result, kb)
+    if not compact:
+        return _respond(result)
+    compact_cache.bind_version(analysis_version(kb))
+    body = compact_cache.get((key, debug))
+    if body is None:
+        with METRICS.timer("serialize_compact"):
+            body = encode_compact(result, kb.version, debug)
+        compact_cache.put((key, debug), body)
+    return Response(content=body, media_type="application/json")
 
 @router.post("/analyze", response_model=AnalyzeResponse)
-def analyze(req: AnalyzeRequest):
-    # 1) Normalize and tag ingredients
-    normalized = normalize_ingredients(req.ingredients_text, kb)
-
-    # 2) Infer intent (intent-first without forms)
-    intent = infer_intent(normalized, optimize_for=req.optimize_for, user_prefs=req.user_prefs or {})
-
-    # 3) Score fit (traffic-light)
-    fit = score_fit(normalized, intent)
-
-    # 4) Compose decision card for UI
-    card = compose_decision_card(normalized, intent, fit)
-
-    return AnalyzeResponse(
-        normalized_ingredients=normalized,
-        inferred_intent=intent,
-        decision_card=card,
-        debug={
-            "fit": fit,
-            "optimize_for": req.optimize_for,
-            "user_prefs": req.user_prefs or {}
-        }
-    )
\ No newline at end of file
+async def analyze(
+    req: AnalyzeRequest,
+    compact: bool = Query(
+        default=False,
+        description="Ingredients as {raw, id} referencing GET /api/kb; debug omitted unless debug=true"
+    ),
+    debug: bool = Query(default=False, description="Include debug data in compact responses"),
+    x_debug_profile: Optional[str] = Header(default=None),
+):
+    METRICS.incr("analyze_requests")
+    if DEBUG_PROFILE and x_debug_profile and x_debug_profile.lower() not in ("0", "false", "no"):
+        check_locale(req.locale)
+        return await run_in_threadpool(_profiled, req, compact)
+    if PRECOMPUTED.path is not None and not req.user_prefs and not req.locale:
+        key = _cache_key(req)
+        hit = PRECOMPUTED.lookup(key[0], req.optimize_for, artifact_version(kb.version, current_rules().version, LOCALES.signature))
+        if hit is not None:
+            return _precomputed(key, hit, compact, debug)
+    check_locale(req.locale)
+    key, result = await cached_analysis(kb, req.ingredients_text, req.optimize_for, req.user_prefs, req.locale)
+    # store write + validate/encode stay off the event loop
+    return await run_in_threadpool(_store_and_respond, key, result, compact, debug)
+
+@router.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+def analyze_batch(req: AnalyzeBatchRequest):
+    RESULT_CACHE.bind_version(analysis_version(kb))
+    keys = [_cache_key(it) for it in req.items]
+    outcomes: List[Optional[Dict[str, Any]]] = []
+    for key in keys:
+        hit = RESULT_CACHE.get(key)
+        outcomes.append({"ok": True, "result": hit} if hit is not None else None)
+
+    misses = [i for i, out in enumerate(outcomes) if out is None]
+    if misses:
+        # admitted like single analyses, weighted by the pool tasks it queues (503 past the limit)
+        with GATE.slot(batch_weight(len(misses))):
+            fresh = analyze_many(
+                [(it.ingredients_text, it.optimize_for, it.user_prefs, it.locale) for it in (req.items[i] for i in misses)],
+                kb,
+            )
+        for i, out in zip(misses, fresh):
+            if out["ok"]:
+                RESULT_CACHE.put(keys[i], out["result"])
+            outcomes[i] = out
+
+    return AnalyzeBatchResponse(results=[
+        AnalyzeBatchItem(index=i, **out) for i, out in enumerate(outcomes)
+    ])
+
+class DuplexStreamingResponse(StreamingResponse):
+    # The body generator consumes the request stream itself, so it must be the
+    # only receive() caller; the stock disconnect listener would steal chunks.
+    # A client disconnect still surfaces as a send() failure.
+    # The stream holds a GATE slot as wide as its window of in-flight chunks
+    # for as long as it runs; refused (503) before the first byte is sent.
+    def __init__(self, content, weight: int = 1, **kwargs):
+        super().__init__(content, **kwargs)
+        self.weight = weight
+
+    async def __call__(self, scope, receive, send) -> None:
+        with GATE.slot(self.weight):
+            await self.stream_response(send)
+
+@router.post("/analyze/incremental", response_model=IncrementalAnalyzeResponse)
+def analyze_incremental(req: IncrementalAnalyzeRequest):
+    # live-typing / OCR-correction flow: only fragments touched by the edit are
+    # re-tokenized and re-resolved; the rest of the label's records are reused
+    check_locale(req.locale)
+    session = get_session(req.session_id, kb, req.locale)
+    stages: Dict[str, float] = {}
+    if session is None:
+        if req.ingredients_text is None:
+            raise HTTPException(status_code=409, detail="Unknown or expired session_id; resend ingredients_text")
+        with METRICS.timer("normalize", stages):
+            session = new_session(kb, req.ingredients_text, req.locale)
+            normalized = session.normalized()
+            locale_info = session.locale_info
+        mode, resolved = "new", len(session.records)
+    else:
+        with session.lock:
+            with METRICS.timer("normalize_incremental", stages):
+                try:
+                    if req.ingredients_text is not None:
+                        resolved = session.replace_text(req.ingredients_text)
+                    else:
+                        resolved = sum(session.apply_edit(e.start, e.end, e.text) for e in req.edits)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                normalized = session.normalized()
+                locale_info = session.locale_info
+        mode = "patched"
+
+    result = analyze_normalized(normalized, req.optimize_for, req.user_prefs, stages)
+    result["debug"]["locale"] = locale_info
+    return IncrementalAnalyzeResponse(
+        **result,
+        session_id=session.id,
+        incremental={
+            "mode": mode,
+            "fragments_resolved": resolved,
+            "fragments_total": len(session.records),
+            "stages_ms": stages,
+        },
+    )
+
+@router.post("/analyze/stream")
+async def analyze_stream_endpoint(request: Request, format: Optional[str] = None):
+    # body: NDJSON ({id, ingredients_text, optimize_for}) or CSV with a header row;
+    # response: one NDJSON result per input row, in input order, while reading
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    return DuplexStreamingResponse(analyze_stream(request.stream(), fmt, kb), weight=WINDOW, media_type="application/x-ndjson")
+
+@router.get("/analyze/cache")
+def analyze_cache_stats():
+    return RESULT_CACHE.stats()
@@ -1,13 +1,18 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
+from services.analysis_store import ANALYSES, StoredAnalysis
 from services.chat_logic import answer_followup
 
 router = APIRouter(tags=["chat"])
 
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User follow-up question")
-    analysis_state: Dict[str, Any] = Field(..., description="Decision card + normalized ingredients + intent")
+    analysis_id: Optional[str] = Field(default=None, description="analysis_id returned by /api/analyze")
+    analysis_state: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Decision card + normalized ingredients + intent; only needed without analysis_id"
+    )
 
 class ChatResponse(BaseModel):
     reply: str
@@ -15,5 +20,15 @@ class ChatResponse(BaseModel):
 
 @router.post("/chat", response_model=ChatResponse)
 def chat(req: ChatRequest):
-    reply, actions = answer_followup(req.message, req.analysis_state)
+    if req.analysis_id:
+        analysis = ANALYSES.get(req.analysis_id)
+        if analysis is None:
+            if req.analysis_state is None:
+                raise HTTPException(status_code=404, detail="Unknown or expired analysis_id; re-run /api/analyze")
+            analysis = StoredAnalysis(None, req.analysis_state)
+    elif req.analysis_state is not None:
+        analysis = StoredAnalysis(None, req.analysis_state)
+    else:
+        raise HTTPException(status_code=400, detail="Send analysis_id (or analysis_state)")
+    reply, actions = answer_followup(req.message, analysis)
     return ChatResponse(reply=reply, suggested_actions=actions)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+
+from routers.analyze import check_locale, kb
+from services.compare import compare_products
+from services.intent import INTENTS
+from services.workers import offload
+
+router = APIRouter(tags=["compare"])
+
+MAX_COMPARE_PRODUCTS = 20
+
+class CompareProduct(BaseModel):
+    name: Optional[str] = Field(default=None, description="Display name, echoed back")
+    ingredients_text: str = Field(..., description="Raw ingredients text")
+
+class CompareRequest(BaseModel):
+    products: List[CompareProduct] = Field(..., min_length=1, max_length=MAX_COMPARE_PRODUCTS)
+    intents: Optional[List[str]] = Field(
+        default=None,
+        description="Goals to score every product against (default: all supported intents)"
+    )
+    user_prefs: Optional[Dict[str, Any]] = None
+    locale: Optional[str] = Field(default=None, description="Locale of the labels (e.g. de); detected per label when omitted")
+
+class CompareResponse(BaseModel):
+    intents: List[str]
+    products: List[Dict[str, Any]]
+    matrix: Dict[str, List[int]] = Field(..., description="intent -> fit score per product, in request order")
+    best: Dict[str, List[int]] = Field(..., description="intent -> indexes of the top-scoring product(s)")
+    differences: Dict[str, Any]
+
+@router.post("/compare", response_model=CompareResponse)
+async def compare(req: CompareRequest):
+    intents = list(dict.fromkeys(req.intents or INTENTS))
+    unknown = [i for i in intents if i not in INTENTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown intent(s): {', '.join(unknown)}")
+    check_locale(req.locale)
+
+    result = await offload(
+        compare_products, kb,
+        texts=[p.ingredients_text for p in req.products], intents=intents, user_prefs=req.user_prefs,
+        locale=req.locale,
+    )
+    for product, item in zip(result["products"], req.products):
+        product["name"] = item.name
+    return CompareResponse(**result)
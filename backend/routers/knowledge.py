@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Header
+from fastapi.responses import Response
+from typing import Optional
+
+from routers.analyze import kb
+from services.compact import KB_METADATA
+
+router = APIRouter(tags=["knowledge"])
+
+def _weak(tag: str) -> str:
+    # If-None-Match compares weakly: W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+@router.get("/kb")
+def kb_metadata(if_none_match: Optional[str] = Header(default=None)):
+    # static per-ingredient metadata for compact analyze responses (ids are the keys);
+    # fetch once per kb_version, revalidate with If-None-Match
+    etag, body = KB_METADATA.get(kb)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if if_none_match and (if_none_match.strip() == "*" or _weak(etag) in (_weak(t) for t in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,63 @@
+import json
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Dict, Any
+
+from routers.analyze import check_locale, kb
+from services.analysis import cached_analysis, remember
+from services.ocr import MAX_IMAGE_BYTES, OCR_JOBS
+
+router = APIRouter(tags=["ocr"])
+
+def _analyzer(optimize_for: Optional[str], user_prefs: Optional[Dict[str, Any]], locale: Optional[str]):
+    # OCR text -> the regular analyze path (cache, offload, analysis_id)
+    async def on_text(text: str) -> Dict[str, Any]:
+        key, result = await cached_analysis(kb, text, optimize_for, user_prefs, locale)
+        return await run_in_threadpool(remember, key, result, kb)
+    return on_text
+
+@router.post("/ocr", status_code=202)
+async def submit_label_image(
+    image: UploadFile = File(..., description="Photo of the ingredients label"),
+    optimize_for: Optional[str] = Form(default=None),
+    user_prefs: Optional[str] = Form(default=None, description="JSON preference ledger"),
+    locale: Optional[str] = Form(default=None, description="Label locale; detected from the OCR text when omitted"),
+):
+    # queued, not processed inline: poll GET /api/ocr/{job_id} or stream .../stream
+    prefs = None
+    if user_prefs:
+        try:
+            prefs = json.loads(user_prefs)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="user_prefs must be a JSON object")
+        if not isinstance(prefs, dict):
+            raise HTTPException(status_code=400, detail="user_prefs must be a JSON object")
+    check_locale(locale)
+    data = await image.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_IMAGE_BYTES} bytes")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image")
+    job = OCR_JOBS.submit(data, image.content_type, _analyzer(optimize_for, prefs, locale))
+    return JSONResponse(
+        status_code=202,
+        content={**job.view(), "status_url": f"/api/ocr/{job.id}", "stream_url": f"/api/ocr/{job.id}/stream"},
+        headers={"Location": f"/api/ocr/{job.id}"},
+    )
+
+def _job(job_id: str):
+    job = OCR_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired OCR job")
+    return job
+
+@router.get("/ocr/{job_id}")
+def label_image_status(job_id: str):
+    return _job(job_id).view()
+
+@router.get("/ocr/{job_id}/stream")
+def label_image_stream(job_id: str):
+    # NDJSON: one line per status change, the last one is done/failed
+    return StreamingResponse(OCR_JOBS.watch(_job(job_id)), media_type="application/x-ndjson")
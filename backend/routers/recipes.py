@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+
+from routers.analyze import kb
+from services.analysis_store import ANALYSES
+from services.intent import INTENTS
+from services.pipeline import analysis_version
+from services.recipes import RECIPES, canonical_set, fingerprint
+
+router = APIRouter(tags=["recipes"])
+
+class SimilarRequest(BaseModel):
+    analysis_id: str = Field(..., description="analysis_id returned by /api/analyze")
+    intent: Optional[str] = Field(default=None, description="Goal to compare fit under (default: the analysis's top intent)")
+    greener: bool = Field(default=True, description="Only lookalikes with a better fit for the intent")
+    min_jaccard: float = Field(default=0.5, ge=0.0, le=1.0, description="Minimum ingredient-set overlap")
+    limit: int = Field(default=5, ge=1, le=50)
+
+class SimilarResponse(BaseModel):
+    fingerprint: str
+    intent: str
+    fit_score: Optional[int] = None
+    matches: List[Dict[str, Any]]
+
+@router.post("/similar", response_model=SimilarResponse)
+def similar(req: SimilarRequest):
+    # lookalike recipes from the catalog-scoring index ("similar but greener")
+    analysis = ANALYSES.get(req.analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis_id; re-run /api/analyze")
+    state = analysis.state
+    intent = req.intent or state.get("inferred_intent", {}).get("top_intent", "general")
+    if intent not in INTENTS:
+        raise HTTPException(status_code=400, detail=f"Unknown intent: {intent}")
+
+    normalized = state.get("normalized_ingredients") or []
+    ingredients = canonical_set(normalized)
+    fp = fingerprint(normalized)
+    fit_score = state.get("fit_by_intent", {}).get(intent, {}).get("fit_score")
+    version = analysis_version(kb)
+    if req.greener and fit_score is not None:
+        matches = RECIPES.greener(ingredients, intent, fit_score, req.min_jaccard, req.limit, version=version)
+    else:
+        matches = RECIPES.similar(ingredients, req.min_jaccard, req.limit + 1, version=version)
+    matches = [m for m in matches if m["fingerprint"] != fp][:req.limit]
+    return SimilarResponse(fingerprint=fp, intent=intent, fit_score=fit_score, matches=matches)
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from services.analysis_store import ANALYSES
+from services.cache import LRUCache
+from services.knowledge import KnowledgeBase
+from services.pipeline import analysis_version, run_pipeline
+from services.workers import offload
+
+# One label's analysis as the API serves it (/api/analyze, OCR jobs): looked
+# up in the result cache, else run on the pool / threadpool, and stored under
+# an analysis_id for follow-up chat.
+
+# normalized label, hint, prefs, locale
+CacheKey = Tuple[str, Optional[str], str, Optional[str]]
+
+# identical label + hint + prefs => identical analysis; skip the pipeline on repeats
+RESULT_CACHE = LRUCache(
+    max_entries=int(os.environ.get("INGREDIENT_CACHE_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.environ.get("INGREDIENT_CACHE_TTL", "600")),
+)
+
+def cache_key(text: str, optimize_for: Optional[str] = None, user_prefs: Optional[Dict[str, Any]] = None,
+              locale: Optional[str] = None) -> CacheKey:
+    # whitespace/case variants of the same label share an entry
+    prefs = json.dumps(user_prefs or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return (" ".join(text.lower().split()), optimize_for, prefs, locale)
+
+def analysis_id(key: CacheKey, kb: KnowledgeBase) -> str:
+    # same label + hint + prefs on the same KB/rules/shards => same id
+    raw = json.dumps([analysis_version(kb), *key], separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+def remember(key: CacheKey, result: Dict[str, Any], kb: KnowledgeBase) -> Dict[str, Any]:
+    # store for follow-up chat; the result gains its analysis_id
+    aid = analysis_id(key, kb)
+    ANALYSES.put(aid, result)
+    return {**result, "analysis_id": aid}
+
+async def cached_analysis(
+    kb: KnowledgeBase,
+    text: str,
+    optimize_for: Optional[str] = None,
+    user_prefs: Optional[Dict[str, Any]] = None,
+    locale: Optional[str] = None,
+) -> Tuple[CacheKey, Dict[str, Any]]:
+    # the locale must be known (LOCALES.locale_for); callers check it first
+    # cached analyses are stale once the KB, scoring rules or shards change
+    RESULT_CACHE.bind_version(analysis_version(kb))
+    key = cache_key(text, optimize_for, user_prefs, locale)
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        # CPU-bound: pool worker or threadpool (see services.workers); Overloaded when busy
+        result = await offload(
+            run_pipeline, kb,
+            ingredients_text=text, optimize_for=optimize_for, user_prefs=user_prefs, locale=locale,
+        )
+        RESULT_CACHE.put(key, result)
+    return key, result
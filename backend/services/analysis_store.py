@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# the parts of an analysis that follow-up chat reads
+STATE_KEYS = ("normalized_ingredients", "inferred_intent", "decision_card", "fit_by_intent")
+
+def flag_index(normalized: List[Dict[str, Any]]) -> Dict[str, Tuple[str, ...]]:
+    # flag -> raw names carrying it, in label order
+    out: Dict[str, List[str]] = {}
+    for ing in normalized:
+        for flag in dict.fromkeys(ing.get("flags") or ()):
+            out.setdefault(flag, []).append(ing["raw"])
+    return {flag: tuple(raws) for flag, raws in out.items()}
+
+class StoredAnalysis:
+    __slots__ = ("id", "state", "by_flag")
+
+    def __init__(self, analysis_id: Optional[str], state: Dict[str, Any]):
+        self.id = analysis_id
+        self.state = state
+        self.by_flag = flag_index(state.get("normalized_ingredients") or [])
+
+    def list_by_flag(self, flag: str) -> List[str]:
+        return list(self.by_flag.get(flag, ()))
+
+class AnalysisStore:
+    # analysis_id -> StoredAnalysis. Hot entries live in an in-process LRU with
+    # TTL; with db_path set, every analysis is also written to a local SQLite
+    # file so ids survive restarts and are shared by workers on one host.
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600, db_path: Optional[Path] = None):
+        self.ttl_seconds = ttl_seconds
+        self._memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        # analysis_id -> loader, for analyses answered from precomputed bytes:
+        # decoded (and persisted) only if a follow-up asks for them
+        self._lazy = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.db_hits = 0
+        if db_path:
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses (id TEXT PRIMARY KEY, created REAL NOT NULL, state TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created)")
+
+    def put(self, analysis_id: str, result: Dict[str, Any]) -> StoredAnalysis:
+        # ids are content-derived, so a repeat of a live analysis is a no-op
+        hit = self._memory.get(analysis_id)
+        if hit is not None:
+            return hit
+        entry = StoredAnalysis(analysis_id, {k: result[k] for k in STATE_KEYS if k in result})
+        self._memory.put(analysis_id, entry)
+        if self._db is not None:
+            self._persist(entry)
+        return entry
+
+    def put_lazy(self, analysis_id: str, load: Callable[[], Dict[str, Any]]) -> None:
+        self._lazy.put(analysis_id, load)
+
+    def get(self, analysis_id: str) -> Optional[StoredAnalysis]:
+        entry = self._memory.get(analysis_id)
+        if entry is None:
+            load = self._lazy.get(analysis_id)
+            if load is not None:
+                return self.put(analysis_id, load())
+        if entry is None and self._db is not None:
+            entry = self._load(analysis_id)
+            if entry is not None:
+                self.db_hits += 1
+                self._memory.put(analysis_id, entry)
+        return entry
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def _persist(self, entry: StoredAnalysis) -> None:
+        body = json.dumps(entry.state, separators=(",", ":"), default=list)
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analyses (id, created, state) VALUES (?, ?, ?)",
+                    (entry.id, time.time(), body),
+                )
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self._db.execute("DELETE FROM analyses WHERE created < ?", (self._cutoff(),))
+        except sqlite3.Error as e:
+            # the in-memory tier still has it; persistence is best effort
+            logger.warning("analysis store: write failed: %s", e)
+
+    def _load(self, analysis_id: str) -> Optional[StoredAnalysis]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT state FROM analyses WHERE id = ? AND created >= ?",
+                    (analysis_id, self._cutoff()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("analysis store: read failed: %s", e)
+            return None
+        return StoredAnalysis(analysis_id, json.loads(row[0])) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._memory.stats(), "persistent": self._db is not None, "db_hits": self.db_hits}
+
+ANALYSES = AnalysisStore(
+    max_entries=int(os.environ.get("INGREDIENT_ANALYSIS_SESSIONS", "4096")),
+    ttl_seconds=float(os.environ.get("INGREDIENT_ANALYSIS_TTL", "3600")),
+    db_path=os.environ.get("INGREDIENT_ANALYSIS_DB") or None,
+)
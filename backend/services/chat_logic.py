@@ -1,68 +1,108 @@
-from typing import Dict, Any, List, Tuple
-import re
+from typing import Any, Callable, Dict, List, Tuple
 
-def answer_followup(message: str, state: Dict[str, Any]) -> Tuple[str, List[str]]:
+from services.analysis_store import StoredAnalysis
+from services.chat_router import FollowupRouter
+from services.products import PRODUCTS
+from services.recipes import canonical_set
+
+class FollowupContext:
+    # what a follow-up handler gets: the lowercased message + the stored analysis
+    __slots__ = ("message", "analysis", "card", "intent", "color", "fit_score")
+
+    def __init__(self, message: str, analysis: StoredAnalysis):
+        state = analysis.state
+        self.message = message
+        self.analysis = analysis
+        self.card: Dict[str, Any] = state.get("decision_card", {})
+        self.intent: str = state.get("inferred_intent", {}).get("top_intent", "general")
+        self.fit_score = self.card.get("fit_score", None)
+        self.color: str = self.card.get("color", "unknown")
+
+    def list_by_flag(self, flag: str) -> List[str]:
+        # flag -> ingredients was indexed once when the analysis was stored
+        return self.analysis.list_by_flag(flag)
+
+Handler = Callable[[FollowupContext], Tuple[str, List[str]]]
+
+# Follow-up handlers register here (see register_followup); the router is
+# compiled once, the first matching route by priority answers.
+ROUTER: FollowupRouter[Handler] = FollowupRouter()
+register_followup = ROUTER.register
+
+def answer_followup(message: str, analysis: StoredAnalysis) -> Tuple[str, List[str]]:
     msg = (message or "").strip().lower()
+    return ROUTER.route(msg)(FollowupContext(msg, analysis))
+
+# Simple FAQ-style follow-ups
+
+@register_followup("daily", patterns=[r"\bok(ay)? daily\b|\bevery day\b|\bdaily\b"], triggers=["daily", "every day"], priority=10)
+def _daily(ctx: FollowupContext) -> Tuple[str, List[str]]:
+    if ctx.color == "green":
+        reply = "Likely okay frequently for your current intent, but portion size matters. If you notice symptoms, reduce frequency."
+    elif ctx.color == "yellow":
+        reply = "I’d treat it as an occasional or moderate-frequency choice for your intent. If you want a daily staple, look for a simpler/less-flagged option."
+    else:
+        reply = "For your intent, daily use is not ideal. Consider alternatives with fewer red-flag ingredients for your goal."
+    actions = ["Compare with another product", "Change optimize goal", "Show ingredients flagged"]
+    return reply, actions
+
+@register_followup("explain", keywords=["explain", "like i'm 12", "eli12"], priority=20)
+def _explain(ctx: FollowupContext) -> Tuple[str, List[str]]:
+    reply = "Think of ingredients as signals. A few ingredients (like certain sugars, allergens, or additives) are the ones that usually matter. I highlight those first, explain the tradeoff, and tell you what I’m unsure about."
+    actions = ["Show top concerns", "Compare with another product"]
+    return reply, actions
+
+@register_followup("alternatives", patterns=[r"\balternatives?\b|\bcompare with\b|\binstead\b"],
+                   triggers=["alternative", "compare with", "instead"], priority=25)
+def _alternatives(ctx: FollowupContext) -> Tuple[str, List[str]]:
+    state = ctx.analysis.state
+    intent = "sugar" if "sugar" in ctx.message else ctx.intent
+    fit = state.get("fit_by_intent", {}).get(intent, {}).get("fit_score", ctx.fit_score)
+    found = PRODUCTS.alternatives(canonical_set(state.get("normalized_ingredients") or []), intent, fit or 0, k=3)
+    if found:
+        lines = [f"{p['name'] or p['id']}: {p['color'].upper()} {p['fit_score']}/100" for p in found]
+        reply = f"Similar products with a better fit for '{intent}':\n- " + "\n- ".join(lines)
+    else:
+        reply = f"I don’t know a similar product with a better fit for '{intent}' yet."
+    actions = ["Show ingredients flagged", "Change optimize goal"]
+    return reply, actions
+
+@register_followup("allergens", keywords=["allergen", "lactose", "milk"], priority=30)
+def _allergens(ctx: FollowupContext) -> Tuple[str, List[str]]:
+    allergens = ctx.list_by_flag("allergen")
+    if allergens:
+        reply = f"Allergen markers I see: {', '.join(allergens)}. If your allergy is severe, avoid and verify manufacturer cross-contamination info."
+    else:
+        reply = "I don’t see common allergen markers in the text provided, but always verify the label and any 'may contain' statements."
+    actions = ["Show uncertainty note", "Scan/paste full label text"]
+    return reply, actions
 
-    card = state.get("decision_card", {})
-    normalized = state.get("normalized_ingredients", [])
-    intent = state.get("inferred_intent", {}).get("top_intent", "general")
-
-    fit_score = card.get("fit_score", None)
-    color = card.get("color", "unknown")
-
-    def list_by_flag(flag: str) -> List[str]:
-        out = []
-        for ing in normalized:
-            if flag in set(ing.get("flags", [])):
-                out.append(ing["raw"])
-        return out
-
-    # Simple FAQ-style follow-ups
-    if re.search(r"\bok(ay)? daily\b|\bevery day\b|\bdaily\b", msg):
-        if color == "green":
-            reply = "Likely okay frequently for your current intent, but portion size matters. If you notice symptoms, reduce frequency."
-        elif color == "yellow":
-            reply = "I’d treat it as an occasional or moderate-frequency choice for your intent. If you want a daily staple, look for a simpler/less-flagged option."
-        else:
-            reply = "For your intent, daily use is not ideal. Consider alternatives with fewer red-flag ingredients for your goal."
-        actions = ["Compare with another product", "Change optimize goal", "Show ingredients flagged"]
-        return reply, actions
-
-    if "explain" in msg or "like i'm 12" in msg or "eli12" in msg:
-        reply = "Think of ingredients as signals. A few ingredients (like certain sugars, allergens, or additives) are the ones that usually matter. I highlight those first, explain the tradeoff, and tell you what I’m unsure about."
-        actions = ["Show top concerns", "Compare with another product"]
-        return reply, actions
-
-    if "allergen" in msg or "lactose" in msg or "milk" in msg:
-        allergens = list_by_flag("allergen")
-        if allergens:
-            reply = f"Allergen markers I see: {', '.join(allergens)}. If your allergy is severe, avoid and verify manufacturer cross-contamination info."
-        else:
-            reply = "I don’t see common allergen markers in the text provided, but always verify the label and any 'may contain' statements."
-        actions = ["Show uncertainty note", "Scan/paste full label text"]
-        return reply, actions
-
-    if "sugar" in msg:
-        sugars = list_by_flag("added_sugar")
-        if sugars:
-            reply = f"Added sugar markers detected: {', '.join(sugars)}. If you’re optimizing for sugar, this is the main reason the fit drops."
-        else:
-            reply = "I didn’t detect common added-sugar markers from the text provided."
-        actions = ["Compare with a lower-sugar option", "Change optimize goal"]
-        return reply, actions
-
-    if "why" in msg or "reason" in msg:
-        bullets = card.get("bullets", [])
-        reply = "Here’s the reasoning:\n- " + "\n- ".join(bullets[:3])
-        actions = ["Show all recognized ingredients", "Compare with another product"]
-        return reply, actions
-
-    # Default fallback: summarize card
+@register_followup("sugar", keywords=["sugar"], priority=40)
+def _sugar(ctx: FollowupContext) -> Tuple[str, List[str]]:
+    sugars = ctx.list_by_flag("added_sugar")
+    if sugars:
+        reply = f"Added sugar markers detected: {', '.join(sugars)}. If you’re optimizing for sugar, this is the main reason the fit drops."
+    else:
+        reply = "I didn’t detect common added-sugar markers from the text provided."
+    actions = ["Compare with a lower-sugar option", "Change optimize goal"]
+    return reply, actions
+
+@register_followup("why", keywords=["why", "reason"], priority=50)
+def _why(ctx: FollowupContext) -> Tuple[str, List[str]]:
+    bullets = ctx.card.get("bullets", [])
+    reply = "Here’s the reasoning:\n- " + "\n- ".join(bullets[:3])
+    actions = ["Show all recognized ingredients", "Compare with another product"]
+    return reply, actions
+
+# Default fallback: summarize card
+@ROUTER.fallback
+def _summary(ctx: FollowupContext) -> Tuple[str, List[str]]:
     reply = (
-        f"Summary for intent '{intent}': fit is {color.upper()}."
-        + (f" Score {fit_score}/100." if fit_score is not None else "")
+        f"Summary for intent '{ctx.intent}': fit is {ctx.color.upper()}."
+        + (f" Score {ctx.fit_score}/100." if ctx.fit_score is not None else "")
         + " Ask me 'okay daily?', 'what’s the top concern?', or 'compare with another product'."
     )
     actions = ["Okay daily?", "Top concern?", "Compare"]
     return reply, actions
+
+ROUTER.compile()
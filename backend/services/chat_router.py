@@ -0,0 +1,121 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Generic, Iterable, List, Optional, Pattern, Tuple, TypeVar
+
+from services.matcher import TermMatcher
+
+H = TypeVar("H", bound=Callable)
+
+@dataclass(frozen=True)
+class Route(Generic[H]):
+    name: str
+    # the route's regex: its patterns and escaped keywords, as alternatives
+    source: str
+    # strings of which every match contains at least one; None: checked on every message
+    triggers: Optional[FrozenSet[str]]
+    handler: H
+    priority: int
+    order: int
+
+def _trigger(s: str) -> Optional[str]:
+    # the automaton stores lowercase, single-spaced terms; anything else can't be a trigger
+    term = " ".join(s.split())
+    return term if term and term == s.strip() and term == term.lower() else None
+
+class FollowupRouter(Generic[H]):
+    # Message -> handler, highest-priority matching route wins (exactly like
+    # an if/elif cascade). Compiled once: every route's trigger strings go
+    # into one Aho-Corasick automaton, so a message is scanned a single time
+    # and only the routes whose triggers occur in it run their regex.
+    # Keyword-only routes trigger on their keywords; a route with patterns
+    # triggers on the `triggers` it declares, or is checked on every message.
+
+    def __init__(self):
+        self._routes: List[Route[H]] = []
+        self._default: Optional[H] = None
+        self._compiled: Optional[Tuple[Optional[TermMatcher], Dict[str, Tuple[int, ...]], Tuple[int, ...], List[Pattern], List[H]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def register(
+        self,
+        name: str,
+        patterns: Iterable[str] = (),
+        keywords: Iterable[str] = (),
+        priority: int = 100,
+        triggers: Optional[Iterable[str]] = None,
+    ) -> Callable[[H], H]:
+        # decorator; lower priority runs first, ties keep registration order.
+        # keywords are literal substrings, patterns are regexes. triggers:
+        # literal strings every pattern match contains at least one of (the
+        # router trusts this; a wrong list makes the route miss messages)
+        patterns, keywords = list(patterns), list(keywords)
+        alts = [f"(?:{p})" for p in patterns] + [re.escape(k) for k in keywords]
+        if not alts:
+            raise ValueError(f"route {name!r} needs at least one pattern or keyword")
+        source = "|".join(alts)
+        re.compile(source)  # fail at registration, not on the first message
+        found: Optional[FrozenSet[str]] = None
+        if triggers is not None:
+            terms = [_trigger(t) for t in triggers]
+            if not terms or None in terms:
+                raise ValueError(f"route {name!r}: triggers must be non-empty lowercase, single-spaced strings")
+        else:
+            terms = [] if not patterns else [None]  # patterns without triggers: always checked
+        terms += [_trigger(k) for k in keywords]
+        if None not in terms:
+            found = frozenset(terms)
+
+        def add(handler: H) -> H:
+            with self._lock:
+                self._routes.append(Route(name, source, found, handler, priority, len(self._routes)))
+                self._compiled = None
+            return handler
+        return add
+
+    def fallback(self, handler: H) -> H:
+        self._default = handler
+        return handler
+
+    def routes(self) -> List[Route[H]]:
+        # in the order they are tried
+        return sorted(self._routes, key=lambda r: (r.priority, r.order))
+
+    def compile(self):
+        with self._lock:
+            if self._compiled is None:
+                routes = self.routes()
+                by_literal: Dict[str, List[int]] = {}
+                always: List[int] = []
+                for i, r in enumerate(routes):
+                    if r.triggers is None:
+                        always.append(i)
+                        continue
+                    for lit in r.triggers:
+                        by_literal.setdefault(lit, []).append(i)
+                matcher = TermMatcher({lit: lit for lit in by_literal}) if by_literal else None
+                self._compiled = (
+                    matcher,
+                    {lit: tuple(ids) for lit, ids in by_literal.items()},
+                    tuple(always),
+                    [re.compile(r.source) for r in routes],
+                    [r.handler for r in routes],
+                )
+            return self._compiled
+
+    def route(self, message: str) -> Optional[H]:
+        matcher, by_literal, always, regexes, handlers = self._compiled or self.compile()
+        candidates = set(always)
+        if matcher is not None:
+            for lit in matcher.occurring(message):
+                candidates.update(by_literal[lit])
+        for i in sorted(candidates):
+            if regexes[i].search(message):
+                return handlers[i]
+        return self._default
+
+    def names(self) -> List[str]:
+        return [r.name for r in self.routes()]
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from services.knowledge import KnowledgeBase
+
+# Compact /api/analyze responses: ingredients carry only what is specific to
+# this label (raw text, KB id, match confidence); the static per-ingredient
+# metadata (category, function, flags, evidence, notes) comes from GET /api/kb
+# once per KB version. Bodies are encoded straight from the result dict, no
+# response-model validation.
+
+# KB fields that compact ingredients leave out (look them up by id in /api/kb)
+KB_FIELDS = ("category", "function", "flags", "evidence", "notes")
+
+# built once; the C encoder, no indentation, UTF-8 as-is
+_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=list).encode
+
+def compact_ingredient(ing: Dict[str, Any]) -> Dict[str, Any]:
+    # {"raw", "id"} (+ "match_confidence" below 1.0); id is None for unknowns
+    out = {"raw": ing["raw"], "id": ing["canonical"] if ing.get("known") else None}
+    confidence = ing.get("match_confidence", 1.0)
+    if out["id"] is not None and confidence < 1.0:
+        out["match_confidence"] = confidence
+    return out
+
+def compact_result(result: Dict[str, Any], kb_version: str, debug: bool = False) -> Dict[str, Any]:
+    out = {
+        "kb_version": kb_version,
+        "normalized_ingredients": [compact_ingredient(ing) for ing in result["normalized_ingredients"]],
+        "inferred_intent": result["inferred_intent"],
+        "decision_card": result["decision_card"],
+        "fit_by_intent": result["fit_by_intent"],
+        "fingerprint": result.get("fingerprint"),
+    }
+    if result.get("analysis_id"):
+        out["analysis_id"] = result["analysis_id"]
+    if debug:
+        # debug.fit is fit_by_intent[top_intent] again
+        out["debug"] = {k: v for k, v in result["debug"].items() if k != "fit"}
+    return out
+
+def encode_compact(result: Dict[str, Any], kb_version: str, debug: bool = False) -> bytes:
+    return _encode(compact_result(result, kb_version, debug)).encode("utf-8")
+
+class KBMetadata:
+    # the /api/kb body, encoded once per KB version, with its ETag
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cached: Optional[Tuple[str, str, bytes]] = None
+
+    def get(self, kb: KnowledgeBase) -> Tuple[str, bytes]:
+        cached = self._cached
+        if cached is None or cached[0] != kb.version:
+            with self._lock:
+                cached = self._cached
+                if cached is None or cached[0] != kb.version:
+                    cached = self._cached = (kb.version, *self._build(kb))
+        return cached[1], cached[2]
+
+    @staticmethod
+    def _build(kb: KnowledgeBase) -> Tuple[str, bytes]:
+        ingredients = {}
+        for name in sorted(kb.items):
+            meta = kb.items[name]
+            ingredients[name] = {
+                "category": meta.get("category"),
+                "function": meta.get("function"),
+                "flags": list(meta.get("flags") or ()),
+                "evidence": meta.get("evidence"),
+                "notes": meta.get("notes") or "",
+            }
+        body = _encode({"version": kb.version, "ingredients": ingredients}).encode("utf-8")
+        return f'"{hashlib.sha1(body).hexdigest()[:20]}"', body
+
+KB_METADATA = KBMetadata()
@@ -0,0 +1,90 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Mapping
+
+from services.compose import compose_decision_card
+from services.intent import infer_intent
+from services.knowledge import KnowledgeBase
+from services.locales import LOCALES
+from services.metrics import METRICS
+from services.normalize import iter_tokens, resolve_fragment, unique_records
+from services.rules import current_rules
+from services.scoring import score_intents
+
+def compare_products(
+    texts: List[str],
+    kb: KnowledgeBase,
+    intents: List[str],
+    user_prefs: Optional[Dict[str, Any]] = None,
+    stages: Optional[Dict[str, float]] = None,
+    locale: Optional[str] = None,
+) -> Dict[str, Any]:
+    prefs = user_prefs or {}
+
+    # 1) Normalize, each label through its own locale shards: a fragment
+    # shared by several labels (under the same composed KB) is resolved once
+    with METRICS.timer("normalize", stages):
+        resolved: Dict[Tuple[str, str], Tuple[Mapping[str, Any], ...]] = {}
+        normalized = []
+        locales = []
+        for text in texts:
+            localized, locale_info = LOCALES.localize(kb, text or "", locale)
+            locales.append(locale_info)
+            fragments = []
+            for tok in iter_tokens(text or ""):
+                records = resolved.get((localized.version, tok))
+                if records is None:
+                    records = resolved[(localized.version, tok)] = resolve_fragment(tok, localized)
+                fragments.append(records)
+            normalized.append(unique_records(fragments))
+
+    # 2) Fit matrix + one decision card per product and goal tab
+    products = []
+    rules = current_rules()  # one snapshot for the whole comparison
+    with METRICS.timer("score_fit", stages):
+        for i, ings in enumerate(normalized):
+            fits = score_intents(ings, intents, rules)
+            cards = {}
+            for goal in intents:
+                intent = infer_intent(ings, optimize_for=goal, user_prefs=prefs, rules=rules)
+                cards[goal] = compose_decision_card(ings, {**intent, "top_intent": goal}, fits[goal])
+            products.append({
+                "index": i,
+                "normalized_ingredients": ings,
+                "inferred_intent": infer_intent(ings, optimize_for=None, user_prefs=prefs, rules=rules),
+                "fit_by_intent": fits,
+                "decision_cards": cards,
+                "locale": locales[i],
+            })
+
+    matrix = {goal: [p["fit_by_intent"][goal]["fit_score"] for p in products] for goal in intents}
+    best = {}
+    for goal, scores in matrix.items():
+        top = max(scores)
+        best[goal] = [i for i, s in enumerate(scores) if s == top]
+
+    METRICS.incr("comparisons")
+    METRICS.observe_size("products_per_compare", len(texts))
+
+    return {
+        "intents": intents,
+        "products": products,
+        "matrix": matrix,
+        "best": best,
+        "differences": ingredient_differences(normalized),
+    }
+
+def ingredient_differences(normalized: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    # shared = in every product; only[i] = in product i and no other
+    # (everything else is in some but not all products)
+    present = [{ing["canonical"] for ing in ings} for ings in normalized]
+    seen_in = Counter(c for names in present for c in names)
+    n = len(normalized)
+    shared = [ing["canonical"] for ing in normalized[0] if seen_in[ing["canonical"]] == n] if n else []
+    only = [
+        [
+            {"canonical": ing["canonical"], "raw": ing["raw"], "flags": list(ing["flags"])}
+            for ing in ings if seen_in[ing["canonical"]] == 1
+        ]
+        for ings in normalized
+    ] if n > 1 else [[] for _ in normalized]
+    return {"shared": shared, "only": only}
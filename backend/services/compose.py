@@ -55,6 +55,9 @@ def _uncertainty(normalized: List[Dict[str, Any]], fit: Dict[str, Any], intent:
     confidence = intent.get("confidence", "medium")
     if unknown >= 2:
         return "Some ingredients couldn’t be confidently recognized (label/OCR ambiguity). Double-check the pack."
+    approx = [x["raw"] for x in normalized if x.get("known") and x.get("match_confidence", 1.0) < 1.0]
+    if approx:
+        return f"Matched a likely misspelling (label/OCR): {', '.join(approx[:3])}. Double-check the pack."
     if confidence == "low":
         return "I’m not fully sure what you’re optimizing for—tap a goal (Sugar/Gut/Allergens/etc.) for sharper guidance."
     return "Amounts matter, but ingredient lists don’t show quantities—treat this as a cautious flag, not a verdict."
@@ -98,5 +101,6 @@ def compose_decision_card(
             "uncertainty": uncertainty,
             "recognized_count": sum(1 for x in normalized if x.get("known")),
             "unknown_count": fit.get("unknown_count", 0),
+            "approximate_count": sum(1 for x in normalized if x.get("known") and x.get("match_confidence", 1.0) < 1.0),
         }
     }
@@ -0,0 +1,50 @@
+import threading
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Mapping
+
+# Feature vocabulary: raw flags ("added_sugar"), "cat:<category>",
+# "ev:<evidence>" and "unknown". Bits are handed out on first sight, so masks
+# are only meaningful inside the process that built them.
+_BITS: Dict[str, int] = {}
+_LOCK = threading.Lock()
+
+def feature_bit(name: str) -> int:
+    bit = _BITS.get(name)
+    if bit is None:
+        with _LOCK:
+            bit = _BITS.get(name)
+            if bit is None:
+                bit = 1 << len(_BITS)
+                _BITS[name] = bit
+    return bit
+
+def mask_of(names: Iterable[str]) -> int:
+    m = 0
+    for name in names:
+        m |= feature_bit(name)
+    return m
+
+@lru_cache(maxsize=8192)
+def _mask(flags: tuple, category: str, evidence: str, known: bool) -> int:
+    m = mask_of(flags) | feature_bit(f"cat:{category}") | feature_bit(f"ev:{evidence}")
+    if not known:
+        m |= feature_bit("unknown")
+    return m
+
+def ingredient_mask(ing: Mapping[str, Any]) -> int:
+    # normalized ingredient record -> feature bitmask
+    return _mask(
+        tuple(ing.get("flags") or ()),
+        ing.get("category", "unknown"),
+        ing.get("evidence", "unknown"),
+        bool(ing.get("known", False)),
+    )
+
+def entry_mask(meta: Mapping[str, Any]) -> int:
+    # knowledge-base entry -> the mask its normalized record will carry
+    return _mask(
+        tuple(meta.get("flags") or ()),
+        meta.get("category", "unknown"),
+        meta.get("evidence", "unknown"),
+        True,
+    )
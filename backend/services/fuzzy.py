@@ -0,0 +1,173 @@
+import os
+from itertools import combinations
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+# OCR-tolerant lookup: confidence = 1 - edit_distance / longer length.
+# Below MIN_CONFIDENCE (or MIN_LENGTH chars) a term stays unresolved.
+MIN_CONFIDENCE = float(os.environ.get("INGREDIENT_FUZZY_MIN_CONFIDENCE", "0.8"))
+MIN_LENGTH = int(os.environ.get("INGREDIENT_FUZZY_MIN_LENGTH", "6"))
+# OCR noise is a few characters per term; long names don't get a wider net
+MAX_EDITS = int(os.environ.get("INGREDIENT_FUZZY_MAX_EDITS", "3"))
+
+_SET_ABOVE = 8
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein distance within a diagonal band; limit + 1 once it must exceed limit
+    n, m = len(a), len(b)
+    big = limit + 1
+    if abs(n - m) > limit:
+        return big
+    if a == b:
+        return 0
+    # shared prefix/suffix never costs anything; OCR typos leave most of both
+    i = 0
+    while i < n and i < m and a[i] == b[i]:
+        i += 1
+    j = 0
+    while j < n - i and j < m - i and a[n - 1 - j] == b[m - 1 - j]:
+        j += 1
+    if i or j:
+        a, b = a[i:n - j], b[i:m - j]
+        n, m = len(a), len(b)
+        if not n or not m:
+            return max(n, m) if max(n, m) <= limit else big
+    prev = [j if j <= limit else big for j in range(m + 1)]
+    for i in range(1, n + 1):
+        cur = [big] * (m + 1)
+        best = cur[0] = i if i <= limit else big
+        ca = a[i - 1]
+        for j in range(max(1, i - limit), min(m, i + limit) + 1):
+            d = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < d:
+                d = prev[j] + 1
+            if cur[j - 1] + 1 < d:
+                d = cur[j - 1] + 1
+            cur[j] = d
+            if d < best:
+                best = d
+        if best > limit:
+            return big
+        prev = cur
+    return min(prev[m], big)
+
+def _segments(length: int, parts: int) -> List[Tuple[int, int]]:
+    # (start, size) of `parts` near-equal pieces; the longer pieces go last
+    short, extra = divmod(length, parts)
+    out, pos = [], 0
+    for i in range(parts):
+        size = short + (1 if i >= parts - extra else 0)
+        out.append((pos, size))
+        pos += size
+    return out
+
+class FuzzyIndex:
+    # Partition index over lowercase terms (term -> canonical), built once.
+    # A term that may be matched with up to k edits is cut into k + 2 pieces;
+    # any string within k edits still contains at least two of them unchanged,
+    # near their original offsets (pigeonhole). A lookup only probes those few
+    # (length, piece, substring) keys, so its cost follows the query length
+    # rather than the number of terms, and only a handful of candidates reach
+    # the banded edit-distance check.
+
+    def __init__(self, terms: Dict[str, str], min_confidence: float = MIN_CONFIDENCE, max_edits: int = MAX_EDITS,
+                 min_length: int = MIN_LENGTH):
+        self.min_confidence = min_confidence
+        self.max_edits = max_edits
+        self.min_length = min_length
+        self._terms: List[str] = []
+        self._canonical: List[str] = []
+        postings: Dict[Tuple[int, int, str], List[int]] = {}
+        for term, canonical in terms.items():
+            term = " ".join(term.lower().split())
+            if not term:
+                continue
+            tid = len(self._terms)
+            self._terms.append(term)
+            self._canonical.append(canonical)
+            k = self.edits_for(len(term))
+            if k < 1:
+                continue
+            for i, (start, size) in enumerate(_segments(len(term), k + 2)):
+                postings.setdefault((len(term), i, term[start:start + size]), []).append(tid)
+        # long lists as sets, so intersecting with them costs the shorter side
+        self._postings: Dict[Tuple[int, int, str], Collection[int]] = {
+            key: frozenset(ids) if len(ids) > _SET_ABOVE else tuple(ids) for key, ids in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def edits_for(self, length: int) -> int:
+        # most edits a match can have when the shorter string has this length:
+        # d <= (1 - t) * (length + d)  <=>  d <= (1 - t) * length / t
+        t = self.min_confidence
+        if t >= 1.0:
+            return 0
+        if t <= 0.0:
+            return self.max_edits
+        return min(self.max_edits, int((1.0 - t) * length / t + 1e-9))
+
+    def _candidates(self, q: str) -> Iterator[Tuple[int, int]]:
+        # (lower bound on the edit distance, term id), best first. A term that
+        # allows k edits is cut into k + 2 pieces; an edit breaks at most one,
+        # so a term with e edits still has k + 2 - e pieces in q (within k of
+        # their offset). Candidates at bound e are the terms found in every
+        # piece of some (k + 2 - e)-subset: set intersections, smallest first.
+        n = len(q)
+        postings = self._postings
+        buckets = []
+        for length in range(max(1, n - self.edits_for(n)), n + self.edits_for(n) + 1):
+            k = self.edits_for(length)
+            limit = self.edits_for(min(n, length))
+            if k < 1 or abs(n - length) > limit:
+                continue
+            pieces = []
+            for i, (start, size) in enumerate(_segments(length, k + 2)):
+                hits = [
+                    p for s in range(max(0, start - k), min(n - size, start + k) + 1)
+                    for p in (postings.get((length, i, q[s:s + size])),) if p is not None
+                ]
+                if len(hits) == 1 and isinstance(hits[0], frozenset):
+                    pieces.append(hits[0])
+                else:
+                    pieces.append(frozenset().union(*hits))
+            pieces.sort(key=len)
+            buckets.append((abs(n - length), limit, pieces, set()))
+
+        # lazily, one bound at a time: callers stop once a bound can't beat their best
+        for bound in range(self.max_edits + 1):
+            for gap, limit, pieces, seen in buckets:
+                if gap > bound or bound > limit:
+                    continue
+                for combo in combinations(pieces, len(pieces) - bound):
+                    if not combo[0]:
+                        continue
+                    ids = combo[0].intersection(*combo[1:]) - seen
+                    seen |= ids
+                    for tid in ids:
+                        yield bound, tid
+
+    def lookup(self, text: str) -> Optional[Tuple[str, str, float]]:
+        # best (term, canonical, confidence) at or above min_confidence, else None
+        q = " ".join(text.lower().split())
+        n = len(q)
+        if n < self.min_length:
+            return None
+
+        terms = self._terms
+        best: Optional[Tuple[str, str, float]] = None
+        best_dist = self.max_edits + 1
+        for bound, tid in self._candidates(q):
+            if bound >= best_dist:
+                break  # fewest edits wins; nothing left can beat the current best
+            term = terms[tid]
+            limit = min(best_dist - 1, self.edits_for(min(n, len(term))))
+            dist = edit_distance(q, term, limit)
+            if dist > limit:
+                continue
+            confidence = 1.0 - dist / max(n, len(term))
+            if confidence >= self.min_confidence:
+                best, best_dist = (term, self._canonical[tid], confidence), dist
+                if dist == 0:
+                    break
+        return best
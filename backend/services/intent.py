@@ -1,6 +1,9 @@
 from typing import List, Dict, Any, Optional
 from collections import defaultdict
 
+from services.features import ingredient_mask
+from services.rules import RuleSet, current_rules
+
 # Supported intents in this MVP
 INTENTS = [
     "general",
@@ -16,64 +19,33 @@ def infer_intent(
     normalized_ingredients: List[Dict[str, Any]],
     optimize_for: Optional[str],
     user_prefs: Dict[str, Any],
+    rules: Optional[RuleSet] = None,
 ) -> Dict[str, Any]:
+    rules = rules or current_rules()
     scores = defaultdict(float)
     reasons = defaultdict(list)
 
     # 1) explicit hint
     if optimize_for and optimize_for in INTENTS:
-        scores[optimize_for] += 2.0
-        reasons[optimize_for].append("User selected optimize_for")
+        scores[optimize_for] += rules.hint_weight
+        reasons[optimize_for].append(rules.hint_reason)
 
     # 2) preference ledger influences intent
-    avoid = set((user_prefs.get("avoid") or []))
-    limit = set((user_prefs.get("limit") or []))
-    goals = set((user_prefs.get("goals") or []))
-
-    if "lactose" in avoid or "milk" in avoid or "dairy" in avoid:
-        scores["allergens"] += 1.5
-        reasons["allergens"].append("Preference: avoid dairy/lactose")
-
-    if "added_sugar" in limit or "sugar" in limit:
-        scores["sugar"] += 1.5
-        reasons["sugar"].append("Preference: limit sugar")
-
-    if "bulking" in goals or "muscle" in goals or "protein" in goals:
-        scores["muscle"] += 1.0
-        reasons["muscle"].append("Goal: muscle/protein")
+    for field, values, name, weight, reason in rules.preferences:
+        if values.intersection(user_prefs.get(field) or []):
+            scores[name] += weight
+            reasons[name].append(reason)
 
     # 3) ingredient-trigger inference
     for ing in normalized_ingredients:
-        flags = set(ing.get("flags", []))
-        cat = ing.get("category", "unknown")
-
-        if "added_sugar" in flags or cat == "sweetener":
-            scores["sugar"] += 1.0
-            reasons["sugar"].append(f"Sweetener/sugar marker: {ing['raw']}")
-
-        if "emulsifier" in flags or cat == "emulsifier":
-            scores["gut"] += 0.7
-            reasons["gut"].append(f"Emulsifier marker: {ing['raw']}")
-
-        if "preservative" in flags or cat == "preservative":
-            scores["clean_label"] += 0.6
-            reasons["clean_label"].append(f"Preservative marker: {ing['raw']}")
-
-        if "allergen" in flags or cat == "allergen":
-            scores["allergens"] += 1.2
-            reasons["allergens"].append(f"Allergen marker: {ing['raw']}")
-
-        if "protein" in flags or cat == "protein":
-            scores["muscle"] += 0.8
-            reasons["muscle"].append(f"Protein marker: {ing['raw']}")
-
-        if "kid_sensitive" in flags:
-            scores["kids"] += 0.8
-            reasons["kids"].append(f"Often avoided for kids: {ing['raw']}")
+        for name, weight, label in rules.triggered(ingredient_mask(ing)):
+            scores[name] += weight
+            if len(reasons[name]) < 3:  # only the first three are reported
+                reasons[name].append(f"{label}: {ing['raw']}")
 
     # default
-    scores["general"] += 0.2
-    reasons["general"].append("Default fallback")
+    scores[rules.default_intent] += rules.default_weight
+    reasons[rules.default_intent].append(rules.default_reason)
 
     # choose top intent
     ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
@@ -83,9 +55,9 @@ def infer_intent(
     second_score = ranked[1][1] if len(ranked) > 1 else 0.0
     gap = max(0.0, top_score - second_score)
 
-    if top_score < 0.8:
+    if top_score < rules.low_below:
         confidence = "low"
-    elif gap < 0.4:
+    elif gap < rules.medium_gap_below:
         confidence = "medium"
     else:
         confidence = "high"
@@ -1,19 +1,63 @@
 import json
-from dataclasses import dataclass
-from typing import Dict, Any, Optional
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, Mapping
 from pathlib import Path
 
+from services.features import entry_mask
+from services.fuzzy import FuzzyIndex
+from services.matcher import TermMatcher
+from services.snapshot import Snapshot, SnapshotItems, SnapshotSynonyms, SnapshotError, source_version
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_SOURCE = DATA_DIR / "ingredients_knowledge.json"
+DEFAULT_SNAPSHOT = DATA_DIR / "ingredients_knowledge.snap"
+
 @dataclass
 class KnowledgeBase:
-    # canonical ingredient -> metadata
-    items: Dict[str, Dict[str, Any]]
+    # canonical ingredient -> metadata (dicts, or views over a mmapped snapshot)
+    items: Mapping[str, Dict[str, Any]]
     # synonym -> canonical ingredient
-    synonyms: Dict[str, str]
+    synonyms: Mapping[str, str]
+    # content hash of the source data; anything derived from the KB keys on it
+    version: str = ""
+    # locale shards layered over the core KB (extra names only; ids and
+    # metadata are the core's), and the core's version (see services.locales)
+    shards: Tuple[str, ...] = ()
+    core_version: str = ""
+    # compiled multi-term matcher over every canonical name + synonym;
+    # built on first scan() so cold start doesn't pay for it
+    matcher: Optional[TermMatcher] = field(default=None, repr=False)
+    # OCR-tolerant index over the same terms, also built on first use
+    fuzzy: Optional[FuzzyIndex] = field(default=None, repr=False)
+    # canonical ingredient -> feature bitmask (flags/category/evidence), filled lazily
+    masks: Dict[str, int] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
     @staticmethod
     def load_default() -> "KnowledgeBase":
-        data_path = Path(__file__).resolve().parent.parent / "data" / "ingredients_knowledge.json"
-        data = json.loads(data_path.read_text(encoding="utf-8"))
+        # a built snapshot that is at least as new as the JSON wins (see cli.py build-snapshot)
+        # INGREDIENT_KB_SNAPSHOT=off forces the JSON loader
+        snap_env = os.environ.get("INGREDIENT_KB_SNAPSHOT", "")
+        snap_path = Path(snap_env) if snap_env and snap_env != "off" else DEFAULT_SNAPSHOT
+        if snap_env != "off" and snap_path.exists():
+            if not DEFAULT_SOURCE.exists() or snap_path.stat().st_mtime >= DEFAULT_SOURCE.stat().st_mtime:
+                try:
+                    return KnowledgeBase.load_snapshot(snap_path)
+                except SnapshotError:
+                    pass
+        return KnowledgeBase.load_json(DEFAULT_SOURCE)
+
+    @staticmethod
+    def load_snapshot(path: Path) -> "KnowledgeBase":
+        snap = Snapshot(path)
+        return KnowledgeBase(items=SnapshotItems(snap), synonyms=SnapshotSynonyms(snap), version=snap.version)
+
+    @staticmethod
+    def load_json(data_path: Path) -> "KnowledgeBase":
+        raw = data_path.read_bytes()
+        data = json.loads(raw.decode("utf-8"))
 
         items = {}
         for it in data["ingredients"]:
@@ -23,7 +67,32 @@ class KnowledgeBase:
         for k, v in data.get("synonyms", {}).items():
             synonyms[k.lower()] = v.lower()
 
-        return KnowledgeBase(items=items, synonyms=synonyms)
+        return KnowledgeBase(items=items, synonyms=synonyms, version=source_version(raw))
+
+    def _terms(self) -> Dict[str, str]:
+        # every canonical name + synonym -> canonical
+        terms = {name: name for name in self.items}
+        terms.update(self.synonyms)
+        return terms
+
+    def build_matcher(self) -> TermMatcher:
+        with self._lock:
+            if self.matcher is None:
+                self.matcher = TermMatcher(self._terms())
+        return self.matcher
+
+    def build_fuzzy(self) -> FuzzyIndex:
+        with self._lock:
+            if self.fuzzy is None:
+                self.fuzzy = FuzzyIndex(self._terms())
+        return self.fuzzy
+
+    def mask(self, canonical: str) -> int:
+        m = self.masks.get(canonical)
+        if m is None:
+            meta = self.items.get(canonical)
+            m = self.masks[canonical] = entry_mask(meta) if meta is not None else 0
+        return m
 
     def resolve(self, raw_name: str) -> str:
         n = raw_name.strip().lower()
@@ -39,5 +108,21 @@ class KnowledgeBase:
             return self.synonyms[n2]
         return n2
 
+    def scan(self, text: str) -> List[Tuple[str, str]]:
+        # every knowledge-base term inside free text -> [(surface, canonical)]
+        matcher = self.matcher or self.build_matcher()
+        low = " ".join(text.lower().split())
+        src = text if len(text) == len(low) else low
+        return [(src[s:e], c) for s, e, c in matcher.scan(low)]
+
+    def resolve_fuzzy(self, raw_name: str) -> Optional[Tuple[str, float]]:
+        # closest known term for OCR-mangled text -> (canonical, confidence)
+        index = self.fuzzy or self.build_fuzzy()
+        hit = index.lookup(raw_name)
+        if hit is None:
+            return None
+        _term, canonical, confidence = hit
+        return canonical, confidence
+
     def get(self, canonical: str) -> Optional[Dict[str, Any]]:
         return self.items.get(canonical.lower())
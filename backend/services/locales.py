@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.knowledge import DATA_DIR, KnowledgeBase
+from services.metrics import METRICS
+from services.snapshot import source_version
+
+logger = logging.getLogger(__name__)
+
+# Locale shards: per-language / per-region label names ("zucker", "sirop de
+# glucose", "ins 330", "glucose-fructose syrup") mapped onto the core KB's
+# canonical ids. The core (ingredients_knowledge.json) keeps the English
+# names and all ingredient metadata; a shard only adds names, so every shard
+# resolves into the same id space and results compare across languages.
+# index.json (always loaded, small) lists the locales, the shards each one
+# uses and the hints that detect it; shard files load on first use and are
+# dropped again when idle.
+DEFAULT_DIR = DATA_DIR / "locales"
+MAX_SHARDS = int(os.environ.get("INGREDIENT_LOCALE_MAX_SHARDS", "4"))
+IDLE_SECONDS = float(os.environ.get("INGREDIENT_LOCALE_IDLE_SECONDS", "900"))
+# a language is detected once this many label words point at it (fewer for very short labels)
+MIN_HITS = int(os.environ.get("INGREDIENT_LOCALE_MIN_HITS", "2"))
+# composed KBs (core + a shard chain) kept around, each with its own matcher
+MAX_COMPOSED = 8
+
+_WORD_RE = re.compile(r"[^\s\d,;:()\[\]{}.!?/%*+&|\"'<>=]+")
+
+class UnknownLocale(ValueError):
+    pass
+
+class LocaleShards:
+
+    def __init__(self, root: Optional[Path] = DEFAULT_DIR, max_shards: int = MAX_SHARDS,
+                 idle_seconds: float = IDLE_SECONDS, min_hits: int = MIN_HITS):
+        self.root = Path(root) if root else None
+        self.max_shards = max(1, max_shards)
+        self.idle_seconds = idle_seconds
+        self.min_hits = max(1, min_hits)
+        self._lock = threading.Lock()
+        # shard -> (synonyms, version, last used)
+        self._shards: "OrderedDict[str, Tuple[Dict[str, str], str, float]]" = OrderedDict()
+        # (core version, shard chain) -> composed KB
+        self._composed: "OrderedDict[Tuple[str, Tuple[str, ...]], KnowledgeBase]" = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        index: Dict[str, Any] = {}
+        path = self.root / "index.json" if self.root else None
+        if path is not None and path.exists():
+            index = json.loads(path.read_text(encoding="utf-8"))
+        # content hash of the index and every shard: what was precomputed against them
+        digest = hashlib.sha1()
+        for shard in sorted(self.root.glob("*.json")) if path is not None and path.exists() else ():
+            digest.update(shard.name.encode() + b"\0" + shard.read_bytes())
+        self.signature = digest.hexdigest()[:12]
+        self.locales: Dict[str, Dict[str, Any]] = {k.lower(): v for k, v in index.get("locales", {}).items()}
+        # detection hints: marker word -> locales, plus per-locale patterns and scripts
+        self._markers: Dict[str, Tuple[str, ...]] = {}
+        self._patterns: List[Tuple[str, "re.Pattern[str]"]] = []
+        self._scripts: List[Tuple[str, int, int]] = []
+        for name, spec in self.locales.items():
+            for marker in spec.get("markers", ()):
+                marker = marker.lower()
+                self._markers[marker] = self._markers.get(marker, ()) + (name,)
+            if spec.get("pattern"):
+                self._patterns.append((name, re.compile(spec["pattern"])))
+            if spec.get("script"):
+                lo, hi = spec["script"]
+                self._scripts.append((name, lo, hi))
+
+    def locale_for(self, hint: str) -> str:
+        # "de-DE" / "de_AT" -> "de"; "en-US" -> "en-us"
+        tag = hint.strip().lower().replace("_", "-")
+        if tag in self.locales:
+            return tag
+        lang = tag.split("-", 1)[0]
+        if lang in self.locales:
+            return lang
+        raise UnknownLocale(f"Unknown locale: {hint} (known: {', '.join(sorted(self.locales))})")
+
+    def detect(self, text: str) -> List[str]:
+        # locales the label's words point at, strongest first
+        low = text.lower()
+        words = _WORD_RE.findall(low)
+        if not words:
+            return []
+        scores: Dict[str, int] = {}
+        markers = self._markers
+        for w in words:
+            for name in markers.get(w, ()):
+                scores[name] = scores.get(name, 0) + 1
+        for name, pattern in self._patterns:
+            hits = len(pattern.findall(low))
+            if hits:
+                scores[name] = scores.get(name, 0) + hits
+        if not low.isascii():
+            for name, lo, hi in self._scripts:
+                hits = sum(1 for w in words if any(lo <= ord(ch) <= hi for ch in w))
+                if hits:
+                    scores[name] = scores.get(name, 0) + hits
+        need = min(self.min_hits, len(words))
+        return sorted((name for name, score in scores.items() if score >= need), key=lambda n: (-scores[n], n))
+
+    def chain(self, text: str, hint: Optional[str] = None) -> Tuple[Tuple[str, ...], Dict[str, Any]]:
+        # shard chain for a label: the hinted locale's shards, then those of
+        # every detected locale; the core comes last implicitly
+        locales = [self.locale_for(hint)] if hint else []
+        detected = self.detect(text)
+        shards: List[str] = []
+        for name in locales + detected:
+            for shard in self.locales[name].get("shards", ()):
+                if shard not in shards:
+                    shards.append(shard)
+        info = {"hint": locales[0] if locales else None, "detected": detected, "shards": shards}
+        return tuple(shards), info
+
+    def _shard(self, name: str) -> Tuple[Dict[str, str], str]:
+        # under self._lock
+        now = time.monotonic()
+        entry = self._shards.get(name)
+        if entry is None:
+            synonyms, version = self._read(name)
+            METRICS.incr("locale_shard_loads")
+            self.loads += 1
+        else:
+            synonyms, version, _ = entry
+        self._shards[name] = (synonyms, version, now)
+        self._shards.move_to_end(name)
+        return synonyms, version
+
+    def _read(self, name: str) -> Tuple[Dict[str, str], str]:
+        path = self.root / f"{name}.json" if self.root else None
+        if path is None or not path.exists():
+            logger.warning("locale shard %s: no file, skipped", name)
+            return {}, "missing"
+        raw = path.read_bytes()
+        data = json.loads(raw.decode("utf-8"))
+        synonyms = {" ".join(k.lower().split()): v.lower() for k, v in data.get("synonyms", {}).items()}
+        return synonyms, source_version(raw)
+
+    def _evict(self, keep: Tuple[str, ...]) -> None:
+        # under self._lock: idle shards, then least recently used past max_shards
+        now = time.monotonic()
+        for name, (_, _, used) in list(self._shards.items()):
+            over = len(self._shards) > max(self.max_shards, len(keep))
+            if name not in keep and (over or now - used > self.idle_seconds):
+                del self._shards[name]
+                self.evictions += 1
+        for key in [k for k in self._composed if any(s not in self._shards for s in k[1])]:
+            del self._composed[key]
+        while len(self._composed) > MAX_COMPOSED:
+            self._composed.popitem(last=False)
+
+    def compose(self, kb: KnowledgeBase, shards: Tuple[str, ...]) -> KnowledgeBase:
+        # the core KB with the shards' names in front of its own synonyms
+        if not shards:
+            return kb
+        key = (kb.version, shards)
+        with self._lock:
+            loaded = [self._shard(name) for name in shards]
+            composed = self._composed.get(key)
+            if composed is None:
+                synonyms = ChainMap(
+                    *({k: v for k, v in syn.items() if v in kb.items} for syn, _ in loaded), kb.synonyms
+                )
+                tag = "+".join(f"{name}@{version}" for name, (_, version) in zip(shards, loaded))
+                composed = KnowledgeBase(
+                    items=kb.items,
+                    synonyms=synonyms,
+                    version=f"{kb.version}+{hashlib.sha1(tag.encode()).hexdigest()[:8]}",
+                    shards=shards,
+                    core_version=kb.version,
+                    masks=kb.masks,  # same ids, same metadata
+                )
+                self._composed[key] = composed
+            self._composed.move_to_end(key)
+            self._evict(shards)
+        return composed
+
+    def localize(self, kb: KnowledgeBase, text: str, hint: Optional[str] = None) -> Tuple[KnowledgeBase, Dict[str, Any]]:
+        shards, info = self.chain(text, hint)
+        return self.compose(kb, shards), info
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "locales": sorted(self.locales),
+            "loaded": list(self._shards),
+            "composed": len(self._composed),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+def _default_dir() -> Optional[Path]:
+    env = os.environ.get("INGREDIENT_LOCALE_DIR", "")
+    if env == "off":
+        return None  # core KB only, no detection
+    return Path(env) if env else DEFAULT_DIR
+
+LOCALES = LocaleShards(root=_default_dir())
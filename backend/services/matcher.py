@@ -0,0 +1,99 @@
+from collections import deque
+from typing import Dict, List, Set, Tuple
+
+def _is_word_char(ch: str) -> bool:
+    # "-" counts as part of a word so "sugar-free" doesn't match "sugar"
+    return ch.isalnum() or ch == "-"
+
+class TermMatcher:
+    # Aho-Corasick automaton over lowercase terms (term -> canonical).
+    # Built once; scan() is a single left-to-right pass over the text.
+
+    def __init__(self, terms: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # per node: (term length, canonical) for every term ending here
+        self._out: List[List[Tuple[int, str]]] = [[]]
+
+        for term, canonical in terms.items():
+            term = " ".join(term.lower().split())
+            if term:
+                self._add(term, canonical)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _add(self, term: str, canonical: str) -> None:
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(term), canonical))
+
+    def _link(self) -> None:
+        # BFS so every fail target is finalized before its dependants
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def occurring(self, text: str) -> Set[str]:
+        # canonical of every term found anywhere in text, overlaps and
+        # partial words included (substring semantics, unlike scan())
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[str] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(c for _, c in out[node])
+        return found
+
+    def scan(self, text: str) -> List[Tuple[int, int, str]]:
+        # returns non-overlapping whole-word hits (start, end, canonical),
+        # leftmost first and longest at each start
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: List[Tuple[int, int, str]] = []
+        node = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            end = i + 1
+            if end < n and _is_word_char(text[end]):
+                continue
+            for length, canonical in out[node]:
+                start = end - length
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                hits.append((start, end, canonical))
+
+        if len(hits) < 2:
+            return hits
+        hits.sort(key=lambda h: (h[0], h[0] - h[1]))
+        picked: List[Tuple[int, int, str]] = []
+        last_end = -1
+        for h in hits:
+            if h[0] >= last_end:
+                picked.append(h)
+                last_end = h[1]
+        return picked
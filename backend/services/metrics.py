@@ -0,0 +1,133 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+# 1us .. ~95s in sqrt(2) steps: percentiles are accurate to ~+/-20%, which is
+# plenty for "where does latency go" and keeps observe() at one bisect.
+SECONDS_BOUNDS = tuple(1e-6 * 2 ** (i / 2) for i in range(54))
+COUNT_BOUNDS = tuple(float(2 ** i) for i in range(17))
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float] = SECONDS_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def merge(self, counts: Sequence[int], total: float, maximum: float) -> None:
+        with self._lock:
+            for i, c in enumerate(counts):
+                self.counts[i] += c
+            self.count += sum(counts)
+            self.total += total
+            if maximum > self.max:
+                self.max = maximum
+
+    def snapshot(self, scale: float = 1.0, digits: int = 3) -> Dict[str, Any]:
+        def r(v):
+            return None if v is None else round(v * scale, digits)
+        return {
+            "count": self.count,
+            "mean": r(self.total / self.count) if self.count else None,
+            "p50": r(self.percentile(0.50)),
+            "p95": r(self.percentile(0.95)),
+            "p99": r(self.percentile(0.99)),
+            "max": r(self.max) if self.count else None,
+        }
+
+class Metrics:
+    # Process-local counters and histograms. Stage timings are in seconds and
+    # reported in milliseconds.
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.timings: Dict[str, Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _hist(self, table: Dict[str, Histogram], name: str, bounds: Sequence[float]) -> Histogram:
+        h = table.get(name)
+        if h is None:
+            with self._lock:
+                h = table.setdefault(name, Histogram(bounds))
+        return h
+
+    def observe_seconds(self, name: str, seconds: float) -> None:
+        self._hist(self.timings, name, SECONDS_BOUNDS).observe(seconds)
+
+    def observe_size(self, name: str, value: float) -> None:
+        self._hist(self.sizes, name, COUNT_BOUNDS).observe(value)
+
+    @contextmanager
+    def timer(self, name: str, into: Optional[Dict[str, float]] = None) -> Iterator[None]:
+        # into: optional per-request dict that also receives the duration (ms)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.observe_seconds(name, dt)
+            if into is not None:
+                into[name] = round(dt * 1000, 3)
+
+    def drain(self) -> Dict[str, Any]:
+        # raw counters + buckets recorded since the last drain, then start over;
+        # pool workers ship this back so the serving process can merge() it
+        with self._lock:
+            out = {
+                "counters": self.counters,
+                "timings": {k: (h.counts, h.total, h.max) for k, h in self.timings.items() if h.count},
+                "sizes": {k: (h.counts, h.total, h.max) for k, h in self.sizes.items() if h.count},
+            }
+            self.counters, self.timings, self.sizes = {}, {}, {}
+        return out
+
+    def merge(self, delta: Dict[str, Any]) -> None:
+        for name, n in delta["counters"].items():
+            self.incr(name, n)
+        for table, bounds, key in ((self.timings, SECONDS_BOUNDS, "timings"), (self.sizes, COUNT_BOUNDS, "sizes")):
+            for name, (counts, total, maximum) in delta[key].items():
+                self._hist(table, name, bounds).merge(counts, total, maximum)
+
+    def snapshot(self) -> Dict[str, Any]:
+        c = self.counters
+        ingredients = c.get("ingredients_total", 0)
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "counters": dict(c),
+            "unknown_ingredient_rate": round(c.get("ingredients_unknown", 0) / ingredients, 4) if ingredients else None,
+            "timings_ms": {k: h.snapshot(scale=1000) for k, h in sorted(self.timings.items())},
+            "sizes": {k: h.snapshot() for k, h in sorted(self.sizes.items())},
+        }
+
+METRICS = Metrics()
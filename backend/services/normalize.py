@@ -1,75 +1,141 @@
+import os
 import re
-from typing import List, Dict, Any
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Mapping, Tuple, Iterator, Iterable
+from services.cache import BoundedMemo
 from services.knowledge import KnowledgeBase
 
-_SPLIT_RE = re.compile(r",(?![^()]*\))")  # split on commas not inside parentheses
+# delimiters: commas, and brackets of either kind at any depth. Nested groups
+# need no stack: "chocolate (sugar, emulsifier (soy lecithin))" is just the
+# fragments between delimiters, outer name first.
+_DELIM_RE = re.compile(r"[,()\[\]]")
+_WS_RE = re.compile(r"\s+")
+_PCT_RE = re.compile(r"[<>~]?\s*\d+(?:[.,]\d+)?\s*%")
+_PREFIX = "ingredients"
+
+# raw fragment -> immutable normalized records; labels repeat the same
+# handful of tokens ("sugar", "salt", "soy lecithin") constantly
+_TOKEN_MEMO = BoundedMemo(max_entries=int(os.environ.get("INGREDIENT_TOKEN_MEMO_SIZE", "50000")))
+
+def token_memo_stats() -> Dict[str, Any]:
+    return _TOKEN_MEMO.stats()
+
+def clear_token_memo() -> None:
+    # cold-cache measurements (benches); the memo refills on the next labels
+    _TOKEN_MEMO.clear()
 
 def _clean_token(t: str) -> str:
-    t = t.strip()
-    t = re.sub(r"\s+", " ", t)
+    if "%" in t:
+        t = _PCT_RE.sub(" ", t)
+    t = _WS_RE.sub(" ", t)
     t = t.strip(" .;:")
     return t
 
-def _explode_parentheses(token: str) -> List[str]:
-    # e.g. "whey (milk), soy lecithin" => ["whey", "milk"]
-    # keep both outer + inner for better tagging
-    out = []
-    token = token.strip()
-    if "(" in token and ")" in token:
-        outer = token[:token.index("(")].strip()
-        inner = token[token.index("(")+1:token.rindex(")")].strip()
-        if outer:
-            out.append(outer)
-        # inner may have commas
-        for part in inner.split(","):
-            part = part.strip()
-            if part:
-                out.append(part)
-    else:
-        out.append(token)
-    return out
-
-def normalize_ingredients(text: str, kb: KnowledgeBase) -> List[Dict[str, Any]]:
-    if not text or not text.strip():
-        return []
-
-    # remove leading "ingredients:" label
-    text = re.sub(r"^\s*ingredients\s*:\s*", "", text.strip(), flags=re.IGNORECASE)
+def _skip_prefix(text: str) -> int:
+    # index just past a leading "ingredients:" label (any case), else past leading whitespace
+    n = len(text)
+    i = 0
+    while i < n and text[i].isspace():
+        i += 1
+    if text[i:i + len(_PREFIX)].lower() == _PREFIX:
+        j = i + len(_PREFIX)
+        while j < n and text[j].isspace():
+            j += 1
+        if j < n and text[j] == ":":
+            return j + 1
+    return i
 
-    raw_tokens = _SPLIT_RE.split(text)
-    expanded = []
-    for tok in raw_tokens:
-        tok = _clean_token(tok)
-        if not tok:
+def iter_spans(text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    # (start, end) of every fragment between delimiters in text[pos:endpos]
+    n = len(text)
+    end = n if endpos is None else endpos
+    for m in _DELIM_RE.finditer(text, pos, end):
+        i = m.start()
+        if text[i] == "," and 0 < i < n - 1 and text[i - 1].isdigit() and text[i + 1].isdigit():
             continue
-        expanded.extend(_explode_parentheses(tok))
+        if pos < i:
+            yield pos, i
+        pos = i + 1
+    if pos < end:
+        yield pos, end
+
+def iter_tokens(text: str) -> Iterator[str]:
+    # Single left-to-right pass; yields raw (uncleaned) fragments lazily.
+    # "cocoa 2,5%" keeps its decimal comma; unbalanced brackets are tolerated.
+    for start, end in iter_spans(text, _skip_prefix(text)):
+        yield text[start:end]
+
+def is_delimiter(text: str, i: int) -> bool:
+    ch = text[i]
+    if ch == ",":
+        return not (0 < i < len(text) - 1 and text[i - 1].isdigit() and text[i + 1].isdigit())
+    return ch in "()[]"
+
+def _resolve_token(tok: str, kb: KnowledgeBase) -> Tuple[Mapping[str, Any], ...]:
+    # one raw fragment -> the ingredient record(s) it yields
+    raw_clean = _clean_token(tok)
+    if not raw_clean:
+        return ()
 
+    canonical = kb.resolve(raw_clean)
+    meta = kb.get(canonical)
+    if meta is not None:
+        return (_record(raw_clean, canonical, meta),)
+
+    # no exact hit: OCR noise ("soy lecithln", "maltodextrine")?
+    fuzzy = kb.resolve_fuzzy(raw_clean)
+    if fuzzy is not None:
+        meta = kb.get(fuzzy[0])
+        if meta is not None:
+            return (_record(raw_clean, fuzzy[0], meta, confidence=round(fuzzy[1], 3)),)
+
+    # pick out any known terms inside the token
+    # (e.g. "emulsifier: soy lecithin", "sugar syrup from cane")
+    hits = kb.scan(raw_clean)
+    if not hits:
+        return (_record(raw_clean, canonical, None),)
+    return tuple(_record(r, c, kb.get(c)) for r, c in hits)
+
+def resolve_fragment(tok: str, kb: KnowledgeBase) -> Tuple[Mapping[str, Any], ...]:
+    key = (kb.version, tok)
+    records = _TOKEN_MEMO.get(key)
+    if records is None:
+        records = _resolve_token(tok, kb)
+        _TOKEN_MEMO.put(key, records)
+    return records
+
+def unique_records(fragments: Iterable[Tuple[Mapping[str, Any], ...]]) -> List[Dict[str, Any]]:
+    # first occurrence of each canonical, in label order, as fresh dicts
     results: List[Dict[str, Any]] = []
     seen = set()
+    for records in fragments:
+        for rec in records:
+            # avoid exact duplicates
+            key = rec["canonical"]
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append(dict(rec))
+    return results
 
-    for raw in expanded:
-        raw_clean = _clean_token(raw)
-        if not raw_clean:
-            continue
+def normalize_ingredients(text: str, kb: KnowledgeBase, use_memo: bool = True) -> List[Dict[str, Any]]:
+    if not text:
+        return []
 
-        canonical = kb.resolve(raw_clean)
-        meta = kb.get(canonical)
+    resolve = resolve_fragment if use_memo else _resolve_token
+    return unique_records(resolve(tok, kb) for tok in iter_tokens(text))
 
-        # avoid exact duplicates
-        key = canonical
-        if key in seen:
-            continue
-        seen.add(key)
-
-        results.append({
-            "raw": raw_clean,
-            "canonical": canonical,
-            "known": meta is not None,
-            "category": (meta.get("category") if meta else "unknown"),
-            "function": (meta.get("function") if meta else "unknown"),
-            "flags": (meta.get("flags") if meta else []),
-            "evidence": (meta.get("evidence") if meta else "unknown"),
-            "notes": (meta.get("notes") if meta else "")
-        })
-
-    return results
\ No newline at end of file
+def _record(raw: str, canonical: str, meta: Optional[Dict[str, Any]], confidence: float = 1.0) -> Mapping[str, Any]:
+    # read-only: memoized records are shared across requests
+    return MappingProxyType({
+        "raw": raw,
+        "canonical": canonical,
+        "known": meta is not None,
+        "category": (meta.get("category") if meta else "unknown"),
+        "function": (meta.get("function") if meta else "unknown"),
+        "flags": (tuple(meta.get("flags") or ()) if meta else ()),
+        "evidence": (meta.get("evidence") if meta else "unknown"),
+        "notes": (meta.get("notes") if meta else ""),
+        # 1.0 for exact name/synonym hits, below it for fuzzy (OCR) matches
+        "match_confidence": (confidence if meta else 0.0)
+    })
@@ -0,0 +1,277 @@
+import asyncio
+import io
+from abc import ABC, abstractmethod
+import json
+import os
+import struct
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from services.cache import LRUCache
+from services.metrics import METRICS
+from services.workers import Overloaded
+
+# label photos: OCR runs on OCR_WORKERS threads, at most OCR_QUEUE_SIZE jobs
+# wait behind them (more -> 503), finished jobs are kept for OCR_JOB_TTL
+OCR_WORKERS = int(os.environ.get("INGREDIENT_OCR_WORKERS", "2"))
+OCR_QUEUE_SIZE = int(os.environ.get("INGREDIENT_OCR_QUEUE", "32"))
+OCR_JOB_TTL = float(os.environ.get("INGREDIENT_OCR_JOB_TTL", "600"))
+MAX_IMAGE_BYTES = int(os.environ.get("INGREDIENT_OCR_MAX_BYTES", str(10 << 20)))
+
+class OCRError(Exception):
+    pass
+
+class OCREngine(ABC):
+    # image bytes -> label text. Runs on a worker thread, so it may block.
+    name = "base"
+
+    @abstractmethod
+    def recognize(self, image: bytes, content_type: Optional[str] = None) -> str:
+        ...
+
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+def _png_text(image: bytes) -> Optional[str]:
+    # first tEXt / zTXt / iTXt chunk value in a PNG
+    pos = len(_PNG_MAGIC)
+    while pos + 8 <= len(image):
+        length, kind = struct.unpack(">I4s", image[pos:pos + 8])
+        data = image[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"tEXt":
+            return data.split(b"\x00", 1)[-1].decode("latin-1")
+        if kind == b"zTXt":
+            return zlib.decompress(data.split(b"\x00", 1)[-1][1:]).decode("latin-1")
+        if kind == b"iTXt":
+            _keyword, rest = data.split(b"\x00", 1)
+            compressed, _method, rest = rest[0], rest[1], rest[2:]
+            _lang, _translated, text = rest.split(b"\x00", 2)
+            return (zlib.decompress(text) if compressed else text).decode("utf-8")
+        if kind == b"IEND":
+            break
+    return None
+
+class StandInEngine(OCREngine):
+    # Local stand-in with no OCR dependency (dev and tests): reads the text a
+    # PNG carries in a text chunk, or a plain-text upload as-is.
+    name = "stand-in"
+
+    def recognize(self, image: bytes, content_type: Optional[str] = None) -> str:
+        if image.startswith(_PNG_MAGIC):
+            text = _png_text(image)
+            if text is None:
+                raise OCRError("no text chunk in PNG (the stand-in engine does not read pixels)")
+            return text
+        try:
+            return image.decode("utf-8")
+        except UnicodeDecodeError:
+            raise OCRError("unsupported image for the stand-in engine")
+
+class TesseractEngine(OCREngine):
+    # real OCR; needs `pip install pytesseract pillow` and the tesseract binary
+    name = "tesseract"
+
+    def __init__(self):
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError as e:
+            raise RuntimeError("tesseract OCR engine needs pytesseract and pillow installed") from e
+        self._pytesseract, self._image = pytesseract, Image
+
+    def recognize(self, image: bytes, content_type: Optional[str] = None) -> str:
+        try:
+            img = self._image.open(io.BytesIO(image))
+        except Exception as e:
+            raise OCRError(f"cannot read image: {e}")
+        return self._pytesseract.image_to_string(img)
+
+ENGINES: Dict[str, Callable[[], OCREngine]] = {
+    StandInEngine.name: StandInEngine,
+    TesseractEngine.name: TesseractEngine,
+}
+
+def register_engine(name: str, factory: Callable[[], OCREngine]) -> None:
+    ENGINES[name] = factory
+
+def make_engine(name: Optional[str] = None) -> OCREngine:
+    name = name or os.environ.get("INGREDIENT_OCR_ENGINE", StandInEngine.name)
+    if name not in ENGINES:
+        raise ValueError(f"unknown OCR engine {name!r} (known: {', '.join(sorted(ENGINES))})")
+    return ENGINES[name]()
+
+class OCRJob:
+    __slots__ = ("id", "status", "created", "updated", "text", "result", "error", "image", "content_type",
+                 "on_text", "_changed")
+
+    def __init__(self, image: bytes, content_type: Optional[str], on_text: Callable[[str], Awaitable[Dict[str, Any]]]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created = self.updated = time.time()
+        self.text: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.image: Optional[bytes] = image
+        self.content_type = content_type
+        self.on_text = on_text
+        self._changed = asyncio.Event()
+
+    def _set(self, status: str, **fields: Any) -> None:
+        self.status = status
+        self.updated = time.time()
+        for k, v in fields.items():
+            setattr(self, k, v)
+        # wake streamers, then arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def view(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"job_id": self.id, "status": self.status, "created": self.created, "updated": self.updated}
+        if self.text is not None:
+            out["text"] = self.text
+        if self.result is not None:
+            out["result"] = self.result
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+class OCRJobQueue:
+    # Bounded asyncio queue of OCR jobs drained by a fixed set of worker
+    # tasks. The blocking engine call runs on a dedicated thread pool, so
+    # slow OCR never holds a request worker; a full queue rejects new jobs
+    # (503) instead of growing without bound. Each job's text goes to its
+    # on_text callback (normalize -> analysis) and the result is kept for
+    # polling / streaming. Queued and running jobs are tracked apart from the
+    # finished ones, so only finished jobs age out of the LRU.
+
+    def __init__(self, engine: Optional[OCREngine] = None, workers: int = OCR_WORKERS,
+                 queue_size: int = OCR_QUEUE_SIZE, job_ttl: float = OCR_JOB_TTL):
+        self._engine = engine
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.jobs = LRUCache(max_entries=max(1024, self.queue_size * 8), ttl_seconds=job_ttl)
+        # queued or running: at most queue_size + workers of them
+        self._active: Dict[str, OCRJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def engine(self) -> OCREngine:
+        if self._engine is None:
+            self._engine = make_engine()
+        return self._engine
+
+    def _ensure_started(self) -> asyncio.Queue:
+        # queue + workers live on the serving loop; started on first use
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None:
+            self._stop_tasks()
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+            self._tasks = [loop.create_task(self._worker(self._queue)) for _ in range(self.workers)]
+        return self._queue
+
+    def submit(self, image: bytes, content_type: Optional[str],
+               on_text: Callable[[str], Awaitable[Dict[str, Any]]]) -> OCRJob:
+        queue = self._ensure_started()
+        job = OCRJob(image, content_type, on_text)
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            METRICS.incr("ocr_rejected")
+            raise Overloaded(f"{queue.qsize()} label images waiting for OCR (limit {self.queue_size})")
+        self._active[job.id] = job
+        METRICS.incr("ocr_jobs")
+        return job
+
+    def get(self, job_id: str) -> Optional[OCRJob]:
+        job = self._active.get(job_id)
+        return job if job is not None else self.jobs.get(job_id)
+
+    def _retire(self, job: OCRJob) -> None:
+        # finished: from here on the job can expire or be evicted
+        if not job.finished:
+            job._set("failed", error="OCR worker stopped")
+        self.jobs.put(job.id, job)
+        self._active.pop(job.id, None)
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job: OCRJob = await queue.get()
+            try:
+                await self._run(loop, job)
+            finally:
+                self._retire(job)
+                queue.task_done()
+
+    async def _run(self, loop: asyncio.AbstractEventLoop, job: OCRJob) -> None:
+        job._set("ocr")
+        image, job.image = job.image, None  # don't keep the photo around
+        t0 = time.perf_counter()
+        try:
+            text = await loop.run_in_executor(self._executor, self.engine.recognize, image, job.content_type)
+        except Exception as e:
+            METRICS.incr("ocr_failed")
+            job._set("failed", error=f"OCR failed: {e}")
+            return
+        finally:
+            METRICS.observe_seconds("ocr", time.perf_counter() - t0)
+        if not text.strip():
+            job._set("failed", text=text, error="no text recognized")
+            return
+        job._set("analyzing", text=text)
+        try:
+            result = await job.on_text(text)
+        except Exception as e:
+            job._set("failed", error=f"{type(e).__name__}: {e}")
+            return
+        job._set("done", result=result)
+
+    async def watch(self, job: OCRJob) -> AsyncIterator[bytes]:
+        # NDJSON: the job's state now and after every change, until it finishes
+        while True:
+            changed = job._changed
+            yield (json.dumps(job.view(), separators=(",", ":"), default=list) + "\n").encode("utf-8")
+            if job.finished:
+                return
+            await changed.wait()
+
+    def _stop_tasks(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        # jobs still queued on the old loop will never run
+        for job in list(self._active.values()):
+            if job.status == "queued":
+                self._retire(job)
+
+    def stop(self) -> None:
+        self._stop_tasks()
+        self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": self._engine.name if self._engine else None,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "active": len(self._active),
+            "jobs": len(self.jobs),
+        }
+
+OCR_JOBS = OCRJobQueue()
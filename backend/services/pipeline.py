@@ -0,0 +1,122 @@
+from typing import Dict, Any, List, Optional
+
+from services.knowledge import KnowledgeBase
+from services.locales import LOCALES
+from services.metrics import METRICS
+from services.normalize import normalize_ingredients
+from services.intent import INTENTS, infer_intent
+from services.scoring import FitMatrix, fit_matrix, fits_from_matrix, score_fit
+from services.compose import compose_decision_card
+from services.recipes import RECIPES, RecipeIndex, canonical_set, fingerprint
+from services.rules import RuleSet, current_rules
+
+def analysis_version(kb: KnowledgeBase, rules: Optional[RuleSet] = None) -> str:
+    # what an analysis was computed against: the core KB, the scoring rules
+    # and the locale shards. Anything cached or indexed per analysis keys on it
+    rules = rules or current_rules()
+    return f"{kb.core_version or kb.version}:{rules.version}:{LOCALES.signature}"
+
+def run_pipeline(
+    ingredients_text: str,
+    kb: KnowledgeBase,
+    optimize_for: Optional[str] = None,
+    user_prefs: Optional[Dict[str, Any]] = None,
+    stages: Optional[Dict[str, float]] = None,
+    locale: Optional[str] = None,
+) -> Dict[str, Any]:
+    # stages: optional dict that receives per-stage durations (ms) for this call
+
+    # 1) Normalize and tag ingredients, with the label's locale shards over the core KB
+    with METRICS.timer("normalize", stages):
+        kb, locale_info = LOCALES.localize(kb, ingredients_text, locale)
+        normalized = normalize_ingredients(ingredients_text, kb)
+
+    # one rules snapshot for every stage, so a hot reload mid-request can't mix versions
+    result = analyze_normalized(normalized, optimize_for, user_prefs, stages, current_rules())
+    result["debug"]["locale"] = locale_info
+    return result
+
+def analyze_normalized(
+    normalized: List[Dict[str, Any]],
+    optimize_for: Optional[str] = None,
+    user_prefs: Optional[Dict[str, Any]] = None,
+    stages: Optional[Dict[str, float]] = None,
+    rules: Optional[RuleSet] = None,
+    matrix: Optional[FitMatrix] = None,
+) -> Dict[str, Any]:
+    # everything after normalization; callers that already hold normalized
+    # records (incremental sessions, compare) start here. matrix: the recipe's
+    # fit matrix when already known (bulk scoring), else computed here
+    prefs = user_prefs or {}
+    rules = rules or current_rules()
+
+    # 2) Infer intent (intent-first without forms)
+    with METRICS.timer("infer_intent", stages):
+        intent = infer_intent(normalized, optimize_for=optimize_for, user_prefs=prefs, rules=rules)
+
+    # 3) Score fit (traffic-light)
+    with METRICS.timer("score_fit", stages):
+        fit = score_fit(normalized, intent, rules)
+
+    # 4) Compose decision card for UI
+    with METRICS.timer("compose", stages):
+        card = compose_decision_card(normalized, intent, fit)
+
+    # 5) Fit under every intent so the UI can switch goals without a round trip
+    with METRICS.timer("score_all_intents", stages):
+        if matrix is None:
+            matrix = fit_matrix(normalized, INTENTS, rules)
+        fit_by_intent = fits_from_matrix(matrix, normalized, rules)
+
+    unknown = fit["unknown_count"]
+    METRICS.incr("analyses")
+    METRICS.incr("ingredients_total", len(normalized))
+    METRICS.incr("ingredients_unknown", unknown)
+    METRICS.observe_size("tokens_per_request", len(normalized))
+
+    return {
+        "normalized_ingredients": normalized,
+        "inferred_intent": intent,
+        "decision_card": card,
+        "fit_by_intent": fit_by_intent,
+        "fingerprint": fingerprint(normalized),
+        "debug": {
+            "fit": fit,
+            "optimize_for": optimize_for,
+            "user_prefs": prefs,
+        },
+    }
+
+def analyze_catalog_item(
+    ingredients_text: str,
+    kb: KnowledgeBase,
+    optimize_for: Optional[str] = None,
+    user_prefs: Optional[Dict[str, Any]] = None,
+    recipes: RecipeIndex = RECIPES,
+    locale: Optional[str] = None,
+) -> Dict[str, Any]:
+    # bulk scoring: SKUs that resolve to the same recipe (same canonical set)
+    # share its fit matrix, across rows and across runs via the recipe index.
+    # Intent, flags, fit and card are still built from the label's own
+    # records, so one label's raw names never show up in another's result.
+    with METRICS.timer("normalize"):
+        kb, locale_info = LOCALES.localize(kb, ingredients_text, locale)
+        normalized = normalize_ingredients(ingredients_text, kb)
+    fp = fingerprint(normalized)
+    # shards only add names: recipes are shared across locales
+    rules = current_rules()
+    version = analysis_version(kb, rules)
+
+    matrix = recipes.get_matrix(fp, version)
+    reused = matrix is not None
+    if reused:
+        METRICS.incr("recipe_reuses")
+    else:
+        matrix = fit_matrix(normalized, INTENTS, rules)
+    result = analyze_normalized(normalized, optimize_for, user_prefs, rules=rules, matrix=matrix)
+    result["debug"]["locale"] = locale_info
+    if reused:
+        result["debug"]["reused_recipe"] = True
+    else:
+        recipes.put_matrix(fp, version, matrix, canonical_set(normalized), result["fit_by_intent"])
+    return result
@@ -0,0 +1,390 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.compact import compact_ingredient
+from services.intent import INTENTS
+from services.knowledge import DATA_DIR, KnowledgeBase
+from services.locales import LOCALES
+from services.metrics import METRICS
+from services.normalize import normalize_ingredients
+from services.pipeline import analyze_normalized
+from services.rules import current_rules
+from services.workers import map_chunks
+
+logger = logging.getLogger(__name__)
+
+# Precomputed analyses of a known catalog (cli.py precompute), little-endian:
+#
+#   header   magic, format, label count, meta length, section offsets
+#   meta     JSON: KB / rules / locale versions the entries belong to, variants
+#   fanout   u32[65537]: index range for each leading 16 bits of the key
+#   index    (key, digest, offset, length) records sorted by key
+#   data     one blob per label
+#
+# The key is a 16-byte hash of the label text (lowercased, whitespace
+# collapsed: the analyze cache's normalization). A blob holds the label's
+# response as JSON pieces, each stored once: normalized ingredients (full and
+# compact), fit_by_intent and fingerprint are shared by every optimize_for
+# variant; inferred_intent, decision_card and debug are per variant. Serving a
+# hit is a fanout read, a short binary search over the mmap and a bytes join.
+# The digest is a hash of the label's normalized records, locale info and
+# shard versions; a rebuild only re-scores labels whose digest changed.
+
+MAGIC = b"IKPA"
+FORMAT = 1
+DEFAULT_PATH = DATA_DIR / "precomputed.kv"
+RELOAD_CHECK_SECONDS = 1.0
+
+_HEADER = struct.Struct("<4sIIIQQQ")  # magic format count meta_len fanout_at index_at data_at
+_RECORD = struct.Struct("<16s8sQI")   # key digest offset length
+_SPAN = struct.Struct("<II")
+_BLOB = struct.Struct("<HH")          # pieces variants
+_FANOUT = 1 << 16
+
+# optimize_for of each variant, in blob order (None: no hint)
+VARIANTS: Tuple[Optional[str], ...] = (None, *INTENTS)
+_VARIANT_INDEX = {v: i for i, v in enumerate(VARIANTS)}
+# shared pieces, then per variant: inferred_intent, decision_card, debug.fit, rest of debug
+_SHARED = 4
+_PER_VARIANT = 4
+
+_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=list).encode
+
+class ArtifactError(ValueError):
+    pass
+
+def label_key(text: str) -> bytes:
+    # text as normalized for the analyze cache key
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+def label_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _blob(normalized: List[Dict[str, Any]], locale_info: Dict[str, Any]) -> bytes:
+    pieces: List[bytes] = []
+    seen: Dict[bytes, int] = {}
+
+    def piece(value: Any) -> int:
+        raw = _encode(value).encode("utf-8")
+        i = seen.get(raw)
+        if i is None:
+            i = seen[raw] = len(pieces)
+            pieces.append(raw)
+        return i
+
+    refs: List[int] = []
+    rules = current_rules()
+    for variant in VARIANTS:
+        result = analyze_normalized(normalized, variant, None, rules=rules)
+        debug = result["debug"]
+        if not pieces:
+            pieces.extend(_encode(v).encode("utf-8") for v in (
+                result["normalized_ingredients"],
+                [compact_ingredient(ing) for ing in result["normalized_ingredients"]],
+                result["fit_by_intent"],
+                result["fingerprint"],
+            ))
+        rest = {k: v for k, v in debug.items() if k != "fit"}
+        rest["locale"] = locale_info
+        refs += [piece(result["inferred_intent"]), piece(result["decision_card"]), piece(debug["fit"]), piece(rest)]
+
+    offsets = [0]
+    for p in pieces:
+        offsets.append(offsets[-1] + len(p))
+    return b"".join((
+        _BLOB.pack(len(pieces), len(VARIANTS)),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        bytes(refs),
+        *pieces,
+    ))
+
+def precompute_chunk(items: List[Tuple[str, Optional[bytes]]], kb: KnowledgeBase) -> List[Tuple[Optional[bytes], Optional[bytes]]]:
+    # [(label, digest of its previous entry)] -> [(digest, blob)]; blob is None
+    # when the digest is unchanged (reuse the old entry), digest None on failure
+    out: List[Tuple[Optional[bytes], Optional[bytes]]] = []
+    for text, previous in items:
+        try:
+            localized, locale_info = LOCALES.localize(kb, text)
+            normalized = normalize_ingredients(text, localized)
+            # the shard versions and the locale info go into the digest too: a
+            # changed shard or detection rule must not reuse the old blob
+            shards = localized.version[len(localized.core_version):] if localized.core_version else ""
+            key = shards + _encode(locale_info) + _encode(normalized)
+            digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+            out.append((digest, None if digest == previous else _blob(normalized, locale_info)))
+        except Exception as e:  # one bad label must not sink the build
+            logger.warning("precompute: %s: %s", type(e).__name__, e)
+            out.append((None, None))
+    return out
+
+class Hit:
+    # one label + variant, as raw JSON pieces straight out of the mmap
+    __slots__ = ("normalized", "normalized_compact", "fit_by_intent", "fingerprint", "intent", "card", "fit", "rest")
+
+    def __init__(self, shared: List[bytes], variant: List[bytes]):
+        self.normalized, self.normalized_compact, self.fit_by_intent, self.fingerprint = shared
+        self.intent, self.card, self.fit, self.rest = variant
+
+    def body(self, analysis_id: str) -> bytes:
+        # same JSON as AnalyzeResponse(**result).model_dump_json()
+        return b"".join((
+            b'{"normalized_ingredients":', self.normalized,
+            b',"inferred_intent":', self.intent,
+            b',"decision_card":', self.card,
+            b',"fit_by_intent":', self.fit_by_intent,
+            b',"fingerprint":', self.fingerprint,
+            b',"debug":{"fit":', self.fit, b",", self.rest[1:],
+            b',"analysis_id":"', analysis_id.encode(), b'"}',
+        ))
+
+    def compact_body(self, kb_version: str, analysis_id: str, debug: bool = False) -> bytes:
+        # same JSON as services.compact.encode_compact
+        return b"".join((
+            b'{"kb_version":', _encode(kb_version).encode("utf-8"),
+            b',"normalized_ingredients":', self.normalized_compact,
+            b',"inferred_intent":', self.intent,
+            b',"decision_card":', self.card,
+            b',"fit_by_intent":', self.fit_by_intent,
+            b',"fingerprint":', self.fingerprint,
+            b',"analysis_id":"', analysis_id.encode(), b'"',
+            (b',"debug":' + self.rest) if debug else b"",
+            b"}",
+        ))
+
+    def result(self) -> Dict[str, Any]:
+        # decoded, for the analysis store (follow-up chat)
+        return {
+            "normalized_ingredients": json.loads(self.normalized),
+            "inferred_intent": json.loads(self.intent),
+            "decision_card": json.loads(self.card),
+            "fit_by_intent": json.loads(self.fit_by_intent),
+        }
+
+class Artifact:
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # empty file
+                raise ArtifactError(f"{path}: {e}")
+        if len(self._mm) < _HEADER.size:
+            raise ArtifactError(f"{path}: truncated")
+        magic, fmt, self.count, meta_len, self._fanout_at, self._index_at, self._data_at = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ArtifactError(f"{path}: not a precomputed-analysis artifact (format {FORMAT})")
+        self.meta: Dict[str, Any] = json.loads(self._mm[_HEADER.size:_HEADER.size + meta_len])
+        self.version = artifact_version(self.meta["kb"], self.meta["rules"], self.meta["locales"])
+
+    def record(self, key: bytes) -> Optional[Tuple[bytes, int, int]]:
+        # (digest, absolute offset, length) for a key
+        mm = self._mm
+        lo, hi = _SPAN.unpack_from(mm, self._fanout_at + 4 * int.from_bytes(key[:2], "big"))
+        base = self._index_at
+        size = _RECORD.size
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            at = base + mid * size
+            probe = mm[at:at + 16]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                _, digest, offset, length = _RECORD.unpack_from(mm, at)
+                return digest, self._data_at + offset, length
+        return None
+
+    def blob(self, offset: int, length: int) -> bytes:
+        return self._mm[offset:offset + length]
+
+    def hit(self, key: bytes, variant: int) -> Optional[Hit]:
+        rec = self.record(key)
+        if rec is None:
+            return None
+        mm, at = self._mm, rec[1]
+        n, variants = _BLOB.unpack_from(mm, at)
+        offsets = struct.unpack_from(f"<{n + 1}I", mm, at + _BLOB.size)
+        refs_at = at + _BLOB.size + 4 * (n + 1)
+        base = refs_at + variants * _PER_VARIANT
+        pick = lambda i: mm[base + offsets[i]:base + offsets[i + 1]]
+        refs = mm[refs_at + variant * _PER_VARIANT:refs_at + (variant + 1) * _PER_VARIANT]
+        return Hit([pick(i) for i in range(_SHARED)], [pick(i) for i in refs])
+
+    def close(self) -> None:
+        self._mm.close()
+
+def artifact_version(kb_version: str, rules_version: str, locales_signature: str) -> str:
+    return f"{kb_version}:{rules_version}:{locales_signature}"
+
+def _open(path: Path) -> Optional[Artifact]:
+    try:
+        return Artifact(path)
+    except FileNotFoundError:
+        return None
+    except (ArtifactError, ValueError, KeyError, struct.error) as e:
+        logger.warning("precomputed analyses: %s", e)
+        return None
+
+def build_artifact(rows: Iterable[Dict[str, Any]], output: Path, kb: KnowledgeBase, chunk_rows: int = 256) -> Dict[str, Any]:
+    # Every catalog label under every optimize_for variant, scored on the
+    # worker pool. Entries of the previous artifact at `output` are reused
+    # when the label still normalizes to the same records under the same
+    # scoring rules; labels no longer in the catalog are dropped.
+    t0 = time.perf_counter()
+    output = Path(output)
+    rules_version = current_rules().version
+    old = _open(output)
+    if old is not None and (old.meta.get("rules") != rules_version or old.meta.get("variants") != list(VARIANTS)):
+        old = None  # everything is re-scored anyway
+    stats = {"labels": 0, "computed": 0, "reused": 0, "duplicates": 0, "failed": 0}
+    seen: set = set()
+    inflight: "deque" = deque()
+    records: List[Tuple[bytes, bytes, int, int]] = []
+
+    def chunks() -> Iterator[List[Tuple[str, Optional[bytes]]]]:
+        batch: List[Tuple[str, Optional[bytes]]] = []
+        for row in rows:
+            text = row.get("ingredients_text")
+            if not isinstance(text, str) or not text.strip():
+                stats["failed"] += 1
+                continue
+            key = label_key(label_text(text))
+            if key in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(key)
+            previous = old.record(key) if old is not None else None
+            inflight.append((key, previous))
+            batch.append((text, previous[0] if previous else None))
+            if len(batch) >= chunk_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryFile(dir=output.parent) as data:
+        for results in map_chunks(precompute_chunk, chunks(), kb):
+            for digest, blob in results:
+                key, previous = inflight.popleft()
+                if digest is None:
+                    stats["failed"] += 1
+                    continue
+                if blob is None:
+                    blob = old.blob(previous[1], previous[2])
+                    stats["reused"] += 1
+                else:
+                    stats["computed"] += 1
+                records.append((key, digest, data.tell(), len(blob)))
+                data.write(blob)
+        records.sort()
+        stats["labels"] = len(records)
+
+        meta = _encode({
+            "kb": kb.version, "rules": rules_version, "locales": LOCALES.signature,
+            "variants": list(VARIANTS), "labels": len(records), "built": round(time.time(), 3),
+        }).encode("utf-8")
+        fanout = [0] * (_FANOUT + 1)
+        for key, *_ in records:
+            fanout[int.from_bytes(key[:2], "big") + 1] += 1
+        for i in range(_FANOUT):
+            fanout[i + 1] += fanout[i]
+        fanout_at = _HEADER.size + len(meta)
+        index_at = fanout_at + 4 * len(fanout)
+        data_at = index_at + _RECORD.size * len(records)
+
+        # written next to the target and renamed over it: readers keep their
+        # mmap of the old file until they notice the new one
+        fd, tmp = tempfile.mkstemp(dir=output.parent, prefix=output.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(_HEADER.pack(MAGIC, FORMAT, len(records), len(meta), fanout_at, index_at, data_at))
+                out.write(meta)
+                out.write(struct.pack(f"<{len(fanout)}I", *fanout))
+                out.write(b"".join(_RECORD.pack(*rec) for rec in records))
+                data.seek(0)
+                shutil.copyfileobj(data, out, 1 << 20)
+            os.replace(tmp, output)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    if old is not None:
+        old.close()
+    stats["bytes"] = output.stat().st_size
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+class PrecomputedAnalyses:
+    # the serving side: the artifact at `path`, re-opened when the file is
+    # replaced (checked at most once per RELOAD_CHECK_SECONDS), and used only
+    # while it matches the live KB, rules and locale shards
+
+    def __init__(self, path: Optional[Path] = DEFAULT_PATH):
+        self.path = Path(path) if path else None
+        self._artifact: Optional[Artifact] = None
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _current(self) -> Optional[Artifact]:
+        now = time.monotonic()
+        if self.path is None or now - self._checked < RELOAD_CHECK_SECONDS:
+            return self._artifact
+        with self._lock:
+            if now - self._checked >= RELOAD_CHECK_SECONDS:
+                try:
+                    st = os.stat(self.path)
+                    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+                except FileNotFoundError:
+                    stamp = None
+                if stamp != self._stamp:
+                    self._artifact = _open(self.path) if stamp else None
+                    self._stamp = stamp
+                self._checked = now
+        return self._artifact
+
+    def lookup(self, text: str, optimize_for: Optional[str], version: str) -> Optional[Hit]:
+        # text: label_text() of the label; version: artifact_version() of the live KB
+        artifact = self._current()
+        variant = _VARIANT_INDEX.get(optimize_for)
+        if artifact is None or variant is None or artifact.version != version:
+            return None
+        hit = artifact.hit(label_key(text), variant)
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            METRICS.incr("precomputed_hits")
+        return hit
+
+    def stats(self) -> Dict[str, Any]:
+        artifact = self._current()
+        return {
+            "path": str(self.path) if self.path else None,
+            "labels": artifact.count if artifact else None,
+            "version": artifact.version if artifact else None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+def _default_path() -> Optional[Path]:
+    env = os.environ.get("INGREDIENT_PRECOMPUTED", "")
+    if env == "off":
+        return None
+    return Path(env) if env else DEFAULT_PATH
+
+PRECOMPUTED = PrecomputedAnalyses(_default_path())
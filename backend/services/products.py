@@ -0,0 +1,372 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.intent import INTENTS
+from services.recipes import canonical_set, fingerprint
+from services.rules import RuleSet, current_rules
+from services.scoring import score_intents
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+# where `cli.py index-products` writes by default; the server reads it only
+# when INGREDIENT_PRODUCTS_DB points at it
+DEFAULT_DB = DATA_DIR / "products.db"
+
+# token postings holding more than 1/DENSE_RATIO of the catalog are kept as
+# bitsets (Python ints); rarer ones as sorted id arrays, turned into bitsets
+# on demand (and LRU-cached)
+DENSE_RATIO = 64
+SPARSE_BITSETS = 256
+# per-intent "fit >= band * SCORE_STEP" bitsets
+SCORE_STEP = 5
+# products are also bucketed by ingredient count (the last bucket is "this many or more")
+MAX_SIZE = 255
+# how often a query checks whether the catalog file was rebuilt
+RELOAD_CHECK_SECONDS = 1.0
+
+_NONZERO = re.compile(rb"[^\x00]")
+
+def flag_token(flag: str) -> str:
+    return f"flag:{flag}"
+
+def _bitset(ids: Iterable[int], size: int) -> int:
+    buf = bytearray((size + 7) // 8)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+def _members(bits: int, size: int) -> List[int]:
+    # set bit positions, ascending; the byte scan keeps this in C for sparse sets
+    if not bits:
+        return []
+    data = bits.to_bytes((size + 7) // 8, "little")
+    out = []
+    for m in _NONZERO.finditer(data):
+        byte, base = data[m.start()], m.start() << 3
+        for b in range(8):
+            if byte >> b & 1:
+                out.append(base + b)
+    return out
+
+class ProductStore:
+    # Catalog products (id, name, canonical ingredients, flags, fit per intent)
+    # in a SQLite file written by `cli.py index-products`, plus an in-memory
+    # inverted index: canonical ingredient / "flag:<flag>" -> product rows.
+    # Only numbers live in memory (token ids, per-intent scores as bytes); ids
+    # and names are read back from SQLite for the handful of results.
+    # Each row records the KB and rules versions its fits were scored under.
+    # Rows from another KB are left out (their ingredients may resolve
+    # differently now: re-index); rows from other rules are re-scored at load
+    # from their stored ingredient features.
+
+    def __init__(self, db_path: Optional[Path] = None, kb_version: Optional[str] = None):
+        self.db_path = str(db_path) if db_path else ":memory:"
+        self.kb_version = kb_version
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._generation: Optional[int] = None
+        self._loaded_for: Optional[Tuple[Optional[str], str]] = None
+        self._checked = 0.0
+        self.stale = 0
+        self.rescored = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.size = 0
+        self._rowids = array("q")
+        self._vocab: Dict[str, int] = {}
+        self._sizes = array("H")  # distinct ingredients per product
+        self._postings: Dict[int, Any] = {}
+        self._scores: Dict[str, bytearray] = {intent: bytearray() for intent in INTENTS}
+        self._bands: Dict[str, List[int]] = {}
+        self._band_eq: Dict[str, List[int]] = {}
+        self._size_eq: Dict[int, int] = {}
+        self._sizes_present: List[int] = []
+        self._sparse: "OrderedDict[int, int]" = OrderedDict()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS products (
+                    rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, name TEXT,
+                    fingerprint TEXT NOT NULL, ingredients TEXT NOT NULL, flags TEXT NOT NULL, fits BLOB NOT NULL,
+                    kb_version TEXT NOT NULL, rules_version TEXT NOT NULL, features TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                """
+            )
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    # -- writing (CLI / tests) -------------------------------------------
+
+    def add_many(self, products: Iterable[Tuple[str, Optional[str], Dict[str, Any]]],
+                 kb_version: str, rules_version: str) -> int:
+        # (product_id, name, analysis result) -> stored; re-adding an id replaces it.
+        # The versions are the ones read before analyzing: if the rules moved
+        # meanwhile, the row is just re-scored once more at load.
+        rows = []
+        for product_id, name, result in products:
+            normalized = result["normalized_ingredients"]
+            flags = sorted({f for ing in normalized for f in (ing.get("flags") or ())})
+            fits = bytes(int(result["fit_by_intent"].get(intent, {}).get("fit_score", 0)) for intent in INTENTS)
+            rows.append((str(product_id), name, result.get("fingerprint") or fingerprint(normalized),
+                         json.dumps(canonical_set(normalized)), json.dumps(flags), fits,
+                         kb_version, rules_version, json.dumps(_features(normalized))))
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            try:
+                db.executemany(
+                    "INSERT OR REPLACE INTO products (id, name, fingerprint, ingredients, flags, fits, "
+                    "kb_version, rules_version, features) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                # readers rebuild their index when this moves
+                db.execute(
+                    "INSERT INTO meta (key, value) VALUES ('generation', '1') "
+                    "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    # -- index ------------------------------------------------------------
+
+    def _current_generation(self) -> int:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _ensure_loaded(self) -> None:
+        # rebuilt when the catalog was re-indexed or the scoring rules were reloaded
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked < RELOAD_CHECK_SECONDS:
+            return
+        with self._lock:
+            self._checked = now
+            generation = self._current_generation()
+            rules = current_rules()
+            if generation != self._generation or self._loaded_for != (self.kb_version, rules.version):
+                self._load(rules)
+                self._generation = generation
+                self._loaded_for = (self.kb_version, rules.version)
+
+    def _load(self, rules: RuleSet) -> None:
+        t0 = time.perf_counter()
+        self._reset()
+        self.stale = self.rescored = 0
+        vocab = self._vocab
+        lists: Dict[int, array] = {}
+        scores = self._scores
+        cur = self._conn().execute(
+            "SELECT rowid, ingredients, flags, fits, kb_version, rules_version, features FROM products ORDER BY rowid"
+        )
+        for rowid, ingredients, flags, fits, kb_version, rules_version, features in cur:
+            if self.kb_version is not None and kb_version != self.kb_version:
+                self.stale += 1
+                continue
+            if rules_version != rules.version:
+                fits = _rescore(json.loads(features), rules)
+                self.rescored += 1
+            i = self.size
+            self.size += 1
+            self._rowids.append(rowid)
+            names = json.loads(ingredients)
+            self._sizes.append(min(len(names), 0xFFFF))
+            for token in names + [flag_token(f) for f in json.loads(flags)]:
+                tid = vocab.get(token)
+                if tid is None:
+                    tid = vocab[token] = len(vocab)
+                    lists[tid] = array("I")
+                lists[tid].append(i)
+            for intent, score in zip(INTENTS, fits):
+                scores[intent].append(score)
+
+        n = self.size
+        dense_at = max(1, n // DENSE_RATIO)
+        self._postings = {tid: (_bitset(ids, n) if len(ids) > dense_at else ids) for tid, ids in lists.items()}
+        for intent, col in scores.items():
+            by_band: List[List[int]] = [[] for _ in range(100 // SCORE_STEP + 1)]
+            for i, s in enumerate(col):
+                by_band[min(s, 100) // SCORE_STEP].append(i)
+            # band_eq[b]: fit in [b, b + 1) * SCORE_STEP; bands[b]: fit >= b * SCORE_STEP
+            eq = [_bitset(ids, n) for ids in by_band]
+            bands, acc = [0] * len(eq), 0
+            for b in range(len(eq) - 1, -1, -1):
+                acc |= eq[b]
+                bands[b] = acc
+            self._bands[intent], self._band_eq[intent] = bands, eq
+        by_size: Dict[int, List[int]] = {}
+        for i, size in enumerate(self._sizes):
+            by_size.setdefault(min(size, MAX_SIZE), []).append(i)
+        self._size_eq = {size: _bitset(ids, n) for size, ids in by_size.items()}
+        self._sizes_present = sorted(self._size_eq)
+        if self.stale:
+            logger.warning("product index: %d products were indexed with another knowledge base and are left out; "
+                           "re-run cli.py index-products", self.stale)
+        logger.info("product index: %d products (%d re-scored), %d tokens in %.1fs",
+                    n, self.rescored, len(vocab), time.perf_counter() - t0)
+
+    def _postings_bits(self, tid: int) -> int:
+        p = self._postings[tid]
+        if isinstance(p, int):
+            return p
+        bits = self._sparse.get(tid)
+        if bits is None:
+            bits = self._sparse[tid] = _bitset(p, self.size)
+            if len(self._sparse) > SPARSE_BITSETS:
+                self._sparse.popitem(last=False)
+        else:
+            self._sparse.move_to_end(tid)
+        return bits
+
+    # -- queries ------------------------------------------------------------
+
+    def alternatives(
+        self,
+        ingredients: List[str],
+        intent: str,
+        fit_score: int,
+        k: int = 5,
+        min_overlap: float = 0.5,
+        avoid_flags: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        # top-k products that fit `intent` better than fit_score and share at
+        # least min_overlap (Jaccard) of their ingredients with this label;
+        # closest recipe first, then best fit
+        self._ensure_loaded()
+        with self._lock:
+            picked = self._alternatives(ingredients, intent, fit_score, k, min_overlap, avoid_flags)
+        return self._describe(picked, ingredients, intent)
+
+    def _alternatives(self, ingredients, intent, fit_score, k, min_overlap, avoid_flags) -> List[Tuple[float, int, int]]:
+        n, q = self.size, len(ingredients)
+        if not n or not q or intent not in self._scores or fit_score >= 100:
+            return []
+        query = [self._vocab[c] for c in ingredients if c in self._vocab]
+        # J = I / (|P| + q - I) >= t needs at least ceil(t * q) shared ingredients
+        need = max(1, math.ceil(min_overlap * q - 1e-9))
+        if len(query) < need:
+            return []
+
+        # products scoring higher, minus anything carrying an avoided flag
+        # (x ^ (x & y) is x & ~y without materializing a negative bigint)
+        lowest = min(fit_score + 1, 100) // SCORE_STEP
+        allowed = self._bands[intent][lowest]
+        for flag in avoid_flags:
+            tid = self._vocab.get(flag_token(flag))
+            if tid is not None:
+                allowed ^= allowed & self._postings_bits(tid)
+        if not allowed:
+            return []
+
+        # at_least[c]: products sharing >= c of the query's ingredients (bit-parallel counting)
+        # (a level that can no longer reach `need` with the tokens left is not updated)
+        m = len(query)
+        at_least = [allowed] + [0] * m
+        for seen, tid in enumerate(query, 1):
+            bits = self._postings_bits(tid) & allowed
+            for c in range(seen, max(0, need - (m - seen) - 1), -1):
+                at_least[c] |= at_least[c - 1] & bits
+
+        # (shared c, size s) cells with J = c / (s + q - c) >= t, grouped by J, best first
+        groups: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for c in range(need, m + 1):
+            for size in self._sizes_present:
+                if size < c:
+                    continue
+                d = size + q - c
+                if c / d < min_overlap - 1e-9:
+                    break
+                g = math.gcd(c, d)
+                groups.setdefault((c // g, d // g), []).append((c, size))
+
+        scores, sizes, band_eq = self._scores[intent], self._sizes, self._band_eq[intent]
+        found: List[Tuple[float, int, int]] = []
+        for j in sorted(groups, key=lambda f: f[0] / f[1], reverse=True):
+            cells = []
+            for c, size in groups[j]:
+                bits = (at_least[c] ^ (at_least[c + 1] if c < m else 0)) & self._size_eq[size]
+                if bits:
+                    cells.append((c, bits))
+            # within one J, best fit first: walk score bands down, stop once k are in
+            for b in range(len(band_eq) - 1, lowest - 1, -1):
+                for c, bits in cells:
+                    for i in _members(bits & band_eq[b], n):
+                        score = scores[i]
+                        if score > fit_score:
+                            found.append((c / (sizes[i] + q - c), score, i))
+                if len(found) >= k:
+                    break
+            if len(found) >= k:
+                break
+        found.sort(key=lambda r: (-r[0], -r[1], r[2]))
+        return found[:k]
+
+    def _describe(self, picked: List[Tuple[float, int, int]], ingredients: List[str], intent: str) -> List[Dict[str, Any]]:
+        if not picked:
+            return []
+        rules = current_rules()
+        rows = {}
+        with self._lock:
+            rowids = [self._rowids[i] for _, _, i in picked]
+            for rowid, pid, name, ingredients_json in self._conn().execute(
+                f"SELECT rowid, id, name, ingredients FROM products WHERE rowid IN ({','.join('?' * len(rowids))})",
+                rowids,
+            ):
+                rows[rowid] = (pid, name, json.loads(ingredients_json))
+        mine = set(ingredients)
+        out = []
+        for (j, score, i), rowid in zip(picked, rowids):
+            if rowid not in rows:
+                continue  # replaced since the index was built
+            pid, name, theirs = rows[rowid]
+            out.append({
+                "id": pid,
+                "name": name,
+                "fit_score": score,
+                "color": "green" if score >= rules.green_at else "yellow" if score >= rules.yellow_at else "red",
+                "overlap": round(j, 3),
+                "removed": sorted(mine - set(theirs)),
+                "added": sorted(set(theirs) - mine),
+            })
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.db_path, "products": self.size, "tokens": len(self._vocab), "generation": self._generation,
+                "stale": self.stale, "rescored": self.rescored}
+
+def _features(normalized: List[Dict[str, Any]]) -> List[List[Any]]:
+    # what the fit depends on, per ingredient: enough to re-score under new rules
+    return [[ing["canonical"], bool(ing.get("known", False)), ing.get("category", "unknown"),
+             ing.get("evidence", "unknown"), list(ing.get("flags") or ())] for ing in normalized]
+
+def _rescore(features: List[List[Any]], rules: RuleSet) -> bytes:
+    records = [{"raw": c, "canonical": c, "known": known, "category": category, "evidence": evidence, "flags": flags}
+               for c, known, category, evidence, flags in features]
+    fits = score_intents(records, INTENTS, rules)
+    return bytes(fits[intent]["fit_score"] for intent in INTENTS)
+
+def _default_db() -> Optional[Path]:
+    # in-memory (empty) unless a catalog is configured, e.g. data/products.db
+    env = os.environ.get("INGREDIENT_PRODUCTS_DB", "")
+    return Path(env) if env else None
+
+PRODUCTS = ProductStore(db_path=_default_db())
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+
+# The switch interval is process-wide: overlapping profiles share one
+# lowered setting; the first to start saves the original, the last to
+# finish restores it.
+_switch_lock = threading.Lock()
+_switch_users = 0
+_switch_saved: Optional[float] = None
+
+def _lower_switch_interval(interval: float) -> None:
+    global _switch_users, _switch_saved
+    with _switch_lock:
+        if _switch_users == 0:
+            _switch_saved = sys.getswitchinterval()
+        _switch_users += 1
+        sys.setswitchinterval(min(sys.getswitchinterval(), interval))
+
+def _restore_switch_interval() -> None:
+    global _switch_users, _switch_saved
+    with _switch_lock:
+        _switch_users -= 1
+        if _switch_users == 0 and _switch_saved is not None:
+            sys.setswitchinterval(_switch_saved)
+            _switch_saved = None
+
+class SamplingProfiler:
+    # Opt-in, per-request: a helper thread snapshots the target thread's stack
+    # every `interval` seconds and counts the innermost frames. The profiled
+    # code runs unmodified; cost is one stack walk per sample.
+
+    def __init__(self, interval: float = 0.0005, depth: int = 3, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.depth = depth
+        self.thread_id = thread_id
+        self.samples = 0
+        self._leaf: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lowered = False
+
+    def __enter__(self) -> "SamplingProfiler":
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        # the sampler needs the GIL to look; with the default 5ms switch
+        # interval a sub-10ms request would get no samples at all
+        _lower_switch_interval(self.interval / 2)
+        self._lowered = True
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lowered:
+            self._lowered = False
+            _restore_switch_interval()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self._leaf[" <- ".join(stack)] += 1
+
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "top": [{"stack": k, "samples": v} for k, v in self._leaf.most_common(top)],
+        }
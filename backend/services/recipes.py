@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.cache import LRUCache
+from services.scoring import FitMatrix
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature length and LSH banding: 16 bands x 4 rows puts the
+# 50%-chance-of-candidate point near Jaccard 0.5
+NUM_PERM = 64
+BANDS = 16
+_PRIME = (1 << 61) - 1
+
+def canonical_set(normalized: Iterable[Dict[str, Any]]) -> List[str]:
+    # the recipe: distinct canonical ingredients, order/case/synonyms folded away
+    return sorted({ing["canonical"] for ing in normalized if ing.get("canonical")})
+
+def fingerprint(normalized: Iterable[Dict[str, Any]]) -> str:
+    # same recipe => same fingerprint ("cane sugar, E330" == "Citric acid, sugar")
+    return hashlib.sha1("\x1f".join(canonical_set(normalized)).encode("utf-8")).hexdigest()[:20]
+
+def jaccard(a: Sequence[str], b: Sequence[str]) -> float:
+    sa, sb = set(a), set(b)
+    return len(sa & sb) / len(sa | sb) if sa or sb else 1.0
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+class MinHasher:
+    # h_i(x) = (a_i * hash(x) + b_i) mod p; fixed seeds so signatures persist.
+    # The vocabulary is the KB plus a tail of unknowns, so each token's 64
+    # hash values are computed once and a signature is one element-wise min.
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        params = hashlib.blake2b(f"minhash:{seed}".encode(), digest_size=64).digest()
+        coeffs: List[int] = []
+        i = 0
+        while len(coeffs) < 2 * num_perm:
+            params = hashlib.blake2b(params + i.to_bytes(4, "little"), digest_size=64).digest()
+            coeffs.extend(int.from_bytes(params[j:j + 8], "little") % _PRIME for j in range(0, 64, 8))
+            i += 1
+        self.num_perm = num_perm
+        self._perms = [(coeffs[2 * k] | 1, coeffs[2 * k + 1]) for k in range(num_perm)]
+        self.token_values = lru_cache(maxsize=1 << 16)(self._token_values)
+
+    def _token_values(self, token: str) -> Tuple[int, ...]:
+        h = _token_hash(token)
+        return tuple((a * h + b) % _PRIME for a, b in self._perms)
+
+    def signature(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        values = [self.token_values(t) for t in tokens]
+        if not values:
+            return (_PRIME,) * self.num_perm
+        return tuple(map(min, *values)) if len(values) > 1 else values[0]
+
+    def bands(self, signature: Tuple[int, ...], bands: int = BANDS) -> List[int]:
+        # one bucket key per band, as a signed 64-bit int (SQLite INTEGER)
+        rows = len(signature) // bands
+        out = []
+        for i in range(bands):
+            raw = ",".join(map(str, signature[i * rows:(i + 1) * rows])).encode()
+            out.append(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little", signed=True))
+        return out
+
+class RecipeIndex:
+    # fingerprint -> recipe (canonical ingredients, fit under every intent) and
+    # its fit matrix, in memory or in a local SQLite file shared by every
+    # process on the host (bulk-scoring workers included). LSH band buckets give
+    # near-duplicate candidates without scanning the catalog; exact Jaccard
+    # then ranks them.
+
+    def __init__(self, db_path: Optional[Path] = None, num_perm: int = NUM_PERM, bands: int = BANDS,
+                 memory_entries: int = 4096):
+        self.db_path = str(db_path) if db_path else ":memory:"
+        # hot matrices skip the SQLite read + JSON decode
+        self._memory = LRUCache(max_entries=memory_entries)
+        self.bands = bands
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._known: set = set()
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per process: forked pool workers must not share the parent's
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS recipes (
+                    fingerprint TEXT PRIMARY KEY, version TEXT NOT NULL,
+                    ingredients TEXT NOT NULL, fit_by_intent TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    band INTEGER NOT NULL, bucket INTEGER NOT NULL, fingerprint TEXT NOT NULL,
+                    PRIMARY KEY (band, bucket, fingerprint)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS matrices (
+                    fingerprint TEXT PRIMARY KEY, version TEXT NOT NULL, body TEXT NOT NULL
+                );
+                """
+            )
+            self._db, self._pid, self._known = db, os.getpid(), set()
+        return self._db
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn().execute(sql, params).fetchall()
+
+    def add(self, fp: str, ingredients: List[str], fit_by_intent: Dict[str, Dict[str, Any]], version: str) -> None:
+        # register a recipe for near-duplicate lookups (no-op if already current)
+        if (fp, version) in self._known:
+            return
+        buckets = self.hasher.bands(self.hasher.signature(ingredients), self.bands)
+        fits = {intent: {"fit_score": f["fit_score"], "color": f["color"]} for intent, f in fit_by_intent.items()}
+        try:
+            with self._lock:
+                db = self._conn()
+                db.execute("BEGIN")
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO recipes (fingerprint, version, ingredients, fit_by_intent) VALUES (?, ?, ?, ?)",
+                        (fp, version, json.dumps(ingredients), json.dumps(fits, separators=(",", ":"))),
+                    )
+                    db.executemany(
+                        "INSERT OR IGNORE INTO buckets (band, bucket, fingerprint) VALUES (?, ?, ?)",
+                        [(band, bucket, fp) for band, bucket in enumerate(buckets)],
+                    )
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+                if len(self._known) >= 1 << 17:
+                    self._known.clear()  # only a write-skipping hint; keep it bounded
+                self._known.add((fp, version))
+        except sqlite3.Error as e:
+            logger.warning("recipe index: write failed: %s", e)
+
+    def get_matrix(self, fp: str, version: str) -> Optional[FitMatrix]:
+        self._memory.bind_version(version)
+        hit = self._memory.get(fp)
+        if hit is not None:
+            return hit
+        try:
+            rows = self._query("SELECT body FROM matrices WHERE fingerprint = ? AND version = ?", (fp, version))
+        except sqlite3.Error as e:
+            logger.warning("recipe index: read failed: %s", e)
+            return None
+        if not rows:
+            return None
+        matrix = json.loads(rows[0][0])
+        self._memory.put(fp, matrix)
+        return matrix
+
+    def put_matrix(self, fp: str, version: str, matrix: FitMatrix, ingredients: List[str],
+                   fit_by_intent: Dict[str, Dict[str, Any]]) -> None:
+        # canonical ids only: nothing label-specific is stored
+        self._memory.bind_version(version)
+        self._memory.put(fp, matrix)
+        try:
+            with self._lock:
+                self._conn().execute(
+                    "INSERT OR REPLACE INTO matrices (fingerprint, version, body) VALUES (?, ?, ?)",
+                    (fp, version, json.dumps(matrix, separators=(",", ":"))),
+                )
+        except sqlite3.Error as e:
+            logger.warning("recipe index: write failed: %s", e)
+        self.add(fp, ingredients, fit_by_intent, version)
+
+    def similar(self, ingredients: List[str], min_jaccard: float = 0.5, limit: int = 20,
+                version: Optional[str] = None) -> List[Dict[str, Any]]:
+        # near-duplicate recipes, most similar first (the recipe itself included)
+        buckets = self.hasher.bands(self.hasher.signature(ingredients), self.bands)
+        try:
+            rows = self._query(
+                "SELECT r.fingerprint, r.version, r.ingredients, r.fit_by_intent FROM recipes r WHERE r.fingerprint IN ("
+                + " UNION ".join("SELECT fingerprint FROM buckets WHERE band = ? AND bucket = ?" for _ in buckets)
+                + ")",
+                [v for pair in enumerate(buckets) for v in pair],
+            )
+        except sqlite3.Error as e:
+            logger.warning("recipe index: read failed: %s", e)
+            return []
+        out = []
+        for fp, row_version, raw_ingredients, raw_fits in rows:
+            if version is not None and row_version != version:
+                continue  # scored under another KB/rules version
+            other = json.loads(raw_ingredients)
+            score = jaccard(ingredients, other)
+            if score >= min_jaccard:
+                out.append({"fingerprint": fp, "jaccard": round(score, 3), "ingredients": other,
+                            "fit_by_intent": json.loads(raw_fits)})
+        out.sort(key=lambda r: (-r["jaccard"], r["fingerprint"]))
+        return out[:limit]
+
+    def greener(self, ingredients: List[str], intent: str, fit_score: int, min_jaccard: float = 0.5,
+                limit: int = 5, version: Optional[str] = None) -> List[Dict[str, Any]]:
+        # "similar but better fit": lookalikes that score higher for this intent
+        better = [
+            r for r in self.similar(ingredients, min_jaccard, limit=1000, version=version)
+            if r["fit_by_intent"].get(intent, {}).get("fit_score", -1) > fit_score
+        ]
+        better.sort(key=lambda r: (-r["fit_by_intent"][intent]["fit_score"], -r["jaccard"]))
+        return better[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            (recipes,), = self._query("SELECT COUNT(*) FROM recipes")
+            (matrices,), = self._query("SELECT COUNT(*) FROM matrices")
+        except sqlite3.Error:
+            recipes = matrices = None
+        return {"path": self.db_path, "recipes": recipes, "matrices": matrices, "memory": self._memory.stats()}
+
+def _default_db() -> Optional[Path]:
+    # in-memory, per process, unless a file is configured (e.g. data/recipes.db)
+    env = os.environ.get("INGREDIENT_RECIPE_DB", "")
+    if env in ("", "off"):
+        return None
+    return Path(env)
+
+RECIPES = RecipeIndex(db_path=_default_db())
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.features import mask_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = Path(__file__).resolve().parent.parent / "data" / "scoring_rules.json"
+# how often (seconds) a worker stats the rules file for changes
+RELOAD_INTERVAL = float(os.environ.get("INGREDIENT_RULES_RELOAD_SECS", "2"))
+
+class RulesError(ValueError):
+    pass
+
+# (risk increments in rule order, red?, yellow?)
+Cell = Tuple[Tuple[float, ...], bool, bool]
+
+class RuleSet:
+    # Compiled form of data/scoring_rules.json. Rule feature lists become
+    # bitmasks and risk rules are grouped per intent, so scoring an ingredient
+    # only touches the active intent's rules; results per distinct ingredient
+    # mask are memoized on the ruleset (a reload starts with fresh caches).
+
+    def __init__(self, spec: Dict[str, Any], version: str):
+        self.version = version
+        try:
+            inf = spec["intent_inference"]
+            sc = spec["scoring"]
+
+            self.hint_weight = float(inf["hint"]["weight"])
+            self.hint_reason = str(inf["hint"]["reason"])
+            self.preferences = [
+                (str(p["field"]), frozenset(p["any"]), str(p["intent"]), float(p["weight"]), str(p["reason"]))
+                for p in inf.get("preferences", [])
+            ]
+            # order matters: it sets score insertion order and so tie-breaks
+            self.triggers = [
+                (mask_of(t["any"]), str(t["intent"]), float(t["weight"]), str(t["reason"]))
+                for t in inf.get("triggers", [])
+            ]
+            self.default_intent = str(inf["default"]["intent"])
+            self.default_weight = float(inf["default"]["weight"])
+            self.default_reason = str(inf["default"]["reason"])
+            self.low_below = float(inf["confidence"]["low_below"])
+            self.medium_gap_below = float(inf["confidence"]["medium_gap_below"])
+
+            shared = [self._risk_rule(r) for r in sc.get("shared_rules", [])]
+            self.columns: Dict[str, List[Tuple[int, float, Optional[str]]]] = {
+                intent: [self._risk_rule(r) for r in rules] + shared
+                for intent, rules in sc["risk_rules"].items()
+            }
+            self.fallback_intent = str(sc["fallback_intent"])
+            if self.fallback_intent not in self.columns:
+                raise RulesError(f"fallback_intent '{self.fallback_intent}' has no risk_rules")
+            self.unknown_per_item = float(sc["unknown_risk"]["per_item"])
+            self.unknown_max = float(sc["unknown_risk"]["max"])
+            self.points_per_risk = float(sc["points_per_risk"])
+            self.green_at = float(sc["color_thresholds"]["green"])
+            self.yellow_at = float(sc["color_thresholds"]["yellow"])
+            self.max_red_flags = int(sc["max_red_flags"])
+            self.max_yellow_flags = int(sc["max_yellow_flags"])
+        except (KeyError, TypeError) as e:
+            raise RulesError(f"invalid scoring rules: {e!r}") from e
+
+        self._cells: Dict[str, Dict[int, Cell]] = {intent: {} for intent in self.columns}
+        self._triggered: Dict[int, Tuple[Tuple[str, float, str], ...]] = {}
+
+    @staticmethod
+    def _risk_rule(r: Dict[str, Any]) -> Tuple[int, float, Optional[str]]:
+        flag = r.get("flag")
+        if flag not in (None, "red", "yellow"):
+            raise RulesError(f"flag must be 'red' or 'yellow', got {flag!r}")
+        return mask_of(r["any"]), float(r["weight"]), flag
+
+    def column_for(self, intent: str) -> str:
+        return intent if intent in self.columns else self.fallback_intent
+
+    def cell(self, intent: str, mask: int) -> Cell:
+        cache = self._cells[intent]
+        cell = cache.get(mask)
+        if cell is None:
+            incs, red, yellow = [], False, False
+            for rule_mask, w, flag in self.columns[intent]:
+                if mask & rule_mask:
+                    incs.append(w)
+                    red = red or flag == "red"
+                    yellow = yellow or flag == "yellow"
+            cell = cache[mask] = (tuple(incs), red, yellow)
+        return cell
+
+    def triggered(self, mask: int) -> Tuple[Tuple[str, float, str], ...]:
+        hit = self._triggered.get(mask)
+        if hit is None:
+            hit = self._triggered[mask] = tuple(
+                (intent, w, reason) for m, intent, w, reason in self.triggers if mask & m
+            )
+        return hit
+
+def load_rules(path: Path) -> RuleSet:
+    raw = Path(path).read_bytes()
+    try:
+        spec = json.loads(raw.decode("utf-8"))
+    except ValueError as e:
+        raise RulesError(f"{path}: {e}") from e
+    return RuleSet(spec, version=hashlib.sha1(raw).hexdigest()[:12])
+
+class _RulesHolder:
+    # Current ruleset, hot-reloaded when the file's mtime changes. A broken
+    # edit is logged and the previous ruleset stays active.
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rules: Optional[RuleSet] = None
+        self._mtime = 0.0
+        self._checked = 0.0
+
+    def get(self) -> RuleSet:
+        now = time.monotonic()
+        if self._rules is not None and now - self._checked < RELOAD_INTERVAL:
+            return self._rules
+        with self._lock:
+            if self._rules is None or now - self._checked >= RELOAD_INTERVAL:
+                self._checked = now
+                try:
+                    mtime = self.path.stat().st_mtime
+                except OSError:
+                    mtime = self._mtime
+                if self._rules is None or mtime != self._mtime:
+                    try:
+                        self._rules = load_rules(self.path)
+                        self._mtime = mtime
+                    except (OSError, RulesError) as e:
+                        if self._rules is None:
+                            raise
+                        logger.warning("keeping scoring rules %s: reload failed: %s", self._rules.version, e)
+                        self._mtime = mtime
+        return self._rules
+
+_holder = _RulesHolder(Path(os.environ.get("INGREDIENT_RULES_PATH", DEFAULT_RULES)))
+
+def current_rules() -> RuleSet:
+    return _holder.get()
@@ -1,104 +1,27 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-def score_fit(normalized: List[Dict[str, Any]], intent: Dict[str, Any]) -> Dict[str, Any]:
-    top = intent.get("top_intent", "general")
+from services.features import ingredient_mask
+from services.intent import INTENTS
+from services.rules import RuleSet, current_rules
 
-    # risk points: higher => worse fit
-    risk = 0.0
-    unknown_count = 0
-    red_flags = []
-    yellow_flags = []
-
-    for ing in normalized:
-        known = ing.get("known", False)
-        flags = set(ing.get("flags", []))
-        cat = ing.get("category", "unknown")
-        ev = ing.get("evidence", "unknown")
-
-        if not known:
-            unknown_count += 1
-
-        # scoring by intent
-        if top == "sugar":
-            if "added_sugar" in flags or cat == "sweetener":
-                risk += 2.0
-                red_flags.append(ing["raw"])
-            if "high_glycemic" in flags:
-                risk += 1.0
-                yellow_flags.append(ing["raw"])
-
-        elif top == "gut":
-            if "emulsifier" in flags or cat == "emulsifier":
-                risk += 1.3
-                yellow_flags.append(ing["raw"])
-            if "artificial_sweetener" in flags:
-                risk += 0.8
-                yellow_flags.append(ing["raw"])
-
-        elif top == "allergens":
-            if "allergen" in flags or cat == "allergen":
-                risk += 2.5
-                red_flags.append(ing["raw"])
-            if "may_contain" in flags:
-                risk += 1.0
-                yellow_flags.append(ing["raw"])
-
-        elif top == "clean_label":
-            if "preservative" in flags or cat == "preservative":
-                risk += 1.2
-                yellow_flags.append(ing["raw"])
-            if "colorant" in flags:
-                risk += 0.8
-                yellow_flags.append(ing["raw"])
-            if not known:
-                risk += 0.2
-
-        elif top == "kids":
-            if "kid_sensitive" in flags:
-                risk += 1.4
-                yellow_flags.append(ing["raw"])
-            if "added_sugar" in flags or cat == "sweetener":
-                risk += 1.6
-                yellow_flags.append(ing["raw"])
-
-        elif top == "muscle":
-            # muscle intent: sugar/additives are less important; protein helps
-            if "protein" in flags or cat == "protein":
-                risk -= 0.8
-            if "added_sugar" in flags or cat == "sweetener":
-                risk += 0.7
-                yellow_flags.append(ing["raw"])
-
-        else:
-            # general
-            if "added_sugar" in flags:
-                risk += 1.0
-                yellow_flags.append(ing["raw"])
-            if "allergen" in flags:
-                risk += 0.8
-                yellow_flags.append(ing["raw"])
-            if "preservative" in flags:
-                risk += 0.6
-                yellow_flags.append(ing["raw"])
-
-        # evidence-weight: if evidence is "emerging", slightly soften but add uncertainty
-        if ev == "emerging":
-            risk += 0.1
+# Weights, thresholds and flag buckets live in data/scoring_rules.json
+# (compiled and hot-reloaded by services.rules).
 
+def _finish(rules: RuleSet, risk: float, unknown_count: int, red_flags: List[str], yellow_flags: List[str]) -> Dict[str, Any]:
     # Unknowns increase uncertainty
-    risk += min(1.5, 0.2 * unknown_count)
+    risk += min(rules.unknown_max, rules.unknown_per_item * unknown_count)
 
     # translate risk -> fit score 0-100
     # clamp
-    score = 100 - (risk * 12)  # 12 points per risk unit
+    score = 100 - (risk * rules.points_per_risk)
     if score < 0:
         score = 0
     if score > 100:
         score = 100
 
-    if score >= 75:
+    if score >= rules.green_at:
         color = "green"
-    elif score >= 45:
+    elif score >= rules.yellow_at:
         color = "yellow"
     else:
         color = "red"
@@ -107,7 +30,86 @@ def score_fit(normalized: List[Dict[str, Any]], intent: Dict[str, Any]) -> Dict[
         "fit_score": round(score),
         "color": color,
         "risk": round(risk, 2),
-        "red_flags": list(dict.fromkeys(red_flags))[:5],
-        "yellow_flags": list(dict.fromkeys(yellow_flags))[:6],
+        "red_flags": list(dict.fromkeys(red_flags))[:rules.max_red_flags],
+        "yellow_flags": list(dict.fromkeys(yellow_flags))[:rules.max_yellow_flags],
         "unknown_count": unknown_count
-    }
\ No newline at end of file
+    }
+
+def score_fit(normalized: List[Dict[str, Any]], intent: Dict[str, Any],
+              rules: Optional[RuleSet] = None) -> Dict[str, Any]:
+    rules = rules or current_rules()
+    col = rules.column_for(intent.get("top_intent", "general"))
+
+    # risk points: higher => worse fit
+    risk = 0.0
+    unknown_count = 0
+    red_flags = []
+    yellow_flags = []
+
+    for ing in normalized:
+        if not ing.get("known", False):
+            unknown_count += 1
+
+        incs, red, yellow = rules.cell(col, ingredient_mask(ing))
+        for w in incs:
+            risk += w
+        if red:
+            red_flags.append(ing["raw"])
+        if yellow:
+            yellow_flags.append(ing["raw"])
+
+    return _finish(rules, risk, unknown_count, red_flags, yellow_flags)
+
+def score_all_intents(normalized: List[Dict[str, Any]], rules: Optional[RuleSet] = None) -> Dict[str, Dict[str, Any]]:
+    return score_intents(normalized, INTENTS, rules)
+
+def score_intents(normalized: List[Dict[str, Any]], intents: List[str],
+                  rules: Optional[RuleSet] = None) -> Dict[str, Dict[str, Any]]:
+    # fit for each of the given intents from one pass over the ingredients
+    rules = rules or current_rules()
+    return fits_from_matrix(fit_matrix(normalized, intents, rules), normalized, rules)
+
+# intent -> [risk, unknown count, red canonical ids, yellow canonical ids]
+FitMatrix = Dict[str, List[Any]]
+
+def fit_matrix(normalized: List[Dict[str, Any]], intents: List[str],
+               rules: Optional[RuleSet] = None) -> FitMatrix:
+    # the label-independent part of the fit: it depends only on the canonical
+    # ingredient set, so bulk scoring shares it between labels of one recipe
+    rules = rules or current_rules()
+    cols = [rules.column_for(intent) for intent in intents]
+    n = len(intents)
+    risk = [0.0] * n
+    reds: List[List[str]] = [[] for _ in range(n)]
+    yellows: List[List[str]] = [[] for _ in range(n)]
+    unknown_count = 0
+
+    for ing in normalized:
+        if not ing.get("known", False):
+            unknown_count += 1
+        canonical = ing["canonical"]
+        mask = ingredient_mask(ing)
+        for i, col in enumerate(cols):
+            incs, red, yellow = rules.cell(col, mask)
+            for w in incs:
+                risk[i] += w
+            if red:
+                reds[i].append(canonical)
+            if yellow:
+                yellows[i].append(canonical)
+
+    return {intent: [risk[i], unknown_count, reds[i], yellows[i]] for i, intent in enumerate(intents)}
+
+def fits_from_matrix(matrix: FitMatrix, normalized: List[Dict[str, Any]],
+                     rules: Optional[RuleSet] = None) -> Dict[str, Dict[str, Any]]:
+    # flags named by this label's own raw names, in its ingredient order
+    rules = rules or current_rules()
+    order = {ing["canonical"]: (i, ing["raw"]) for i, ing in enumerate(normalized)}
+
+    def names(canonicals: List[str]) -> List[str]:
+        return [order[c][1] for c in sorted(canonicals, key=lambda c: order[c][0])]
+
+    return {
+        intent: _finish(rules, risk, unknown_count, names(reds), names(yellows))
+        for intent, (risk, unknown_count, reds, yellows) in matrix.items()
+    }
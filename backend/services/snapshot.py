@@ -0,0 +1,235 @@
+import hashlib
+import json
+import mmap
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+# Binary knowledge-base snapshot (little-endian), built from the JSON source:
+#
+#   header    magic, format, counts, section offsets, source-version sid
+#   strings   u32 offsets[n+1] + utf-8 blob; every string stored once
+#   items     fixed-size records sorted by lookup key bytes
+#   synonyms  (synonym sid, canonical sid) sorted by synonym bytes
+#   flagrefs  u32 sids; an item's flags are a slice of this array
+#
+# Lookups binary-search the mmap directly, so opening a snapshot costs a stat
+# and an mmap, and every worker process shares the same page-cache copy.
+
+MAGIC = b"IKBS"
+FORMAT = 1
+NONE = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sIIIIIIQQQQQ")
+_ITEM = struct.Struct("<IIIIIIIII")  # key name category function evidence notes flags_at flags_n extra
+_SYN = struct.Struct("<II")
+_U32 = struct.Struct("<I")
+_SPAN = struct.Struct("<II")
+
+_ITEM_FIELDS = ("name", "category", "function", "evidence", "notes")
+
+class SnapshotError(ValueError):
+    pass
+
+def source_version(raw: bytes) -> str:
+    # same content hash KnowledgeBase uses for the JSON loader
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+def build_snapshot(source: Path, output: Path) -> Dict[str, Any]:
+    raw = Path(source).read_bytes()
+    data = json.loads(raw.decode("utf-8"))
+
+    strings: List[bytes] = []
+    sids: Dict[str, int] = {}
+
+    def sid(s: Any) -> int:
+        if s is None:
+            return NONE
+        s = str(s)
+        i = sids.get(s)
+        if i is None:
+            i = sids[s] = len(strings)
+            strings.append(s.encode("utf-8"))
+        return i
+
+    version_sid = sid(source_version(raw))
+
+    entries = {}
+    for it in data["ingredients"]:
+        entries[it["name"].lower()] = it  # last one wins, as in the JSON loader
+
+    flagrefs: List[int] = []
+    items = []
+    for key in sorted(entries, key=lambda k: k.encode("utf-8")):
+        it = entries[key]
+        flags = it.get("flags") or []
+        extra = {k: v for k, v in it.items() if k not in _ITEM_FIELDS and k != "flags"}
+        items.append(_ITEM.pack(
+            sid(key),
+            *(sid(it.get(f)) for f in _ITEM_FIELDS),
+            len(flagrefs),
+            len(flags),
+            sid(json.dumps(extra, sort_keys=True)) if extra else NONE,
+        ))
+        flagrefs.extend(sid(f) for f in flags)
+
+    syn_map = {k.lower(): v.lower() for k, v in data.get("synonyms", {}).items()}
+    synonyms = [
+        _SYN.pack(sid(k), sid(syn_map[k]))
+        for k in sorted(syn_map, key=lambda k: k.encode("utf-8"))
+    ]
+
+    index = bytearray()
+    pos = 0
+    for b in strings:
+        index += _U32.pack(pos)
+        pos += len(b)
+    index += _U32.pack(pos)
+    blob = b"".join(strings)
+    flag_bytes = b"".join(_U32.pack(f) for f in flagrefs)
+
+    off_index = _HEADER.size
+    off_blob = off_index + len(index)
+    off_items = off_blob + len(blob)
+    off_items += (-off_items) % 8  # keep records aligned
+    off_syn = off_items + _ITEM.size * len(items)
+    off_flags = off_syn + _SYN.size * len(synonyms)
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT, len(strings), len(items), len(synonyms), len(flagrefs), version_sid,
+        off_index, off_blob, off_items, off_syn, off_flags,
+    )
+
+    tmp = Path(str(output) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(index)
+        f.write(blob)
+        f.write(b"\0" * (off_items - off_blob - len(blob)))
+        f.write(b"".join(items))
+        f.write(b"".join(synonyms))
+        f.write(flag_bytes)
+    tmp.replace(output)  # atomic: running workers keep their old mapping
+
+    return {
+        "output": str(output),
+        "version": source_version(raw),
+        "items": len(items),
+        "synonyms": len(synonyms),
+        "strings": len(strings),
+        "bytes": off_flags + len(flag_bytes),
+    }
+
+class Snapshot:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEADER.size:
+            raise SnapshotError(f"{self.path}: truncated snapshot")
+        (magic, fmt, self._n_strings, self.n_items, self.n_synonyms, _n_flags, version_sid,
+         self._off_index, self._off_blob, self._off_items, self._off_syn, self._off_flags) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise SnapshotError(f"{self.path}: not a knowledge-base snapshot (format {FORMAT})")
+        self.version = self.string(version_sid)
+
+    # -- strings
+
+    def _string_bytes(self, i: int) -> bytes:
+        start, end = _SPAN.unpack_from(self._mm, self._off_index + 4 * i)
+        return self._mm[self._off_blob + start:self._off_blob + end]
+
+    def string(self, i: int) -> str:
+        return self._string_bytes(i).decode("utf-8")
+
+    # -- sorted tables
+
+    def _item(self, i: int) -> Tuple[int, ...]:
+        return _ITEM.unpack_from(self._mm, self._off_items + _ITEM.size * i)
+
+    def _syn(self, i: int) -> Tuple[int, int]:
+        return _SYN.unpack_from(self._mm, self._off_syn + _SYN.size * i)
+
+    def _search(self, key: str, n: int, row) -> int:
+        target = key.encode("utf-8")
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = self._string_bytes(row(mid)[0])
+            if cur < target:
+                lo = mid + 1
+            elif cur > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def find_item(self, key: str) -> int:
+        return self._search(key, self.n_items, self._item)
+
+    def find_synonym(self, key: str) -> int:
+        return self._search(key, self.n_synonyms, self._syn)
+
+    def item_key(self, i: int) -> str:
+        return self.string(self._item(i)[0])
+
+    def item(self, i: int) -> Dict[str, Any]:
+        rec = self._item(i)
+        out: Dict[str, Any] = {}
+        for field, s in zip(_ITEM_FIELDS, rec[1:6]):
+            if s != NONE:
+                out[field] = self.string(s)
+        flags_at, flags_n, extra = rec[6], rec[7], rec[8]
+        out["flags"] = [
+            self.string(_U32.unpack_from(self._mm, self._off_flags + 4 * (flags_at + j))[0])
+            for j in range(flags_n)
+        ]
+        if extra != NONE:
+            out.update(json.loads(self.string(extra)))
+        return out
+
+    def synonym(self, i: int) -> Tuple[str, str]:
+        a, b = self._syn(i)
+        return self.string(a), self.string(b)
+
+class SnapshotItems(Mapping):
+    # canonical -> metadata dict, decoded from the mmap on access
+    def __init__(self, snap: Snapshot, cache_size: int = 4096):
+        self._snap = snap
+        self._decode = lru_cache(maxsize=cache_size)(snap.item)
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        i = self._snap.find_item(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._decode(i)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._snap.find_item(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._snap.item_key(i) for i in range(self._snap.n_items))
+
+    def __len__(self) -> int:
+        return self._snap.n_items
+
+class SnapshotSynonyms(Mapping):
+    # synonym -> canonical, read from the mmap on access
+    def __init__(self, snap: Snapshot):
+        self._snap = snap
+
+    def __getitem__(self, key: str) -> str:
+        i = self._snap.find_synonym(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._snap.synonym(i)[1]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._snap.find_synonym(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._snap.synonym(i)[0] for i in range(self._snap.n_synonyms))
+
+    def __len__(self) -> int:
+        return self._snap.n_synonyms
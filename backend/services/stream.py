@@ -0,0 +1,151 @@
+import asyncio
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from services.knowledge import KnowledgeBase
+from services.workers import submit_many
+
+FORMATS = ("ndjson", "csv")
+MAX_LINE_BYTES = 1 << 20
+# rows per worker submission, and how many submissions may be in flight
+CHUNK_ROWS = 32
+WINDOW = 8
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buf = b""
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+        if len(buf) > MAX_LINE_BYTES:
+            raise ValueError(f"line longer than {MAX_LINE_BYTES} bytes")
+    if buf:
+        yield buf.decode("utf-8", errors="replace").rstrip("\r")
+
+def _parse_ndjson(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("expected a JSON object per line")
+    return row
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, str]]:
+    # physical lines -> (first line number, CSV record): a quoted field may
+    # span lines ("sugar, cocoa butter\n(milk)"), so a record ends only once
+    # its quotes balance (escaped quotes are doubled, so counting works)
+    parts: List[str] = []
+    start = lineno = quotes = size = 0
+    async for line in lines:
+        lineno += 1
+        if not parts:
+            start = lineno
+        parts.append(line)
+        quotes += line.count('"')
+        size += len(line) + 1
+        if quotes % 2 == 0:
+            yield start, "\n".join(parts)
+            parts, quotes, size = [], 0, 0
+        elif size > MAX_LINE_BYTES:
+            raise ValueError(f"CSV record longer than {MAX_LINE_BYTES} bytes (unbalanced quote on line {start}?)")
+    if parts:
+        raise ValueError(f"unterminated quoted field starting on line {start}")
+
+def _csv_values(record: str) -> List[str]:
+    return next(csv.reader(io.StringIO(record)), [])
+
+def _parse_csv(record: str, header: List[str]) -> Dict[str, Any]:
+    return dict(zip(header, _csv_values(record)))
+
+def _item(row: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    text = row.get("ingredients_text")
+    if not isinstance(text, str):
+        raise ValueError("missing ingredients_text")
+    prefs = row.get("user_prefs")
+    return text, (row.get("optimize_for") or None), (prefs if isinstance(prefs, dict) else None), (row.get("locale") or None)
+
+async def _numbered(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, str]]:
+    lineno = 0
+    async for line in lines:
+        lineno += 1
+        yield lineno, line
+
+async def iter_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Dict[str, Any]]:
+    # -> {"id", "line", "item"} or {"id", "line", "error"} per non-blank input row
+    header: Optional[List[str]] = None
+    lines = iter_lines(chunks)
+    records = iter_csv_records(lines) if fmt == "csv" else _numbered(lines)
+    async for lineno, line in records:
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [h.strip() for h in _csv_values(line)]
+            continue
+        try:
+            row = _parse_csv(line, header) if fmt == "csv" else _parse_ndjson(line)
+        except ValueError as e:
+            yield {"id": None, "line": lineno, "error": f"parse error: {e}"}
+            continue
+        try:
+            yield {"id": row.get("id"), "line": lineno, "item": _item(row)}
+        except ValueError as e:
+            yield {"id": row.get("id"), "line": lineno, "error": str(e)}
+
+async def analyze_stream(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    kb: KnowledgeBase,
+    chunk_rows: int = CHUNK_ROWS,
+    window: int = WINDOW,
+) -> AsyncIterator[bytes]:
+    # reader -> bounded queue of in-flight chunk futures -> writer (in input order).
+    # The queue bound is the backpressure: a slow consumer stalls the writer, the
+    # queue fills, and the reader stops pulling the request body.
+    pending: asyncio.Queue = asyncio.Queue(maxsize=max(1, window))
+
+    async def flush(rows: List[Dict[str, Any]]) -> None:
+        items = [r["item"] for r in rows if "item" in r]
+        fut = submit_many(items, kb) if items else None
+        await pending.put((rows, fut))
+
+    async def reader() -> None:
+        rows: List[Dict[str, Any]] = []
+        try:
+            async for row in iter_rows(chunks, fmt):
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    await flush(rows)
+                    rows = []
+            if rows:
+                await flush(rows)
+        except Exception as e:
+            # rows parsed before the error still get their results
+            if rows:
+                await flush(rows)
+            await pending.put(([{"id": None, "line": None, "error": f"read error: {e}"}], None))
+        finally:
+            await pending.put(None)
+
+    task = asyncio.create_task(reader())
+    try:
+        while True:
+            entry = await pending.get()
+            if entry is None:
+                break
+            rows, fut = entry
+            try:
+                outcomes = iter(await fut) if fut is not None else iter(())
+            except Exception as e:  # worker pool failure: report rows, keep streaming
+                err = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                outcomes = iter([err] * len(rows))
+            for row in rows:
+                if "item" in row:
+                    out = {"id": row["id"], "line": row["line"], **next(outcomes)}
+                else:
+                    out = {"id": row["id"], "line": row["line"], "ok": False, "error": row["error"]}
+                yield (json.dumps(out, separators=(",", ":"), default=list) + "\n").encode("utf-8")
+    finally:
+        task.cancel()
@@ -0,0 +1,232 @@
+import asyncio
+import gc
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from services.knowledge import KnowledgeBase
+from services.metrics import METRICS
+from services.pipeline import analyze_catalog_item
+
+# (ingredients_text, optimize_for, user_prefs[, locale])
+BatchItem = Tuple[Any, ...]
+
+# "thread": single-label handlers run the pipeline on the server's threadpool (GIL-bound).
+# "process": they hand it to the pre-forked worker pool below, one label per task.
+# Batches and streams use the pool in both modes whenever BATCH_WORKERS > 1.
+EXECUTION_MODE = os.environ.get("INGREDIENT_EXECUTION", "thread").lower()
+POOL_WORKERS = int(os.environ.get("INGREDIENT_POOL_WORKERS") or os.environ.get("INGREDIENT_BATCH_WORKERS") or "0") or (os.cpu_count() or 1)
+BATCH_WORKERS = POOL_WORKERS
+# requests allowed to wait for a worker; past running + waiting we answer 503
+POOL_QUEUE_DEPTH = int(os.environ.get("INGREDIENT_POOL_QUEUE_DEPTH", "0")) or POOL_WORKERS * 8
+# below this size the process hop costs more than the analysis itself
+INLINE_BATCH_SIZE = int(os.environ.get("INGREDIENT_BATCH_INLINE", "8"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# set by start_pool(): the pool is only ever forked from startup code (server
+# lifespan or the CLI), never lazily from a request thread
+_pool_enabled = False
+# the serving process's KB; forked workers inherit it (copy-on-write)
+_worker_kb: Optional[KnowledgeBase] = None
+
+class Overloaded(Exception):
+    pass
+
+class AdmissionGate:
+    # counts requests running or waiting for CPU; refuses new ones past the limit
+    # instead of letting them queue (and latency grow) without bound
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, weight: int = 1) -> Iterator[None]:
+        # weight: pool tasks the request can have running or queued at once
+        # (a batch's chunks, a stream's window); capped so it fits when idle
+        weight = max(1, min(weight, self.limit))
+        with self._lock:
+            if self.in_flight + weight > self.limit:
+                self.rejected += 1
+                raise Overloaded(f"{self.in_flight} requests in flight (limit {self.limit})")
+            self.in_flight += weight
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= weight
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
+
+GATE = AdmissionGate(POOL_WORKERS + POOL_QUEUE_DEPTH)
+
+def _init_worker() -> None:
+    global _worker_kb
+    if _worker_kb is None:  # spawn start method: nothing inherited, load our own
+        _worker_kb = KnowledgeBase.load_default()
+    METRICS.drain()  # don't re-report the parent's numbers
+
+def share_kb(kb: KnowledgeBase) -> None:
+    # Build everything lazily-built on the KB now, so forked workers inherit it
+    # ready to use, then move the heap out of the GC's way: collections would
+    # otherwise write to every object header and un-share the pages.
+    global _worker_kb
+    kb.build_matcher()
+    kb.build_fuzzy()
+    for name in kb.items:
+        kb.mask(name)
+    _worker_kb = kb
+    gc.collect()
+    gc.freeze()
+
+def _context():
+    # fork shares the parent's KB; elsewhere each worker loads its own
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    # None unless start_pool() ran: callers then stay on threads / inline.
+    # After a worker crash the pool is rebuilt here on next use.
+    global _pool
+    with _pool_lock:
+        if _pool is None and _pool_enabled:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=_context(), initializer=_init_worker)
+        return _pool
+
+def _ping(_: int) -> int:
+    return os.getpid()
+
+def start_pool(kb: KnowledgeBase) -> None:
+    # process mode: fork every worker at startup, before the server has threads
+    # and before the first request would pay for it
+    global _pool_enabled
+    share_kb(kb)
+    _pool_enabled = True
+    pool = _get_pool()
+    list(pool.map(_ping, range(POOL_WORKERS * 2)))
+
+def stop_pool() -> None:
+    global _pool_enabled
+    _pool_enabled = False
+    _reset_pool()
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _in_worker(fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    # result + the worker's metrics for this task (merged into the server's)
+    try:
+        return fn(kb=_worker_kb, **kwargs), METRICS.drain()
+    except BaseException:
+        METRICS.drain()
+        raise
+
+async def offload(fn: Callable[..., Any], kb: KnowledgeBase, **kwargs: Any) -> Any:
+    # fn(kb=..., **kwargs) for a request handler: refused with Overloaded when
+    # too many are already running or waiting, otherwise run on the pool
+    # (process mode; fn must be a module-level function) or the threadpool
+    with GATE.slot():
+        pool = _get_pool() if EXECUTION_MODE == "process" else None
+        if pool is None:
+            return await run_in_threadpool(fn, kb=kb, **kwargs)
+        try:
+            result, delta = await asyncio.wrap_future(pool.submit(_in_worker, fn, kwargs))
+        except BrokenProcessPool:
+            # a worker died (OOM, signal); rebuild the pool, answer this one here
+            _reset_pool()
+            return await run_in_threadpool(fn, kb=kb, **kwargs)
+        METRICS.merge(delta)
+        return result
+
+def pool_stats() -> Dict[str, Any]:
+    return {"mode": EXECUTION_MODE, "workers": POOL_WORKERS, "queue_depth": POOL_QUEUE_DEPTH, **GATE.stats()}
+
+def analyze_one(item: BatchItem, kb: KnowledgeBase) -> Dict[str, Any]:
+    text, optimize_for, user_prefs, *rest = item
+    try:
+        return {"ok": True, "result": analyze_catalog_item(text, kb, optimize_for, user_prefs, locale=rest[0] if rest else None)}
+    except Exception as e:  # one bad label must not sink the batch
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+def _analyze_chunk(items: List[BatchItem]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    return [analyze_one(it, _worker_kb) for it in items], METRICS.drain()
+
+def _merged(part: Tuple[List[Dict[str, Any]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out, delta = part
+    METRICS.merge(delta)
+    return out
+
+def _chunk_size(n: int) -> int:
+    # a few chunks per worker keeps cores busy without paying IPC per label
+    return max(1, -(-n // (BATCH_WORKERS * 4)))
+
+def batch_weight(n: int) -> int:
+    # pool tasks analyze_many() queues for n items (GATE weight of a batch)
+    if n <= INLINE_BATCH_SIZE or BATCH_WORKERS <= 1 or not _pool_enabled:
+        return 1
+    return -(-n // _chunk_size(n))
+
+def analyze_many(items: List[BatchItem], kb: KnowledgeBase) -> List[Dict[str, Any]]:
+    # results come back in input order (pool.map preserves chunk order);
+    # without a started pool (BATCH_WORKERS=1) the calling thread does the work
+    pool = _get_pool() if len(items) > INLINE_BATCH_SIZE and BATCH_WORKERS > 1 else None
+    if pool is None:
+        return [analyze_one(it, kb) for it in items]
+
+    chunk = _chunk_size(len(items))
+    chunks = [items[i:i + chunk] for i in range(0, len(items), chunk)]
+
+    try:
+        out: List[Dict[str, Any]] = []
+        for part in pool.map(_analyze_chunk, chunks):
+            out.extend(_merged(part))
+        return out
+    except BrokenProcessPool:
+        # a worker died (OOM, signal); rebuild next time and finish this batch inline
+        _reset_pool()
+        return [analyze_one(it, kb) for it in items]
+
+def map_chunks(fn: Callable[..., Any], chunks: Iterable[List[Any]], kb: KnowledgeBase, window: int = 0) -> Iterator[Any]:
+    # fn(items=chunk, kb=...) per chunk, results in input order; on the pool
+    # (fn must be module-level) with at most `window` chunks in flight, so a
+    # large input is never queued up in memory all at once
+    pool = _get_pool() if BATCH_WORKERS > 1 else None
+    if pool is None:
+        for chunk in chunks:
+            yield fn(items=chunk, kb=kb)
+        return
+    pending: "deque" = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_in_worker, fn, {"items": chunk}))
+        if len(pending) >= (window or BATCH_WORKERS * 2):
+            yield _merged(pending.popleft().result())
+    while pending:
+        yield _merged(pending.popleft().result())
+
+def submit_many(items: List[BatchItem], kb: KnowledgeBase) -> "asyncio.Future":
+    # async counterpart of analyze_many for the streaming path; one future per chunk
+    loop = asyncio.get_running_loop()
+    pool = _get_pool() if BATCH_WORKERS > 1 else None
+    if pool is None:
+        return loop.run_in_executor(None, lambda: [analyze_one(it, kb) for it in items])
+    fut = asyncio.wrap_future(pool.submit(_analyze_chunk, items))
+    return asyncio.ensure_future(_await_merged(fut))
+
+async def _await_merged(fut: "asyncio.Future") -> List[Dict[str, Any]]:
+    return _merged(await fut)
@@ -0,0 +1,13 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# tests import the app the way uvicorn does: from the backend directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.knowledge import KnowledgeBase  # noqa: E402
+
+@pytest.fixture(scope="session")
+def kb() -> KnowledgeBase:
+    return KnowledgeBase.load_default()
@@ -0,0 +1,53 @@
+import re
+
+import pytest
+
+from services.chat_logic import ROUTER
+from services.chat_router import FollowupRouter
+
+MESSAGES = [
+    "is it ok daily?", "can i have this every day", "explain like i'm 12", "any alternatives?",
+    "what should i buy instead", "does it have milk", "allergens?", "how much sugar", "why red?",
+    "what's the reason", "hello", "", "compare with another product", "dailyish snack",
+]
+
+def _cascade(message):
+    for route in ROUTER.routes():
+        if re.search(route.source, message):
+            return route.handler
+    return None
+
+@pytest.fixture(scope="module")
+def router():
+    # the built-in routes without the fallback, so a miss shows up as None
+    copy = FollowupRouter()
+    for route in ROUTER.routes():
+        copy.register(route.name, patterns=[route.source], triggers=route.triggers, priority=route.priority)(route.handler)
+    return copy
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_routes_like_a_cascade(router, message):
+    assert router.route(message) is _cascade(message)
+
+def test_builtin_routes_declare_triggers():
+    assert all(route.triggers for route in ROUTER.routes())
+
+def test_pattern_without_triggers_is_always_checked():
+    router = FollowupRouter()
+    router.register("digits", patterns=[r"\d+ g"])(str)
+    router.register("sugar", keywords=["sugar"], priority=200)(repr)
+    assert router.routes()[0].triggers is None
+    assert router.route("about 12 g of sugar") is str
+    assert router.route("sugar") is repr
+    assert router.route("nothing") is None
+
+def test_keywords_join_declared_triggers():
+    router = FollowupRouter()
+    router.register("daily", patterns=[r"\bdaily\b"], keywords=["every day"], triggers=["daily"])(str)
+    assert router.routes()[0].triggers == {"daily", "every day"}
+    assert router.route("every day?") is str
+
+@pytest.mark.parametrize("triggers", [[], ["Daily"], ["every  day"], [" "]])
+def test_bad_triggers_are_rejected(triggers):
+    with pytest.raises(ValueError):
+        FollowupRouter().register("daily", patterns=[r"daily"], triggers=triggers)
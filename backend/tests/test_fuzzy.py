@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from services.fuzzy import FuzzyIndex, MIN_LENGTH, edit_distance
+
+def _levenshtein(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+def _mangle(rng, term, edits):
+    s = list(term)
+    for _ in range(edits):
+        op = rng.randrange(3)
+        i = rng.randrange(len(s) + (op == 1))
+        if op == 0 and s:
+            s[i] = rng.choice("abcdefghijklmnopqrstuvwxyz0")
+        elif op == 1:
+            s.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        elif s:
+            del s[i]
+    return "".join(s)
+
+def test_banded_edit_distance():
+    rng = random.Random(1)
+    for _ in range(2000):
+        a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 9)))
+        b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 9)))
+        limit = rng.randint(0, 4)
+        d = _levenshtein(a, b)
+        assert edit_distance(a, b, limit) == (d if d <= limit else limit + 1)
+
+@pytest.mark.parametrize("min_length", [MIN_LENGTH, 4])
+def test_lookup_matches_brute_force(kb, min_length):
+    terms = kb._terms()
+    index = FuzzyIndex(terms, min_length=min_length)
+    names = sorted(terms)
+    rng = random.Random(3)
+    for _ in range(400):
+        q = _mangle(rng, rng.choice(names), rng.randint(0, 3))
+        q = " ".join(q.split())
+        hit = index.lookup(q)
+        best = None
+        if len(q) >= index.min_length:
+            for term in names:
+                d = _levenshtein(q, term)
+                conf = 1.0 - d / max(len(q), len(term))
+                if conf >= index.min_confidence and d <= index.max_edits and (best is None or d < best):
+                    best = d
+        if best is None:
+            assert hit is None, (q, hit)
+        else:
+            assert hit is not None, q
+            term, canonical, confidence = hit
+            assert terms[term] == canonical
+            assert _levenshtein(q, term) == best
+            assert confidence == 1.0 - best / max(len(q), len(term))
+
+def test_ocr_noise_resolves(kb):
+    canonical, confidence = kb.resolve_fuzzy("soy lecithln")
+    assert canonical == kb.resolve("soy lecithin")
+    assert 0.8 <= confidence < 1.0
+    assert kb.resolve_fuzzy("sugr") is None  # too short to guess
+
+def test_min_length_is_per_index(kb):
+    terms = kb._terms()
+    assert FuzzyIndex(terms).lookup("sugr") is None
+    term, canonical, _ = FuzzyIndex(terms, min_length=4).lookup("sugr")
+    assert canonical == kb.resolve("sugar")
@@ -0,0 +1,54 @@
+import random
+
+from services.incremental import LabelSession, diff_span
+from services.normalize import normalize_ingredients
+
+LABEL = "Ingredients: sugar, wheat flour, cocoa butter 2,5%, emulsifier (soy lecithin), whey (milk), salt"
+
+def _check(session, kb):
+    assert session.normalized() == normalize_ingredients(session.text, kb)
+
+def test_diff_span():
+    assert diff_span("sugar, salt", "sugar, sea salt") == (8, 8, "ea s")
+    assert diff_span("sugar, salt", "sugar") == (5, 11, "")
+    assert diff_span("abc", "abc") == (3, 3, "")
+    for old, new in (("", "salt"), ("whey", ""), ("aaa", "aaaa"), ("milk (whey)", "milk [whey]")):
+        a, b, repl = diff_span(old, new)
+        assert old[:a] + repl + old[b:] == new
+
+def test_edits_match_a_fresh_normalize(kb):
+    session = LabelSession(kb, LABEL)
+    _check(session, kb)
+    session.replace_text(LABEL.replace("sugar", "cane sugar"))
+    _check(session, kb)
+    session.replace_text(session.text + ", citric acid")
+    _check(session, kb)
+    # decimal comma flipped into a delimiter and back
+    session.replace_text(session.text.replace("2,5%", "2, 5%"))
+    _check(session, kb)
+    session.replace_text(session.text.replace("2, 5%", "2,5%"))
+    _check(session, kb)
+    # edits around the "ingredients:" prefix start over
+    session.replace_text("ingredients" + session.text[len("Ingredients:"):])
+    _check(session, kb)
+
+def test_patch_resolves_only_touched_fragments(kb):
+    session = LabelSession(kb, LABEL)
+    total = len(session.records)
+    resolved = session.replace_text(LABEL.replace("salt", "sea salt"))
+    assert 0 < resolved < total
+    assert session.replace_text(session.text) == 0
+
+def test_random_edits(kb):
+    rng = random.Random(7)
+    alphabet = "abcdefghij ,()[]%0123456789"
+    words = ["sugar", "salt", "whey", "milk", "soy lecithin", "e330", "palm oil", "cocoa"]
+    session = LabelSession(kb, LABEL)
+    for _ in range(300):
+        text = session.text
+        a = rng.randint(0, len(text))
+        b = min(len(text), a + rng.randint(0, 6))
+        repl = rng.choice(words) if rng.random() < 0.3 else "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3)))
+        session.apply_edit(a, b, repl)
+        assert session.text == text[:a] + repl + text[b:]
+        _check(session, kb)
@@ -0,0 +1,24 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+def test_kb_is_served_with_an_etag(client):
+    resp = client.get("/api/kb")
+    assert resp.status_code == 200
+    assert resp.headers["ETag"]
+
+@pytest.mark.parametrize("header", ["{etag}", "W/{etag}", '"other", W/{etag}', "*"])
+def test_matching_if_none_match_is_not_modified(client, header):
+    etag = client.get("/api/kb").headers["ETag"]
+    resp = client.get("/api/kb", headers={"If-None-Match": header.format(etag=etag)})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+
+@pytest.mark.parametrize("header", ['"other"', 'W/"other"'])
+def test_other_etags_get_the_body(client, header):
+    assert client.get("/api/kb", headers={"If-None-Match": header}).status_code == 200
@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+LABEL = "Zutaten: Zucker, Magermilchpulver, Sojalecithin"
+EXPECTED = ["sugar", "milk", "soy lecithin"]
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+def _canonicals(result):
+    return [i["canonical"] for i in result["normalized_ingredients"] if i["known"]]
+
+@pytest.mark.parametrize("locale", [None, "de", "de-AT"])
+def test_analyze_resolves_german_label(client, locale):
+    result = client.post("/api/analyze", json={"ingredients_text": LABEL, "locale": locale}).json()
+    assert _canonicals(result) == EXPECTED
+    assert "de" in result["debug"]["locale"]["shards"]
+
+def test_compare_resolves_each_product_in_its_own_language(client):
+    resp = client.post("/api/compare", json={"products": [
+        {"ingredients_text": LABEL},
+        {"ingredients_text": "sugar, skim milk powder, soy lecithin"},
+    ]})
+    assert resp.status_code == 200
+    first, second = resp.json()["products"]
+    assert _canonicals(first) == _canonicals(second) == EXPECTED
+    assert "de" in first["locale"]["shards"]
+    assert second["locale"]["shards"] == []
+
+def test_incremental_resolves_german_label_across_edits(client):
+    result = client.post("/api/analyze/incremental", json={"ingredients_text": LABEL}).json()
+    assert _canonicals(result) == EXPECTED
+    assert "de" in result["debug"]["locale"]["shards"]
+    edited = client.post("/api/analyze/incremental", json={
+        "session_id": result["session_id"], "ingredients_text": LABEL + ", Kaliumsorbat",
+    }).json()
+    assert _canonicals(edited) == EXPECTED + ["potassium sorbate"]
+    assert edited["session_id"] == result["session_id"]
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/analyze", {"ingredients_text": LABEL}),
+    ("/api/compare", {"products": [{"ingredients_text": LABEL}]}),
+    ("/api/analyze/incremental", {"ingredients_text": LABEL}),
+])
+def test_unknown_locale_is_rejected(client, path, body):
+    assert client.post(path, json={**body, "locale": "xx"}).status_code == 400
@@ -0,0 +1,56 @@
+import re
+
+from services.normalize import clear_token_memo, iter_tokens, normalize_ingredients, token_memo_stats
+
+def _tokens(text):
+    # fragments as the resolver sees them; whitespace between delimiters resolves to nothing
+    return [t.strip() for t in iter_tokens(text) if t.strip()]
+
+def test_nested_groups_come_out_outer_first():
+    text = "Ingredients: chocolate (sugar, emulsifier (soy lecithin)), [whey], salt"
+    assert _tokens(text) == [
+        "chocolate", "sugar", "emulsifier", "soy lecithin", "whey", "salt"
+    ]
+
+def test_decimal_comma_and_prefix():
+    assert _tokens("INGREDIENTS : cocoa 2,5%, sugar") == ["cocoa 2,5%", "sugar"]
+    assert _tokens("sugar,2, 5") == ["sugar", "2", "5"]
+    # no colon: "ingredients" is just a word
+    assert _tokens("ingredients sugar, salt") == ["ingredients sugar", "salt"]
+
+def test_unbalanced_brackets_are_tolerated():
+    assert _tokens("whey (milk, salt") == ["whey", "milk", "salt"]
+    assert _tokens("whey) milk], salt(") == ["whey", "milk", "salt"]
+
+def _reference(text, kb):
+    # the pre-tokenizer behaviour on flat labels: split on commas, clean, resolve
+    body = re.sub(r"^\s*ingredients\s*:", "", text, flags=re.I)
+    out, seen = [], set()
+    for part in body.split(","):
+        name = re.sub(r"\s+", " ", part).strip(" .;:")
+        if not name:
+            continue
+        canonical = kb.resolve(name)
+        if canonical not in seen:
+            seen.add(canonical)
+            out.append((name, canonical))
+    return out
+
+def test_flat_labels_match_a_plain_split(kb):
+    names = sorted(kb.items)[:60]
+    for i in range(0, len(names), 6):
+        text = "Ingredients: " + ", ".join(n.upper() if j % 2 else n for j, n in enumerate(names[i:i + 6]))
+        got = [(r["raw"], r["canonical"]) for r in normalize_ingredients(text, kb)]
+        assert got == _reference(text, kb)
+
+def test_memo_is_transparent(kb):
+    text = "sugar, cane sugar (12%), emulsifier: soy lecithin, maltodextrine, E330, 2,5% cocoa, xyzzy"
+    assert normalize_ingredients(text, kb) == normalize_ingredients(text, kb, use_memo=False)
+    assert normalize_ingredients(text, kb) == normalize_ingredients(text, kb)
+
+def test_clear_token_memo_empties_it(kb):
+    normalize_ingredients("sugar, salt", kb)
+    assert token_memo_stats()["entries"] > 0
+    clear_token_memo()
+    assert token_memo_stats()["entries"] == 0
+    assert [r["canonical"] for r in normalize_ingredients("sugar, salt", kb)] == ["sugar", "salt"]
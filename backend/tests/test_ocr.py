@@ -0,0 +1,68 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from services.cache import LRUCache
+from services.ocr import OCREngine, OCRJobQueue
+
+class GatedEngine(OCREngine):
+    # returns the upload as text once the test opens the gate
+    name = "gated"
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    def recognize(self, image, content_type=None):
+        self.gate.wait(5)
+        return image.decode()
+
+def test_engine_must_implement_recognize():
+    with pytest.raises(TypeError):
+        OCREngine()
+
+    class Incomplete(OCREngine):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_only_finished_jobs_are_evicted():
+    async def run():
+        engine = GatedEngine()
+        queue = OCRJobQueue(engine=engine, workers=1, queue_size=8)
+        queue.jobs = LRUCache(max_entries=1)
+
+        async def on_text(text):
+            return {"text": text}
+
+        jobs = [queue.submit(f"label {i}".encode(), "text/plain", on_text) for i in range(4)]
+        await asyncio.sleep(0.05)
+        # one running, three queued: all still visible despite the 1-entry LRU
+        assert [queue.get(j.id) for j in jobs] == jobs
+        engine.gate.set()
+        while not all(j.finished for j in jobs):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        assert [j.status for j in jobs] == ["done"] * 4
+        assert [queue.get(j.id) is not None for j in jobs] == [False, False, False, True]
+        assert queue.stats()["active"] == 0
+        queue.stop()
+
+    asyncio.run(run())
+
+def test_ocr_text_is_analyzed_like_a_pasted_label():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    label = "Sugar, whey, soy lecithin"
+    with TestClient(app) as client:
+        job = client.post("/api/ocr", files={"image": ("label.txt", label.encode(), "text/plain")}).json()
+        lines = client.get(f"/api/ocr/{job['job_id']}/stream").text.splitlines()
+        pasted = client.post("/api/analyze", json={"ingredients_text": label}).json()
+    done = json.loads(lines[-1])
+    assert done["status"] == "done"
+    assert done["result"]["analysis_id"] == pasted["analysis_id"]
+    assert done["result"]["decision_card"] == pasted["decision_card"]
@@ -0,0 +1,72 @@
+import json
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+import routers.analyze as analyze
+import services.precomputed as precomputed
+from main import app
+from services.locales import DEFAULT_DIR, LocaleShards
+from services.precomputed import PrecomputedAnalyses, build_artifact
+
+LABELS = [
+    "Ingredients: sugar, wheat flour, palm oil, salt, soy lecithin",
+    "oats, water, salt",
+    "Zutaten: Zucker, Weizenmehl, Palmöl, Salz",
+    "sugar, maida, ins 330, iodised salt",
+]
+
+def _rows(labels):
+    return [{"id": i, "ingredients_text": text} for i, text in enumerate(labels)]
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.mark.parametrize("query", ["", "?compact=true", "?compact=true&debug=true"])
+def test_hits_are_byte_identical_to_live_responses(kb, client, tmp_path, monkeypatch, query):
+    path = tmp_path / "precomputed.kv"
+    stats = build_artifact(_rows(LABELS), path, kb)
+    assert stats["computed"] == len(LABELS)
+    served = PrecomputedAnalyses(path)
+    for text in LABELS:
+        for optimize_for in (None, "sugar", "kids"):
+            body = {"ingredients_text": text, "optimize_for": optimize_for}
+            monkeypatch.setattr(analyze, "PRECOMPUTED", served)
+            hits = served.hits
+            hit = client.post("/api/analyze" + query, json=body)
+            assert served.hits == hits + 1
+            monkeypatch.setattr(analyze, "PRECOMPUTED", PrecomputedAnalyses(None))
+            live = client.post("/api/analyze" + query, json=body)
+            assert hit.content == live.content
+
+def _blob_locale(path, text):
+    hit = PrecomputedAnalyses(path).lookup(precomputed.label_text(text), None, precomputed.Artifact(path).version)
+    return json.loads(hit.rest)["locale"]
+
+def test_rebuild_recomputes_labels_whose_shards_changed(kb, tmp_path, monkeypatch):
+    root = tmp_path / "locales"
+    shutil.copytree(DEFAULT_DIR, root)
+    monkeypatch.setattr(precomputed, "LOCALES", LocaleShards(root=root))
+    path = tmp_path / "precomputed.kv"
+    german, english = LABELS[2], LABELS[1]
+    build_artifact(_rows([german, english]), path, kb)
+    assert build_artifact(_rows([german, english]), path, kb)["reused"] == 2
+
+    # a new name in the German shard: same records, newer shard version
+    shard = json.loads((root / "de.json").read_text(encoding="utf-8"))
+    shard["synonyms"]["rohrzucker"] = "sugar"
+    (root / "de.json").write_text(json.dumps(shard), encoding="utf-8")
+    monkeypatch.setattr(precomputed, "LOCALES", LocaleShards(root=root))
+    stats = build_artifact(_rows([german, english]), path, kb)
+    assert (stats["computed"], stats["reused"]) == (1, 1)
+
+    # the English label now detects as German: its blob must carry the new locale
+    index = json.loads((root / "index.json").read_text(encoding="utf-8"))
+    index["locales"]["de"]["markers"] += ["oats", "water"]
+    (root / "index.json").write_text(json.dumps(index), encoding="utf-8")
+    monkeypatch.setattr(precomputed, "LOCALES", LocaleShards(root=root))
+    stats = build_artifact(_rows([german, english]), path, kb)
+    assert (stats["computed"], stats["reused"]) == (1, 1)
+    assert _blob_locale(path, english)["detected"] == ["de"]
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+import services.products as products
+import services.rules as rules
+from services.pipeline import run_pipeline
+from services.products import ProductStore
+from services.recipes import canonical_set
+from services.rules import DEFAULT_RULES, current_rules
+
+QUERY = "oats, salt, soy lecithin"
+CATALOG = {"p-sweet": "oats, salt, sucralose", "p-plain": "oats, salt, water"}
+
+@pytest.fixture
+def rules_file(tmp_path, monkeypatch):
+    # a private copy of the scoring rules, re-read on every call
+    path = tmp_path / "scoring_rules.json"
+    path.write_bytes(DEFAULT_RULES.read_bytes())
+    monkeypatch.setattr(rules, "RELOAD_INTERVAL", 0)
+    monkeypatch.setattr(rules, "_holder", rules._RulesHolder(path))
+    monkeypatch.setattr(products, "RELOAD_CHECK_SECONDS", 0)
+    return path
+
+def _store(kb, path=None):
+    store = ProductStore(path, kb_version=kb.version)
+    version = current_rules().version
+    store.add_many(((pid, pid, run_pipeline(text, kb)) for pid, text in CATALOG.items()), kb.version, version)
+    return store
+
+def _gut(store, kb):
+    query = run_pipeline(QUERY, kb)
+    found = store.alternatives(canonical_set(query["normalized_ingredients"]), "gut",
+                               query["fit_by_intent"]["gut"]["fit_score"], min_overlap=0.5)
+    return {p["id"]: p["fit_score"] for p in found}
+
+def _live(kb, text):
+    return run_pipeline(text, kb)["fit_by_intent"]["gut"]["fit_score"]
+
+def test_alternatives_follow_a_rules_reload(kb, rules_file):
+    store = _store(kb)
+    before = _gut(store, kb)
+    assert before == {pid: _live(kb, text) for pid, text in CATALOG.items()}
+
+    # artificial sweeteners now cost far more under "gut": p-sweet drops below the query
+    spec = json.loads(rules_file.read_text())
+    for rule in spec["scoring"]["risk_rules"]["gut"]:
+        if "artificial_sweetener" in rule["any"]:
+            rule["weight"] = 3.0
+    mtime = rules_file.stat().st_mtime_ns
+    rules_file.write_text(json.dumps(spec))
+    os.utime(rules_file, ns=(mtime + 10**9, mtime + 10**9))  # coarse-mtime filesystems
+
+    after = _gut(store, kb)
+    assert "p-sweet" not in after
+    assert after == {"p-plain": _live(kb, CATALOG["p-plain"])}
+    assert _live(kb, CATALOG["p-sweet"]) < _live(kb, QUERY)
+    assert store.stats()["rescored"] == len(CATALOG)
+
+def test_rows_from_another_kb_are_left_out(kb, tmp_path):
+    path = tmp_path / "products.db"
+    _store(kb, path)
+    assert _gut(ProductStore(path, kb_version=kb.version), kb)
+    other = ProductStore(path, kb_version="another-kb")
+    assert _gut(other, kb) == {}
+    assert other.stats()["stale"] == len(CATALOG)
+
+def test_default_store_is_in_memory(monkeypatch):
+    monkeypatch.delenv("INGREDIENT_PRODUCTS_DB", raising=False)
+    assert products._default_db() is None
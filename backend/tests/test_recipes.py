@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from services.intent import INTENTS
+from services.pipeline import analyze_catalog_item, run_pipeline
+from services.recipes import RecipeIndex
+
+# one recipe (sugar, citric acid, whey), three ways to write it
+LABELS = [
+    "cane sugar, e330, whey",
+    "Sugar, Citric Acid, whey protein concentrate",
+    "Ingredients: WHEY, SUGAR, CITRIC ACID",
+]
+
+def _without_reuse_marker(result):
+    debug = {k: v for k, v in result["debug"].items() if k != "reused_recipe"}
+    return {**result, "debug": debug}
+
+@pytest.mark.parametrize("optimize_for", [None, *INTENTS])
+def test_reused_recipe_matches_a_live_analysis(kb, optimize_for):
+    recipes = RecipeIndex()
+    results = [analyze_catalog_item(text, kb, optimize_for, recipes=recipes) for text in LABELS]
+    assert len({r["fingerprint"] for r in results}) == 1
+    assert [r["debug"].get("reused_recipe", False) for r in results] == [False, True, True]
+    for text, result in zip(LABELS, results):
+        assert _without_reuse_marker(result) == run_pipeline(text, kb, optimize_for)
+
+def test_raw_names_do_not_leak_between_labels(kb):
+    recipes = RecipeIndex()
+    first = analyze_catalog_item(LABELS[0], kb, "sugar", recipes=recipes)
+    second = analyze_catalog_item(LABELS[1], kb, "sugar", recipes=recipes)
+    assert second["debug"]["reused_recipe"]
+    assert "cane sugar" in json.dumps(first)
+    body = json.dumps(second)
+    assert "cane sugar" not in body and "e330" not in body
+    assert "Sweetener/sugar marker: Sugar" in second["inferred_intent"]["reasons"]["sugar"]
+
+def test_matrix_survives_the_sqlite_file(kb, tmp_path):
+    path = tmp_path / "recipes.db"
+    analyze_catalog_item(LABELS[0], kb, recipes=RecipeIndex(db_path=path))
+    fresh = RecipeIndex(db_path=path)  # new process, empty memory tier
+    result = analyze_catalog_item(LABELS[1], kb, recipes=fresh)
+    assert result["debug"]["reused_recipe"]
+    assert _without_reuse_marker(result) == run_pipeline(LABELS[1], kb)
+    assert fresh.stats()["matrices"] == 1
+
+def test_similar_finds_recipes_scored_by_a_batch():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    client = TestClient(app)
+    catalog = ["oats, salt, water, soy lecithin", "oats, salt, water, sucralose"]
+    resp = client.post("/api/analyze/batch", json={"items": [{"ingredients_text": t} for t in catalog]})
+    assert all(r["ok"] for r in resp.json()["results"])
+    query = client.post("/api/analyze", json={"ingredients_text": "oats, salt, water, sugar", "optimize_for": "sugar"}).json()
+    similar = client.post("/api/similar", json={"analysis_id": query["analysis_id"], "intent": "sugar"}).json()
+    assert "soy lecithin" in [i for m in similar["matches"] for i in m["ingredients"]]
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import services.stream as stream
+from main import app
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def _post(client, body, content_type):
+    resp = client.post("/api/analyze/stream", content=body, headers={"content-type": content_type})
+    assert resp.status_code == 200
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+def test_csv_quoted_field_spans_lines(client):
+    body = 'id,ingredients_text\n1,"sugar, cocoa butter,\nmilk powder"\n2,oats\n'
+    out = _post(client, body, "text/csv")
+    assert [(o["id"], o["line"], o["ok"]) for o in out] == [("1", 2, True), ("2", 4, True)]
+    assert len(out[0]["result"]["normalized_ingredients"]) == 3
+
+def test_rows_before_an_overlong_line_are_kept(client, monkeypatch):
+    monkeypatch.setattr(stream, "MAX_LINE_BYTES", 64)
+    rows = [json.dumps({"id": i, "ingredients_text": "sugar, salt"}) for i in (1, 2)]
+    out = _post(client, "\n".join(rows) + "\n" + "x" * 200, "application/x-ndjson")
+    assert [(o["id"], o["ok"]) for o in out[:2]] == [(1, True), (2, True)]
+    assert len(out) == 3 and out[2]["error"].startswith("read error:")
+
+def test_rows_before_an_unterminated_quote_are_kept(client):
+    body = 'id,ingredients_text\n1,sugar\n2,oats\n3,"salt, water\n'
+    out = _post(client, body, "text/csv")
+    assert [(o["id"], o["ok"]) for o in out[:2]] == [("1", True), ("2", True)]
+    assert len(out) == 3 and "unterminated quoted field" in out[2]["error"]
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import services.workers as workers
+
+LABELS = ["sugar, salt", "oats, water", "wheat flour, palm oil, soy lecithin", "milk, cocoa butter"] * 5
+
+@pytest.fixture
+def thread_mode(monkeypatch):
+    monkeypatch.setattr(workers, "EXECUTION_MODE", "thread")
+    monkeypatch.setattr(main, "EXECUTION_MODE", "thread")
+
+    def workers_(n):
+        for mod in (workers, main):
+            monkeypatch.setattr(mod, "BATCH_WORKERS", n)
+        monkeypatch.setattr(workers, "POOL_WORKERS", n)
+    return workers_
+
+def _batch(client):
+    resp = client.post("/api/analyze/batch", json={"items": [{"ingredients_text": t} for t in LABELS]})
+    assert resp.status_code == 200
+    return resp.json()["results"]
+
+def test_thread_mode_batches_run_on_the_pool(thread_mode):
+    thread_mode(2)
+    with TestClient(main.app) as client:
+        assert workers._pool is not None
+        assert workers.batch_weight(len(LABELS)) > 1
+        results = _batch(client)
+        pids = set(workers._pool.map(workers._ping, range(8)))
+        assert os.getpid() not in pids
+    assert workers._pool is None
+    assert [r["ok"] for r in results] == [True] * len(LABELS)
+
+def test_single_worker_starts_no_pool(thread_mode):
+    thread_mode(1)
+    with TestClient(main.app) as client:
+        assert workers._pool is None
+        assert [r["ok"] for r in _batch(client)] == [True] * len(LABELS)
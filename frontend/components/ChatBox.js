@@ -8,7 +8,11 @@ export default function ChatBox({ analysisState }) {
 
   async function send() {
     if (!msg.trim()) return;
-    const res = await chat({ message: msg, analysis_state: analysisState });
+    const res = await chat({
+      message: msg,
+      analysis_id: analysisState?.analysis_id,
+      analysis_state: analysisState,
+    });
     setReply(res.reply);
     setActions(res.suggested_actions || []);
   }
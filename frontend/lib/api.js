@@ -21,3 +21,97 @@ export async function analyzeIngredients({ ingredients_text, optimize_for, user_
 
   return res.json();
 }
+
+export async function analyzeIncremental({ session_id, ingredients_text, optimize_for, user_prefs }) {
+  const res = await fetch(`${API_BASE}/api/analyze/incremental`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      session_id: session_id || null,
+      ingredients_text,
+      optimize_for: optimize_for || null,
+      user_prefs: user_prefs || {},
+    }),
+  });
+
+  if (!res.ok) {
+    const txt = await res.text().catch(() => "");
+    const err = new Error(`Backend error ${res.status}: ${txt || res.statusText}`);
+    err.status = res.status;
+    throw err;
+  }
+
+  return res.json();
+}
+
+// One round trip for the whole compare view: every product scored under every goal.
+export async function compareProducts(products, { intents, user_prefs } = {}) {
+  const res = await fetch(`${API_BASE}/api/compare`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      products: products.map(({ name, ingredients_text }) => ({ name: name || null, ingredients_text })),
+      intents: intents || null,
+      user_prefs: user_prefs || {},
+    }),
+  });
+
+  if (!res.ok) {
+    const txt = await res.text().catch(() => "");
+    throw new Error(`Backend error ${res.status}: ${txt || res.statusText}`);
+  }
+
+  return res.json();
+}
+
+// Follow-up chat. Sends only the analysis_id; the full state goes along only if
+// the server no longer has that analysis (expired / restarted).
+export async function chat({ message, analysis_id, analysis_state }) {
+  const post = (body) =>
+    fetch(`${API_BASE}/api/chat`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ message, ...body }),
+    });
+
+  let res = analysis_id ? await post({ analysis_id }) : null;
+  if (!res || (res.status === 404 && analysis_state)) {
+    res = await post({ analysis_state });
+  }
+
+  if (!res.ok) {
+    const txt = await res.text().catch(() => "");
+    throw new Error(`Backend error ${res.status}: ${txt || res.statusText}`);
+  }
+
+  return res.json();
+}
+
+// Label photo -> OCR -> analysis. The upload is queued server-side (202 + job);
+// poll until it is done. 503 means the OCR queue is full: retry shortly.
+export async function scanLabelImage({ file, optimize_for, user_prefs, onStatus, pollMs = 700 }) {
+  const form = new FormData();
+  form.append("image", file);
+  if (optimize_for) form.append("optimize_for", optimize_for);
+  form.append("user_prefs", JSON.stringify(user_prefs || {}));
+
+  const res = await fetch(`${API_BASE}/api/ocr`, { method: "POST", body: form });
+  if (!res.ok) {
+    const txt = await res.text().catch(() => "");
+    throw new Error(`Backend error ${res.status}: ${txt || res.statusText}`);
+  }
+
+  let job = await res.json();
+  while (job.status !== "done" && job.status !== "failed") {
+    if (onStatus) onStatus(job.status);
+    await new Promise((r) => setTimeout(r, pollMs));
+    const poll = await fetch(`${API_BASE}${job.status_url || `/api/ocr/${job.job_id}`}`);
+    if (!poll.ok) {
+      const txt = await poll.text().catch(() => "");
+      throw new Error(`Backend error ${poll.status}: ${txt || poll.statusText}`);
+    }
+    job = { ...job, ...(await poll.json()) };
+  }
+  if (job.status === "failed") throw new Error(job.error || "Could not read the label");
+  return job; // { text, result }
+}
@@ -1,19 +1,17 @@
 // frontend/pages/compare.js
 import { useState } from "react";
 import { useRouter } from "next/router";
-import { analyzeIngredients } from "../lib/api";
-
-function getScore(res) {
-  const f = res?.debug?.fit;
-  if (typeof f?.score === "number") return f.score;
-  if (typeof f?.fit_score === "number") return f.fit_score;
-  if (typeof res?.decision_card?.score === "number") return res.decision_card.score;
-  if (typeof res?.decision_card?.fit_score === "number") return res.decision_card.fit_score;
-  return null;
-}
-
-function getColor(res) {
-  return res?.debug?.fit?.color || res?.decision_card?.color || "unknown";
+import { compareProducts } from "../lib/api";
+
+// Per-goal view of one product from the /api/compare response
+function productView(comparison, index, intent) {
+  const p = comparison?.products?.[index];
+  if (!p) return null;
+  return {
+    decision_card: p.decision_cards?.[intent],
+    fit: p.fit_by_intent?.[intent],
+    only: comparison.differences?.only?.[index] || [],
+  };
 }
 
 export default function ComparePage() {
@@ -23,33 +21,41 @@ export default function ComparePage() {
   const [b, setB] = useState("Ingredients: dates, oats, pea protein, sunflower lecithin, cocoa");
   const [optimizeFor, setOptimizeFor] = useState("sugar");
 
-  const [resultA, setResultA] = useState(null);
-  const [resultB, setResultB] = useState(null);
-  const [summary, setSummary] = useState("");
+  // every goal is scored in one request, so switching goals needs no refetch
+  const [comparison, setComparison] = useState(null);
+  const [error, setError] = useState("");
 
   async function runCompare() {
-    const ra = await analyzeIngredients({ ingredients_text: a, optimize_for: optimizeFor, user_prefs: {} });
-    const rb = await analyzeIngredients({ ingredients_text: b, optimize_for: optimizeFor, user_prefs: {} });
-
-    setResultA(ra);
-    setResultB(rb);
-
-    const sa = getScore(ra);
-    const sb = getScore(rb);
-
-    if (sa === null || sb === null) {
-      setSummary("Could not compute winner: score missing from one or both responses.");
-      return;
+    setError("");
+    try {
+      setComparison(
+        await compareProducts([
+          { name: "A", ingredients_text: a },
+          { name: "B", ingredients_text: b },
+        ])
+      );
+    } catch (e) {
+      setComparison(null);
+      setError(e.message || "Failed to fetch");
     }
+  }
 
-    const winner = sa === sb ? "Tie" : sa > sb ? "A" : "B";
+  const resultA = productView(comparison, 0, optimizeFor);
+  const resultB = productView(comparison, 1, optimizeFor);
+  const shared = comparison?.differences?.shared || [];
+
+  let summary = error;
+  const scores = comparison?.matrix?.[optimizeFor];
+  if (!error && scores) {
+    const best = comparison.best[optimizeFor] || [];
+    const winner = best.length !== 1 ? "Tie" : best[0] === 0 ? "A" : "B";
 
     let why = "";
     if (winner === "A") why = "A fits your selected intent better (higher score).";
     else if (winner === "B") why = "B fits your selected intent better (higher score).";
     else why = "Both look similar for your selected intent based on this ingredient text.";
 
-    setSummary(`Winner: ${winner}. ${why}`);
+    summary = `Winner: ${winner} (${scores[0]} vs ${scores[1]}). ${why}`;
   }
 
   return (
@@ -127,25 +133,28 @@ export default function ComparePage() {
 
         {/* Results */}
         <div className="grid" style={{ marginTop: 14 }}>
-          <CompareCard label="Product A" res={resultA} />
-          <CompareCard label="Product B" res={resultB} />
+          <CompareCard label="Product A" res={resultA} intent={optimizeFor} />
+          <CompareCard label="Product B" res={resultB} intent={optimizeFor} />
         </div>
+
+        {comparison ? (
+          <div className="card" style={{ marginTop: 14 }}>
+            <p className="cardSub">
+              In both: <span className="mono">{shared.length ? shared.join(", ") : "nothing"}</span>
+            </p>
+          </div>
+        ) : null}
       </div>
     </div>
   );
 }
 
-function CompareCard({ label, res }) {
+function CompareCard({ label, res, intent }) {
   if (!res) return <div className="card"><p className="cardSub">Run compare to see results.</p></div>;
 
-  const score = getScore(res);
-  const color = getColor(res);
-  const intent =
-    res?.decision_card?.intent ||
-    res?.inferred_intent?.top_intent ||
-    "general";
-
-  const bullets = Array.isArray(res?.decision_card?.bullets) ? res.decision_card.bullets : [];
+  const score = typeof res.fit?.fit_score === "number" ? res.fit.fit_score : null;
+  const color = res.fit?.color || res.decision_card?.color || "unknown";
+  const bullets = Array.isArray(res.decision_card?.bullets) ? res.decision_card.bullets : [];
 
   return (
     <div className="card">
@@ -169,6 +178,12 @@ function CompareCard({ label, res }) {
       ) : (
         <p className="cardSub">No bullets available.</p>
       )}
+
+      {res.only.length ? (
+        <p className="cardSub">
+          Only here: <span className="mono">{res.only.map((x) => x.raw).join(", ")}</span>
+        </p>
+      ) : null}
     </div>
   );
 }
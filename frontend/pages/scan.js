@@ -1,7 +1,9 @@
 // frontend/pages/scan.js
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useRouter } from "next/router";
-import { analyzeIngredients } from "../lib/api";
+import { analyzeIngredients, analyzeIncremental, scanLabelImage } from "../lib/api";
+
+const LIVE_DEBOUNCE_MS = 300;
 
 export default function ScanPage() {
   const router = useRouter();
@@ -20,6 +22,41 @@ export default function ScanPage() {
 
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  const [ocrStatus, setOcrStatus] = useState("");
+
+  // Live preview while typing: the backend keeps a session and only
+  // re-resolves the part of the label that changed.
+  const [live, setLive] = useState(null);
+  const liveSession = useRef(null);
+
+  useEffect(() => {
+    if (!ingredientsText.trim()) {
+      setLive(null);
+      return;
+    }
+    let cancelled = false;
+    const t = setTimeout(async () => {
+      const req = { ingredients_text: ingredientsText, optimize_for: optimizeFor, user_prefs: userPrefs };
+      try {
+        let data;
+        try {
+          data = await analyzeIncremental({ ...req, session_id: liveSession.current });
+        } catch (e) {
+          if (e.status !== 409) throw e;
+          data = await analyzeIncremental(req); // session expired: start a new one
+        }
+        liveSession.current = data.session_id;
+        if (!cancelled) setLive(data);
+      } catch {
+        if (!cancelled) setLive(null);
+      }
+    }, LIVE_DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(t);
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [ingredientsText, optimizeFor, avoid, limit, goals]);
 
   const examples = {
     "Breakfast cereal":
@@ -74,6 +111,39 @@ export default function ScanPage() {
     }
   };
 
+  // Label photo: the backend OCRs it on a job queue and analyzes the text
+  const onPhoto = async (e) => {
+    const file = e.target.files?.[0];
+    e.target.value = "";
+    if (!file) return;
+    setError("");
+
+    let userPrefs = {};
+    try {
+      userPrefs = parsePrefsSafely(prefsText);
+    } catch (err) {
+      setError(err.message);
+      return;
+    }
+
+    setOcrStatus("uploading");
+    try {
+      const job = await scanLabelImage({
+        file,
+        optimize_for: optimizeFor,
+        user_prefs: userPrefs,
+        onStatus: setOcrStatus,
+      });
+      setIngredientsText(job.text || "");
+      sessionStorage.setItem("last_analysis", JSON.stringify(job.result));
+      router.push("/result");
+    } catch (err) {
+      setError(err.message || "Failed to read the label");
+    } finally {
+      setOcrStatus("");
+    }
+  };
+
   return (
     <div className="page">
       <div className="shell">
@@ -190,8 +260,28 @@ export default function ScanPage() {
               >
                 {loading ? "Analyzing..." : "Analyze"}
               </button>
+
+              <label className="btn">
+                {ocrStatus ? `Reading label (${ocrStatus})...` : "Scan photo"}
+                <input
+                  type="file"
+                  accept="image/*"
+                  capture="environment"
+                  onChange={onPhoto}
+                  disabled={!!ocrStatus}
+                  style={{ display: "none" }}
+                />
+              </label>
             </div>
 
+            {live ? (
+              <div className="cardSub" style={{ marginTop: 8 }}>
+                Live: <span className="mono">{live.decision_card?.headline}</span>
+                {" · "}
+                {live.normalized_ingredients.length} ingredients
+              </div>
+            ) : null}
+
             <div className="chips">
               {Object.keys(examples).map((k) => (
                 <button